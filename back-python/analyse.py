@@ -1,13 +1,31 @@
 import os
+import gc
+import logging
+import time
+import threading
+import uuid
+import weakref
+import io
+import zipfile
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
-import joblib
 import random
-import glob
-import tensorflow as tf
-from sklearn.preprocessing import LabelEncoder
-from reader import read_ecg_file_frag, read_ecg_file_csv, plot_ecg_medical_to_base64
+from reader import load_signal, validate_signal
+from render import plot_ecg, PLOT_FORMATS
 from management import normalize_data
-from werkzeug.utils import secure_filename
+from preprocessing import SignalConditioner, TARGET_SAMPLING_RATE
+from batching import InferenceScheduler
+from tflite_model import TFLiteModel
+from numpy_model import NumpyModel
+from library import SampleLibrary
+from result_cache import ResultCache, RESULT_CACHE_ENABLED
+from metrics import stage, MODEL_LABELS
+
+logger = logging.getLogger(__name__)
+
+# TensorFlow, joblib, scikit-learn and werkzeug are imported where they are used, so that
+# importing this module (and cold-starting the API) does not pay for them; see prewarm()
 
 # --------- Global settings ---------
 file_type = 'full'
@@ -25,59 +43,378 @@ TARGET_LENGTHS = {
     '15_2': 361
 }
 
-# --------- Core Functions ---------
-def load_model(model_choice):
-    model_dir = f'models/{file_type}'
-    if model_choice in ['lstm', 'rnn', 'cnn', 'deep']:
-        model_path = os.path.join(model_dir, f'{model_choice}_model.h5')
-        model = tf.keras.models.load_model(model_path)
+# Danger weight (%) of each class, used to compute the danger level
+DANGER_MAPPING = {
+    "VFL": 95, "VF": 100, "VTHR": 85, "VTLR": 75, "B": 50,
+    "HGEA": 30, "VER": 40, "AFIB": 30, "SVTA": 25, "SBR": 20,
+    "BI": 40, "NOD": 30, "BBB": 50, "N": 0, "Ne": 50
+}
+
+# Sampling rate of the recordings the models were trained on (MIT-BIH)
+MODEL_SAMPLING_RATE = TARGET_SAMPLING_RATE
+# Windowed analysis: number of windows classified per predict call
+WINDOW_BATCH_SIZE = int(os.environ.get('ECG_WINDOW_BATCH_SIZE', '256'))
+ANALYSIS_MODES = ['single', 'windowed']
+# Maximum number of recordings in one /analyze/batch request (zip members included)
+BATCH_MAX_FILES = int(os.environ.get('ECG_BATCH_MAX_FILES', '1000'))
+
+# Model registry settings (overridable through the environment)
+MODEL_CACHE_MAX_BYTES = int(os.environ.get('ECG_MODEL_CACHE_MB', '1024')) * 1024 * 1024
+KERAS_MODELS = ['lstm', 'rnn', 'cnn', 'deep']
+# Keras models runtime: 'auto' uses the NumPy weights (.npz, see export.py) when they exist and
+# the .h5 model otherwise; 'keras' always loads the .h5 model, 'numpy' and 'tflite' always their
+# artifact. 'auto' never picks .tflite: the export has a fixed batch of 1 (recurrent layers cannot
+# be converted with a dynamic one), so batched predictions run one window at a time, ~10x slower
+# than .h5 for rnn/lstm at batch 32
+MODEL_RUNTIME = os.environ.get('ECG_MODEL_RUNTIME', 'auto')
+# Group concurrent /analyze predictions into batches (see batching.py)
+BATCHING_ENABLED = os.environ.get('ECG_BATCHING', '1') == '1'
+
+def _parse_mapping(spec, cast=float):
+    mapping = {}
+    for item in spec.split(','):
+        if item.strip():
+            name, _, value = item.partition('=')
+            mapping[name.strip()] = cast(value.strip())
+    return mapping
+
+# Models run by model_choice='ensemble' (those without a model file for file_type are skipped),
+# and their relative weight in the average (e.g. ECG_ENSEMBLE_WEIGHTS="deep=2,lstm=1"; unlisted
+# models weigh 1)
+ENSEMBLE_MODELS = [m.strip() for m in os.environ.get('ECG_ENSEMBLE_MODELS', 'cnn,rnn,lstm,deep,gbm').split(',')
+                   if m.strip()]
+ENSEMBLE_WEIGHTS = _parse_mapping(os.environ.get('ECG_ENSEMBLE_WEIGHTS', ''))
+# Runtime picked by 'auto' for each Keras model (unlisted models use .npz when it exists), from
+# the benchmarks/suite.py inference cases on CPU, min ms at batch 1/32/256:
+#   deep  .npz 0.04/0.16/0.92  .h5 0.76/0.80/1.25
+#   rnn   .npz 2.5/11.9/88     .h5 16.6/23.6/66
+#   lstm  .npz 10/50/414       .h5 20/43/213
+# Predictions are batched (up to batching.BATCH_MAX_SIZE by the scheduler, WINDOW_BATCH_SIZE windows in
+# windowed mode), where the NumPy LSTM loses to Keras. Override with e.g. ECG_AUTO_RUNTIMES="lstm=numpy"
+AUTO_RUNTIMES = {'lstm': 'keras', **_parse_mapping(os.environ.get('ECG_AUTO_RUNTIMES', ''), cast=str)}
+
+# --------- Model registry ---------
+class ModelRegistry:
+    """
+    Process-wide cache of loaded models.
+
+    Each model is read from disk at most once per process and kept until it is
+    evicted (least recently used first) to stay under `max_bytes`, or until the
+    file on disk changes (mtime), in which case it is reloaded on next access.
+    """
+
+    def __init__(self, max_bytes=MODEL_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._load_locks = {}
+
+    def get(self, model_choice):
+        model_path = get_model_path(model_choice)
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(f"Model {model_choice} for {file_type} not found.")
+        mtime = os.path.getmtime(model_path)
+
+        with self._lock:
+            entry = self._entries.get(model_choice)
+            if entry is not None and entry['path'] == model_path and entry['mtime'] == mtime:
+                self._entries.move_to_end(model_choice)
+                entry['hits'] += 1
+                return entry['model']
+            load_lock = self._load_locks.setdefault(model_choice, threading.Lock())
+
+        # Only one thread loads a given model, the others wait and reuse it
+        with load_lock:
+            with self._lock:
+                entry = self._entries.get(model_choice)
+                if entry is not None and entry['path'] == model_path and entry['mtime'] == mtime:
+                    self._entries.move_to_end(model_choice)
+                    entry['hits'] += 1
+                    return entry['model']
+
+            started = time.perf_counter()
+            model = _load_model_from_disk(model_choice, model_path)
+            load_seconds = time.perf_counter() - started
+            size_bytes = _model_size_bytes(model, model_path)
+
+            with self._lock:
+                self._entries.pop(model_choice, None)
+                self._entries[model_choice] = {
+                    'model': model,
+                    'path': model_path,
+                    'mtime': mtime,
+                    'size_bytes': size_bytes,
+                    'load_seconds': load_seconds,
+                    'loaded_at': time.time(),
+                    'hits': 0,
+                }
+                self._evict()
+            return model
+
+    def warm_up(self, model_choices):
+        loaded, failed = [], {}
+        for model_choice in model_choices:
+            try:
+                self.get(model_choice)
+                loaded.append(model_choice)
+            except Exception as e:
+                failed[model_choice] = str(e)
+        return loaded, failed
+
+    def evict(self, model_choice):
+        with self._lock:
+            return self._entries.pop(model_choice, None) is not None
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def resident(self):
+        with self._lock:
+            return [
+                {
+                    'model_choice': model_choice,
+                    'path': entry['path'],
+                    'mtime': entry['mtime'],
+                    'size_bytes': entry['size_bytes'],
+                    'load_seconds': entry['load_seconds'],
+                    'loaded_at': entry['loaded_at'],
+                    'hits': entry['hits'],
+                }
+                for model_choice, entry in self._entries.items()
+            ]
+
+    def total_bytes(self):
+        with self._lock:
+            return sum(entry['size_bytes'] for entry in self._entries.values())
+
+    def _evict(self):
+        # Caller holds self._lock; the most recently loaded model is always kept
+        total = sum(entry['size_bytes'] for entry in self._entries.values())
+        evicted = False
+        while total > self.max_bytes and len(self._entries) > 1:
+            _, entry = self._entries.popitem(last=False)
+            total -= entry['size_bytes']
+            evicted = True
+        if evicted:
+            gc.collect()
+
+
+def _model_size_bytes(model, model_path):
+    """
+    Memory estimate of a loaded model: the bytes of its weights when they can be read (Keras,
+    NumPy runtime), at least the file size (TFLite flatbuffer, pickled scikit-learn model).
+    An RSS delta around the load would also count the loads running in other threads.
+    """
+    if isinstance(model, NumpyModel):
+        weights = [w for _, _, layer_weights in model.layers for w in layer_weights.values()]
     else:
-        model_path = os.path.join(model_dir, f'{model_choice}_model.pkl')
-        model = joblib.load(model_path)
+        weights = getattr(model, 'weights', None) or []
+    weight_bytes = sum(int(np.prod(w.shape)) * np.dtype(getattr(w.dtype, 'name', w.dtype)).itemsize
+                       for w in weights)
+    return max(weight_bytes, os.path.getsize(model_path))
+
 
-    if not os.path.exists(model_path):
-        raise FileNotFoundError(f"Model {model_choice} for {file_type} not found.")
+def get_model_path(model_choice):
+    model_dir = f'models/{file_type}'
+    if model_choice not in KERAS_MODELS:
+        return os.path.join(model_dir, f'{model_choice}_model.pkl')
+
+    keras_path = os.path.join(model_dir, f'{model_choice}_model.h5')
+    artifacts = {runtime: os.path.join(model_dir, f'{model_choice}_model.{extension}')
+                 for runtime, extension in [('numpy', 'npz'), ('tflite', 'tflite')]}
+    if MODEL_RUNTIME in artifacts:
+        return artifacts[MODEL_RUNTIME]
+    if MODEL_RUNTIME == 'auto':
+        runtime = AUTO_RUNTIMES.get(model_choice, 'numpy')
+        if runtime in artifacts and os.path.exists(artifacts[runtime]):
+            return artifacts[runtime]
+    return keras_path
+
+
+def _load_model_from_disk(model_choice, model_path):
+    if model_path.endswith(('.npz', '.tflite')):
+        try:
+            return _load_artifact(model_path)
+        except Exception as e:
+            # An exported artifact is only a faster copy of the Keras model: fall back to the .h5
+            keras_path = os.path.join(os.path.dirname(model_path), f'{model_choice}_model.h5')
+            if not os.path.exists(keras_path):
+                raise
+            logger.warning("Unable to use %s (%s), loading %s instead", model_path, e, keras_path)
+            model_path = keras_path
+    if model_choice in KERAS_MODELS:
+        import tensorflow as tf
+        return tf.keras.models.load_model(model_path)
+    import joblib
+    return joblib.load(model_path)
+
+
+def _load_artifact(model_path):
+    model = NumpyModel(model_path) if model_path.endswith('.npz') else TFLiteModel(model_path)
+    # Input (..., samples, 1): an artifact exported for another signal length cannot be fed
+    expected = TARGET_LENGTHS.get(file_type)
+    if expected is not None and model.input_shape[-2] != expected:
+        raise ValueError(f"input length {model.input_shape[-2]} instead of {expected}")
     return model
 
+
+def resolve_models(model_choice):
+    """
+    Models requested by `model_choice`: one name, a list or comma-separated names,
+    or 'ensemble' for the ENSEMBLE_MODELS that have a model file. Duplicates are dropped,
+    order is kept.
+    """
+    if isinstance(model_choice, (list, tuple)):
+        models = [m.strip() for m in model_choice]
+    elif model_choice == 'ensemble':
+        known = available_models()
+        models = [m for m in ENSEMBLE_MODELS if m in known]
+    else:
+        models = [m.strip() for m in str(model_choice).split(',')]
+    models = list(dict.fromkeys(m for m in models if m))
+    if not models:
+        raise ValueError("No model selected.")
+    # Names come from the request: unknown ones must not reach the registry or the scheduler
+    # (one worker thread per model name)
+    known = available_models()
+    unknown = [m for m in models if m not in known]
+    if unknown:
+        raise UnknownModelError(f"Unknown model(s) {unknown}. Use one of {known} or 'ensemble'.")
+    MODEL_LABELS.update(models)
+    return models
+
+
+class UnknownModelError(ValueError):
+    pass
+
+
+def available_models():
+    """
+    Models with a file in models/<file_type>: Keras models (.h5 or an exported artifact, in
+    KERAS_MODELS order) then the scikit-learn ones (.pkl). Re-listed when the folder changes.
+    """
+    model_dir = f'models/{file_type}'
+    try:
+        mtime = os.stat(model_dir).st_mtime_ns
+    except FileNotFoundError:
+        return []
+    cached = _available_models_cache.get(model_dir)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+    files = {tuple(name.rsplit('_model.', 1)) for name in os.listdir(model_dir) if '_model.' in name}
+    keras = [m for m in KERAS_MODELS if any((m, extension) in files for extension in ('h5', 'npz', 'tflite'))]
+    pickled = sorted(m for m, extension in files if extension == 'pkl' and m not in KERAS_MODELS)
+    _available_models_cache[model_dir] = (mtime, keras + pickled)
+    return keras + pickled
+
+
+def model_version(model_choice):
+    # Cached predictions are tied to the model file(s) they were computed with
+    versions = []
+    for model in resolve_models(model_choice):
+        model_path = get_model_path(model)
+        versions.append(os.path.getmtime(model_path) if os.path.exists(model_path) else None)
+    return versions[0] if len(versions) == 1 else versions
+
+
+model_registry = ModelRegistry()
+# Resampling to MODEL_SAMPLING_RATE and the ECG_PREPROCESSING stages, before normalize_data
+signal_conditioner = SignalConditioner()
+sample_library = SampleLibrary(conditioner=signal_conditioner)
+result_cache = ResultCache()
+_class_names_cache = {}
+_available_models_cache = {}
+
+# --------- Core Functions ---------
+def load_model(model_choice):
+    with stage('load_model', model_choice):
+        return model_registry.get(model_choice)
+
+def load_class_names():
+    # Only the class names are needed at inference, which spares importing scikit-learn
+    label_path = 'results/label_classes.npy'
+    mtime = os.path.getmtime(label_path)
+    cached = _class_names_cache.get(label_path)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+
+    label_classes = np.load(label_path)
+    _class_names_cache[label_path] = (mtime, label_classes)
+    return label_classes
+
 def load_label_encoder():
-    label_classes = np.load('results/label_classes.npy')
+    from sklearn.preprocessing import LabelEncoder
     label_encoder = LabelEncoder()
-    label_encoder.classes_ = label_classes
+    label_encoder.classes_ = load_class_names()
     return label_encoder
 
 def resize_ecg_data(X):
-    target_length = TARGET_LENGTHS.get(file_type, X.shape[0])
-    if len(X) > target_length:
-        return X[:target_length]
-    elif len(X) < target_length:
-        return np.pad(X, (0, target_length - len(X)), 'constant')
+    # Works on a single signal or on a batch of signals (last axis is time)
+    target_length = TARGET_LENGTHS.get(file_type, X.shape[-1])
+    if X.shape[-1] > target_length:
+        return X[..., :target_length]
+    elif X.shape[-1] < target_length:
+        pad_width = [(0, 0)] * (X.ndim - 1) + [(0, target_length - X.shape[-1])]
+        return np.pad(X, pad_width, 'constant')
     return X
 
+_inference_functions = weakref.WeakKeyDictionary()
+_inference_functions_lock = threading.Lock()
+
+def keras_inference_function(model):
+    """
+    Graph-compiled forward pass of a Keras model, traced once per model. Unlike model.predict
+    it has no per-call setup, and it releases the GIL, so several models can run side by side.
+    """
+    with _inference_functions_lock:
+        fn = _inference_functions.get(model)
+        if fn is None:
+            import tensorflow as tf
+            signature = [tf.TensorSpec([None] + list(model.input_shape[1:]), tf.float32)]
+            # Weak reference, so an evicted model is not kept alive by its own function
+            model_ref = weakref.ref(model)
+            fn = tf.function(lambda x: model_ref()(x, training=False), input_signature=signature)
+            _inference_functions[model] = fn
+    return fn
+
 def predict_ecg(model, X, model_choice):
-    X = resize_ecg_data(X)
+    with stage('predict', model_choice):
+        X = resize_ecg_data(X)
 
-    if X.ndim == 1:
-        X = X.reshape(1, -1)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
 
-    if model_choice in ['lstm', 'rnn', 'cnn', 'deep']:
-        X = np.expand_dims(X, axis=2)
-        y_pred_prob = model.predict(X)
-    else:
-        y_pred_prob = model.predict_proba(X)
+        if model_choice in KERAS_MODELS:
+            X = np.expand_dims(X, axis=2).astype(np.float32)
+            if isinstance(model, (NumpyModel, TFLiteModel)):
+                y_pred_prob = model.predict(X)
+            else:
+                y_pred_prob = keras_inference_function(model)(X).numpy()
+        else:
+            y_pred_prob = model.predict_proba(X)
+
+        return y_pred_prob
 
-    return y_pred_prob
+def _predict_batch(model_choice, X):
+    return predict_ecg(load_model(model_choice), X, model_choice)
+
+# Concurrent requests for the same model are grouped into one predict call
+inference_scheduler = InferenceScheduler(_predict_batch)
+# Runs the models of an ensemble side by side when batching is disabled
+ensemble_executor = ThreadPoolExecutor(max_workers=len(KERAS_MODELS) + 1, thread_name_prefix='ensemble')
 
 def evaluate_danger_level_with_percentage(class_probabilities, class_names=None):
     if class_names is None:
         class_names = CLASS_NAMES
-    danger_mapping = {
-        "VFL": 95, "VF": 100, "VTHR": 85, "VTLR": 75, "B": 50,
-        "HGEA": 30, "VER": 40, "AFIB": 30, "SVTA": 25, "SBR": 20,
-        "BI": 40, "NOD": 30, "BBB": 50, "N": 0, "Ne": 50
-    }
-    return sum(danger_mapping.get(class_name, 0) * class_probabilities[i]
+    return sum(DANGER_MAPPING.get(class_name, 0) * class_probabilities[i]
                for i, class_name in enumerate(class_names))
 
+def danger_weights(class_names=None):
+    if class_names is None:
+        class_names = CLASS_NAMES
+    return np.array([DANGER_MAPPING.get(class_name, 0) for class_name in class_names], dtype=np.float64)
+
 def reclassify_into_main_categories(class_probabilities, class_names=None):
     if class_names is None:
         class_names = CLASS_NAMES
@@ -102,13 +439,59 @@ def reclassify_into_main_categories(class_probabilities, class_names=None):
             results[k] = (results[k] / total) * 100
     return results
 
-def save_dataset(file, upload_folder):
+def secure_upload_filename(filename):
     """
-    Save uploaded file to the specified upload folder.
+    Sanitize a client-supplied filename and check that it is a CSV.
+
+    Raises:
+        ValueError: If no filename is given or the file format is invalid
+    """
+    if not filename:
+        raise ValueError("No file provided")
+
+    try:
+        from werkzeug.utils import secure_filename
+        filename = secure_filename(filename)
+    except ImportError:
+        # Fallback if werkzeug is not available
+        filename = os.path.basename(filename)
+
+    if not filename.lower().endswith('.csv'):
+        raise ValueError("Invalid file format. Only .csv supported.")
+    return filename
+
+def expand_batch_upload(filename, content):
+    """
+    List the (filename, content) recordings of one batch upload: the CSV itself,
+    or every CSV member of a zip archive.
+
+    Raises:
+        ValueError: If the file is neither a CSV nor a zip archive, or the zip is invalid
+    """
+    if not (filename or '').lower().endswith('.zip'):
+        return [(secure_upload_filename(filename), content)]
+
+    try:
+        archive = zipfile.ZipFile(io.BytesIO(content))
+    except zipfile.BadZipFile:
+        raise ValueError(f"Invalid zip archive: {filename}")
+    with archive:
+        members = [info for info in archive.infolist()
+                   if not info.is_dir() and info.filename.lower().endswith('.csv')
+                   and not os.path.basename(info.filename).startswith('.')
+                   and '__MACOSX' not in info.filename]
+        if len(members) > BATCH_MAX_FILES:
+            raise ValueError(f"Too many files in {filename}: at most {BATCH_MAX_FILES} per batch.")
+        return [(info.filename, archive.read(info)) for info in members]
+
+def save_dataset(file, upload_folder, content=None):
+    """
+    Save uploaded file to the specified upload folder under a unique name.
     
     Args:
-        file: The uploaded file object
+        file: The uploaded file object (or its filename when `content` is given)
         upload_folder: Directory path where the file should be saved
+        content: Bytes already read from the upload, if any
     
     Returns:
         str: Path to the saved file
@@ -120,19 +503,9 @@ def save_dataset(file, upload_folder):
     if file is None:
         raise ValueError("No file provided")
     
-    # Secure the filename
-    filename = file.filename
-    if hasattr(file, 'filename'):
-        # For file objects that have secure_filename available
-        try:
-            filename = secure_filename(file.filename)
-        except ImportError:
-            # Fallback if werkzeug is not available
-            filename = os.path.basename(file.filename)
-    
-    # Validate file format
-    if not filename.lower().endswith('.csv'):
-        raise ValueError("Invalid file format. Only .csv supported.")
+    # Secure the filename, prefixed so that concurrent uploads never share a path
+    filename = secure_upload_filename(getattr(file, 'filename', file))
+    filename = f"{uuid.uuid4().hex}_{filename}"
     
     # Create upload folder if it doesn't exist
     os.makedirs(upload_folder, exist_ok=True)
@@ -141,12 +514,12 @@ def save_dataset(file, upload_folder):
     saved_path = os.path.join(upload_folder, filename)
     try:
         with open(saved_path, "wb") as f:
-            if hasattr(file, 'read'):
+            if content is not None:
+                # For content already read in memory
+                f.write(content)
+            else:
                 # For file-like objects
                 f.write(file.file.read())
-            else:
-                # For file content passed directly
-                f.write(file)
     except Exception as e:
         raise IOError(f"Failed to save file: {str(e)}")
     
@@ -157,90 +530,47 @@ def get_random_color():
     return random.choice(["green", "yellow", "red"])
 
 def get_random_dataset_by_color(color_choice='green'):
-    base_path="categorize_dataset/categorize"
-
-    # Verifies if the base path exists
-    if not os.path.exists(base_path):
-        return FileNotFoundError(f"Base path does not exist: {base_path}")
-
-    # Define the folder ranges based on the color choice
-    folder_ranges = []
-    if color_choice == "green":
-        folder_ranges = ["0.0-9.0", "10.0-19.0", "20.0-29.0"]
-    elif color_choice == "yellow":
-        folder_ranges = ["30.0-39.0", "40.0-49.0", "50.0-59.0"]
-    elif color_choice == "red":
-        folder_ranges = ["60.0-69.0", "70.0-79.0", "80.0-89.0", "90.0-99.0"]
-    else:
-        raise ValueError("Invalid color choice. Use 'green', 'yellow', or 'red'.")
-    
-    # Collects all CSV files from the specified folders
-    all_csv_files = []
-    for folder_range in folder_ranges:
-        folder_path = os.path.join(base_path, folder_range)
-        if os.path.exists(folder_path):
-            # Find all CSV files in the folder
-            csv_pattern = os.path.join(folder_path, "*.csv")
-            csv_files = glob.glob(csv_pattern)
-            all_csv_files.extend(csv_files)
+    # The library is indexed once and refreshed in the background (see library.SampleLibrary)
+    return sample_library.random_entry(color_choice)['path']
+
+# Read an ECG file and normalize it
+def load_ecg(source, sampling_rate=None):
+    """
+    Read, condition and normalize an ECG from a file path (CSV or WFDB record), an in-memory
+    CSV (bytes, str or file-like object) or an already parsed NumPy array. `sampling_rate`
+    is the rate of the recording (default: MODEL_SAMPLING_RATE); other rates are resampled.
+    """
+    with stage('parse'):
+        if isinstance(source, np.ndarray):
+            X = validate_signal(source)
+        elif isinstance(source, (bytes, bytearray, memoryview)) or hasattr(source, 'read'):
+            X = load_signal(source)
+        elif source and (os.path.exists(source) or os.path.exists(f"{source}.hea")):
+            X = load_signal(source)
         else:
-            raise FileNotFoundError(f"Folder not found: {folder_path}")
-    
-    # Verify if any CSV files were found
-    if not all_csv_files:
-        raise FileNotFoundError(f"No CSV files found for color choice '{color_choice}'")
-    
-    # Select a random CSV file from the collected files
-    saved_path = random.choice(all_csv_files)
-    # Verify if the selected file exists
-    if not os.path.exists(saved_path):
-        raise FileNotFoundError(f"Selected file does not exist: {saved_path}")
-    
-    return saved_path
+            raise FileNotFoundError("Missing or invalid file path.")
+
+    with stage('condition'):
+        X = signal_conditioner(X, sampling_rate)
+    with stage('normalize'):
+        return normalize_data(X)
 
 # Get base64 plot from a ECG file
 def get_ecg_plot_base64(file_path):
-    if file_path and os.path.exists(file_path):
-        if file_type == 'frag':
-            X = read_ecg_file_frag(file_path)
-        else:
-            X = read_ecg_file_csv(file_path)
-    else:
-        raise FileNotFoundError("Missing or invalid file path.")
-
-    X = normalize_data(X)
-    return plot_ecg_medical_to_base64(X)
+    return plot_ecg(load_ecg(file_path))["ecg_plot_base64"]
 
 # Get a ECG plot base64 from a color_choice
 def get_ecg_plot_base64_from_color_choice(color_choice='green'):
-    saved_dataset = get_random_dataset_by_color(color_choice)
+    entry = sample_library.random_entry(color_choice)
     result = {
-        "plot_url": get_ecg_plot_base64(saved_dataset),
+        "plot_url": sample_library.plot(entry),
         "color_choice": color_choice
     }
     return result
 
 
 # --------- 🧠 Main analysis function ---------
-def analyze_ecg(file_path, model_choice='cnn'):
-
-    if file_path and os.path.exists(file_path):
-        if file_type == 'frag':
-            X = read_ecg_file_frag(file_path)
-        else:
-            X = read_ecg_file_csv(file_path)
-    else:
-        raise FileNotFoundError("Missing or invalid file path.")
-
-    X = normalize_data(X)
-    ecg_image_base64 = plot_ecg_medical_to_base64(X)
-    model = load_model(model_choice)
-    label_encoder = load_label_encoder()
-    y_pred_prob = predict_ecg(model, X, model_choice)
-
-    class_probabilities = y_pred_prob.flatten()
-    class_names = label_encoder.classes_
-
+def build_analysis_result(class_probabilities, class_names, ecg_image_base64=None):
     if len(class_probabilities) != len(class_names):
         raise ValueError("Mismatch in predicted and known class lengths.")
 
@@ -249,7 +579,7 @@ def analyze_ecg(file_path, model_choice='cnn'):
     top_3_probabilities = [class_probabilities[i] for i in top_3_indices]
     predicted_class = class_names[np.argmax(class_probabilities)]
 
-    result = {
+    return {
         "predicted_class": predicted_class,
         "class_probabilities": class_probabilities.tolist(),
         "danger_level": evaluate_danger_level_with_percentage(class_probabilities, class_names),
@@ -259,4 +589,245 @@ def analyze_ecg(file_path, model_choice='cnn'):
         "ecg_plot_base64": ecg_image_base64,
     }
 
+# --------- Windowed analysis ---------
+def sliding_windows(X, window, stride):
+    """
+    Return a (n_windows, window) read-only view over X, one row every `stride` samples.
+    Signals shorter than one window are zero-padded to a single window.
+    """
+    if stride < 1:
+        raise ValueError("Stride must be a positive number of samples.")
+    if len(X) < window:
+        X = np.pad(X, (0, window - len(X)), 'constant')
+    return np.lib.stride_tricks.sliding_window_view(X, window)[::stride]
+
+def predict_windows(model_choice, windows, batch_size=WINDOW_BATCH_SIZE):
+    # Windows are only copied one batch at a time, so memory stays bounded by the batch
+    model = load_model(model_choice)
+    probabilities = [
+        predict_ecg(model, np.ascontiguousarray(windows[start:start + batch_size]), model_choice)
+        for start in range(0, len(windows), batch_size)
+    ]
+    return np.concatenate(probabilities, axis=0)
+
+def find_risk_segments(danger, starts, window, fs=MODEL_SAMPLING_RATE, top_k=5):
+    """
+    Merge the `top_k` most dangerous windows into non-overlapping segments,
+    ordered by their highest danger level.
+    """
+    top = np.sort(np.argsort(danger)[::-1][:top_k])
+    segments = []
+    for i in top:
+        start, end = int(starts[i]), int(starts[i]) + window
+        if segments and start <= segments[-1]['end_sample']:
+            segment = segments[-1]
+            segment['end_sample'] = max(segment['end_sample'], end)
+            if danger[i] > segment['danger_level']:
+                segment['danger_level'] = float(danger[i])
+                segment['window'] = int(i)
+        else:
+            segments.append({'start_sample': start, 'end_sample': end,
+                             'danger_level': float(danger[i]), 'window': int(i)})
+
+    for segment in segments:
+        segment['start_time'] = segment['start_sample'] / fs
+        segment['end_time'] = segment['end_sample'] / fs
+    return sorted(segments, key=lambda segment: segment['danger_level'], reverse=True)
+
+def analyze_windows(X, model_choice='cnn', stride=None, include_plot=True, top_k=5, plot_format='png'):
+    """
+    Classify every `window`-sample window of the recording (one every `stride` samples,
+    half a window by default) and aggregate the per-window probabilities.
+    """
+    window = TARGET_LENGTHS.get(file_type, len(X))
+    stride = int(stride) if stride else max(1, window // 2)
+    windows = sliding_windows(X, window, stride)
+    starts = np.arange(len(windows)) * stride
+
+    class_names = load_class_names()
+    probabilities = predict_windows(model_choice, windows)
+    if probabilities.shape[1] != len(class_names):
+        raise ValueError("Mismatch in predicted and known class lengths.")
+
+    danger = probabilities @ danger_weights(class_names)
+    predicted = probabilities.argmax(axis=1)
+    riskiest = int(np.argmax(danger))
+
+    result = build_analysis_result(probabilities.mean(axis=0), class_names)
+    if include_plot:
+        with stage('plot'):
+            result.update(plot_ecg(windows[riskiest], plot_format=plot_format))
+    result.update({
+        "mode": "windowed",
+        "window_size": window,
+        "stride": stride,
+        "window_count": len(windows),
+        "max_danger_level": float(danger[riskiest]),
+        "plot_window": {"start_sample": int(starts[riskiest]), "end_sample": int(starts[riskiest]) + window},
+        "risk_segments": find_risk_segments(danger, starts, window, top_k=top_k),
+        "windows": [
+            {
+                "start_time": float(starts[i] / MODEL_SAMPLING_RATE),
+                "predicted_class": class_names[predicted[i]],
+                "danger_level": float(danger[i]),
+                "class_probabilities": probabilities[i].tolist(),
+            }
+            for i in range(len(windows))
+        ],
+    })
     return result
+
+# --------- Ensemble analysis ---------
+def predict_models(X, models):
+    """
+    Run every model on the same signal concurrently. Returns ({model: probabilities}, {model: error});
+    a model that cannot be loaded or run is reported instead of failing the whole ensemble.
+    """
+    row = resize_ecg_data(X)
+    futures = {}
+    for model in models:
+        if BATCHING_ENABLED:
+            futures[model] = inference_scheduler.submit(model, row)
+        else:
+            futures[model] = ensemble_executor.submit(_predict_batch, model, row)
+
+    probabilities, failed = {}, {}
+    for model, future in futures.items():
+        try:
+            probabilities[model] = future.result().flatten()
+        except Exception as e:
+            failed[model] = str(e)
+    return probabilities, failed
+
+def build_ensemble_result(probabilities, failed, class_names):
+    if not probabilities:
+        raise ValueError(f"No model of the ensemble could be run: {failed}")
+
+    weights = {m: ENSEMBLE_WEIGHTS.get(m, 1.0) for m in probabilities}
+    total = sum(weights.values())
+    if total <= 0:
+        raise ValueError("Ensemble weights must add up to a positive number.")
+    weights = {m: w / total for m, w in weights.items()}
+    average = sum(weights[m] * np.asarray(p, dtype=np.float64) for m, p in probabilities.items())
+
+    result = build_analysis_result(average, class_names)
+    models = {}
+    for model, p in probabilities.items():
+        models[model] = build_analysis_result(np.asarray(p), class_names)
+        del models[model]["ecg_plot_base64"]
+    result.update({"models": models, "model_weights": weights, "failed_models": failed})
+    return result
+
+def analyze_ensemble(X, models, include_plot=True, plot_format='png'):
+    probabilities, failed = predict_models(X, models)
+    result = build_ensemble_result(probabilities, failed, load_class_names())
+    if include_plot:
+        with stage('plot'):
+            result.update(plot_ecg(X, plot_format=plot_format))
+    return result
+
+def validate_analysis_options(mode='single', stride=None, plot_format='png'):
+    """Raises ValueError on an invalid analysis option, so a request can be rejected before any work."""
+    if mode not in ANALYSIS_MODES:
+        raise ValueError(f"Invalid analysis mode. Use one of {ANALYSIS_MODES}.")
+    # No stride (or 0) means the default one
+    if stride and int(stride) < 1:
+        raise ValueError("Stride must be a positive number of samples.")
+    if plot_format not in PLOT_FORMATS:
+        raise ValueError(f"Invalid plot format. Use one of {PLOT_FORMATS}.")
+
+# Classify an already loaded and normalized signal
+def analyze_signal(X, model_choice='cnn', include_plot=True, mode='single', stride=None, plot_format='png'):
+    validate_analysis_options(mode, stride, plot_format)
+    models = resolve_models(model_choice)
+    if len(models) > 1:
+        if mode == 'windowed':
+            raise ValueError("Windowed analysis runs a single model.")
+        return analyze_ensemble(X, models, include_plot=include_plot, plot_format=plot_format)
+    model_choice = models[0]
+    if mode == 'windowed':
+        return analyze_windows(X, model_choice, stride=stride, include_plot=include_plot, plot_format=plot_format)
+
+    class_names = load_class_names()
+    # Includes the wait for the batching scheduler; 'predict' is the model call alone
+    with stage('classify', model_choice):
+        if BATCHING_ENABLED:
+            y_pred_prob = inference_scheduler.predict(model_choice, resize_ecg_data(X))
+        else:
+            y_pred_prob = predict_ecg(load_model(model_choice), X, model_choice)
+
+    result = build_analysis_result(y_pred_prob.flatten(), class_names)
+    if include_plot:
+        with stage('plot'):
+            result.update(plot_ecg(X, plot_format=plot_format))
+    return result
+
+# Key of an analysis in the result cache: same signal, model file and options give the same result
+def analysis_cache_key(X, model_choice='cnn', include_plot=True, mode='single', stride=None, plot_format='png'):
+    return result_cache.key(X, model_choice, model_version(model_choice), include_plot=include_plot,
+                            mode=mode, stride=stride, plot_format=plot_format)
+
+def analyze_ecg(source, model_choice='cnn', include_plot=True, mode='single', stride=None, plot_format='png',
+                use_cache=RESULT_CACHE_ENABLED, sampling_rate=None):
+    # source: file path, in-memory CSV or NumPy array recorded at sampling_rate (see load_ecg)
+    X = load_ecg(source, sampling_rate)
+    if not use_cache:
+        return analyze_signal(X, model_choice, include_plot, mode=mode, stride=stride, plot_format=plot_format)
+
+    with stage('cache_lookup'):
+        key = analysis_cache_key(X, model_choice, include_plot, mode, stride, plot_format)
+        result = result_cache.get(key)
+    if result is None:
+        result = analyze_signal(X, model_choice, include_plot, mode=mode, stride=stride, plot_format=plot_format)
+        result_cache.put(key, result)
+    return result
+
+# Classify many loaded signals with one batched predict per model
+def analyze_batch(signals, model_choice='cnn'):
+    class_names = load_class_names()
+    batch = np.stack([resize_ecg_data(X) for X in signals])
+    models = resolve_models(model_choice)
+    if len(models) == 1:
+        probabilities = predict_windows(models[0], batch)
+        return [build_analysis_result(row, class_names) for row in probabilities]
+
+    probabilities, failed = {}, {}
+    for model in models:
+        try:
+            probabilities[model] = predict_windows(model, batch)
+        except Exception as e:
+            failed[model] = str(e)
+    return [build_ensemble_result({m: p[i] for m, p in probabilities.items()}, failed, class_names)
+            for i in range(len(signals))]
+
+# Classify a sample of the categorized library, reusing its cached prediction and plot
+def analyze_library_sample(entry, model_choice='cnn', mode='single', stride=None, plot_format='png'):
+    validate_analysis_options(mode, stride, plot_format)
+    X = sample_library.signal(entry)
+    if mode == 'windowed':
+        return analyze_signal(X, model_choice, mode=mode, stride=stride, plot_format=plot_format)
+
+    result = dict(sample_library.prediction(
+        entry, ','.join(resolve_models(model_choice)), model_version(model_choice),
+        lambda signal: analyze_signal(signal, model_choice, include_plot=False, mode=mode)))
+    if plot_format in ('polyline', 'both'):
+        result.update(plot_ecg(X, plot_format='polyline'))
+    if plot_format in ('png', 'both'):
+        result["ecg_plot_base64"] = sample_library.plot(entry)
+    return result
+
+# --------- Pre-warming ---------
+def prewarm(model_choices=(), index_library=True):
+    """
+    Pay the one-off costs before the first request: lazy imports, model loading and tracing,
+    label encoder, plot renderer and sample library. Called by the startup handler (ECG_PREWARM)
+    or a Lambda SnapStart before-snapshot hook. Returns (loaded, failed) like warm_up.
+    """
+    load_class_names()
+    plot_ecg(np.sin(np.linspace(0, 20 * np.pi, 1000)))
+    loaded, failed = model_registry.warm_up(model_choices)
+    for model_choice in loaded:
+        predict_ecg(load_model(model_choice), np.zeros(TARGET_LENGTHS[file_type]), model_choice)
+    if index_library:
+        sample_library.refresh()
+    return loaded, failed
@@ -0,0 +1,75 @@
+import numpy as np
+from preprocessing import TARGET_SAMPLING_RATE
+
+# Augmentation des signaux à la volée, lot par lot : chaque passage d'un signal dans un lot en
+# produit une variante différente, sans jamais stocker les signaux augmentés.
+
+# Perturbations disponibles et amplitude de chacune (0 = désactivée)
+#   scale   : facteur d'amplitude tiré dans [1 - scale, 1 + scale]
+#   wander  : amplitude d'une dérive de ligne de base sinusoïdale (0.05 à 0.5 Hz)
+#   noise   : écart-type d'un bruit gaussien
+#   shift   : décalage temporel circulaire maximal, en échantillons
+#   stretch : étirement temporel maximal, facteur tiré dans [1 - stretch, 1 + stretch]
+PERTURBATIONS = ['scale', 'wander', 'noise', 'shift', 'stretch']
+WANDER_FREQUENCIES = (0.05, 0.5)
+
+
+class SignalAugmenter:
+    """
+    Perturbations aléatoires d'un lot de signaux (n, longueur), paramétrées par classe.
+
+    config associe un nom de classe (ou '*' pour toutes les autres) à un dictionnaire
+    {perturbation: amplitude}. Les paramètres sont tirés par signal et appliqués en une passe
+    vectorisée sur tout le lot.
+    """
+
+    def __init__(self, config, class_names, sampling_rate=TARGET_SAMPLING_RATE):
+        unknown = {key for params in config.values() for key in params} - set(PERTURBATIONS)
+        if unknown:
+            raise ValueError(f"Perturbations inconnues : {sorted(unknown)}. Choix possibles : {PERTURBATIONS}")
+        unknown_classes = set(config) - set(class_names) - {'*'}
+        if unknown_classes:
+            raise ValueError(f"Classes inconnues dans la configuration d'augmentation : {sorted(unknown_classes)}")
+        default = config.get('*', {})
+        # Une ligne par classe (dans l'ordre de l'encodeur d'étiquettes), une colonne par perturbation
+        self.magnitudes = np.array([
+            [float(config.get(name, default).get(key, 0.0)) for key in PERTURBATIONS]
+            for name in class_names
+        ])
+        self.sampling_rate = sampling_rate
+
+    @property
+    def enabled(self):
+        return bool(self.magnitudes.any())
+
+    def __call__(self, batch, labels, rng):
+        n, length = batch.shape
+        scale, wander, noise, shift, stretch = self.magnitudes[labels].T
+        positions = np.arange(length, dtype=np.float64)
+
+        if stretch.any():
+            # Ré-échantillonnage linéaire autour du centre du signal, bords prolongés
+            rates = 1.0 + stretch * rng.uniform(-1.0, 1.0, n)
+            center = (length - 1) / 2.0
+            source = np.clip(center + (positions - center) * rates[:, None], 0, length - 1)
+            left = np.floor(source).astype(np.intp)
+            right = np.minimum(left + 1, length - 1)
+            weight = source - left
+            batch = (np.take_along_axis(batch, left, axis=1) * (1.0 - weight)
+                     + np.take_along_axis(batch, right, axis=1) * weight)
+        if shift.any():
+            offsets = np.round(shift * rng.uniform(-1.0, 1.0, n)).astype(np.intp)
+            batch = np.take_along_axis(batch, (positions.astype(np.intp) - offsets[:, None]) % length, axis=1)
+        elif not stretch.any():
+            # Les perturbations suivantes modifient le lot sur place : il ne doit pas être une vue de X
+            batch = np.array(batch, dtype=np.float64)
+        if scale.any():
+            batch *= (1.0 + scale * rng.uniform(-1.0, 1.0, n))[:, None]
+        if wander.any():
+            frequencies = rng.uniform(*WANDER_FREQUENCIES, n)
+            phases = rng.uniform(0.0, 2 * np.pi, n)
+            t = positions / self.sampling_rate
+            batch += wander[:, None] * np.sin(2 * np.pi * frequencies[:, None] * t + phases[:, None])
+        if noise.any():
+            batch += noise[:, None] * rng.standard_normal(batch.shape)
+        return batch
@@ -0,0 +1,167 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, InvalidStateError
+import numpy as np
+
+# Micro-batching settings (overridable through the environment)
+BATCH_MAX_SIZE = int(os.environ.get('ECG_BATCH_MAX_SIZE', '32'))
+BATCH_MAX_WAIT_MS = float(os.environ.get('ECG_BATCH_MAX_WAIT_MS', '5'))
+# A model's worker thread stops after this long without requests (restarted on the next one)
+BATCH_IDLE_SECONDS = float(os.environ.get('ECG_BATCH_IDLE_SECONDS', '60'))
+
+
+class InferenceScheduler:
+    """
+    Groups concurrent single-row predictions for the same model into one batched call.
+
+    Each model_choice gets its own queue and worker thread. The worker takes the first
+    pending request, then keeps collecting requests until `max_batch_size` rows are
+    gathered or `max_wait_ms` has elapsed, runs `predict_fn(model_choice, rows)` once
+    and hands every caller its own probability row. A worker idle for `idle_seconds`
+    stops and drops its queue. Callers are expected to pass validated model names.
+    Requests whose future was cancelled before the batch starts are skipped.
+    """
+
+    def __init__(self, predict_fn, max_batch_size=BATCH_MAX_SIZE, max_wait_ms=BATCH_MAX_WAIT_MS,
+                 idle_seconds=BATCH_IDLE_SECONDS):
+        self.predict_fn = predict_fn
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self.idle_seconds = idle_seconds
+        self._queues = {}
+        self._workers = {}
+        self._lock = threading.Lock()
+        self._stats = {'requests': 0, 'batches': 0, 'max_batch_size_seen': 0}
+
+    def submit(self, model_choice, x):
+        """Queue one 1-D signal and return a Future resolving to its (1, n_classes) probabilities."""
+        future = Future()
+        self._enqueue(model_choice, (np.asarray(x), future))
+        return future
+
+    def predict(self, model_choice, x, timeout=None):
+        return self.submit(model_choice, x).result(timeout=timeout)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['pending'] = {m: q.qsize() for m, q in self._queues.items()}
+        stats['mean_batch_size'] = stats['requests'] / stats['batches'] if stats['batches'] else 0.0
+        return stats
+
+    def shutdown(self):
+        with self._lock:
+            queues = list(self._queues.values())
+            workers = list(self._workers.values())
+            self._queues.clear()
+            self._workers.clear()
+        for q in queues:
+            q.put(None)
+        for worker in workers:
+            worker.join(timeout=5)
+
+    def _enqueue(self, model_choice, item):
+        # Put under the lock: an idle worker only stops when its queue is empty under the same lock
+        with self._lock:
+            q = self._queues.get(model_choice)
+            if q is None:
+                q = queue.Queue()
+                worker = threading.Thread(target=self._run, args=(model_choice, q),
+                                          name=f"inference-{model_choice}", daemon=True)
+                self._queues[model_choice] = q
+                self._workers[model_choice] = worker
+                worker.start()
+            q.put(item)
+
+    def _collect(self, q, first):
+        batch = [first] if _claim(first[1]) else []
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                item = q.get(timeout=remaining) if remaining > 0 else q.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                # Shutdown requested: serve what we have, then stop
+                q.put(None)
+                break
+            if _claim(item[1]):
+                batch.append(item)
+        return batch
+
+    def _run(self, model_choice, q):
+        try:
+            self._serve(model_choice, q)
+        finally:
+            # However the worker stops, the next request for this model starts a new one
+            with self._lock:
+                if self._queues.get(model_choice) is q:
+                    del self._queues[model_choice]
+                    del self._workers[model_choice]
+            # No request can be queued any more: fail the ones left behind
+            while True:
+                try:
+                    item = q.get_nowait()
+                except queue.Empty:
+                    break
+                if item is not None and _claim(item[1]):
+                    _settle(item[1], exception=RuntimeError(f"Inference worker for {model_choice} stopped."))
+
+    def _serve(self, model_choice, q):
+        while True:
+            try:
+                first = q.get(timeout=self.idle_seconds)
+            except queue.Empty:
+                with self._lock:
+                    if q.empty():
+                        if self._queues.get(model_choice) is q:
+                            del self._queues[model_choice]
+                            del self._workers[model_choice]
+                        return
+                continue
+            if first is None:
+                return
+            batch = self._collect(q, first)
+            if not batch:
+                continue
+            futures = [future for _, future in batch]
+            try:
+                rows = np.stack([x for x, _ in batch])
+                probabilities = np.asarray(self.predict_fn(model_choice, rows))
+                if len(probabilities) != len(batch):
+                    raise ValueError("Batched prediction returned an unexpected number of rows.")
+            except Exception as e:
+                for future in futures:
+                    _settle(future, exception=e)
+                continue
+
+            for i, future in enumerate(futures):
+                _settle(future, probabilities[i:i + 1])
+
+            with self._lock:
+                self._stats['requests'] += len(batch)
+                self._stats['batches'] += 1
+                self._stats['max_batch_size_seen'] = max(self._stats['max_batch_size_seen'], len(batch))
+
+
+def _claim(future):
+    # False if the caller gave up (e.g. a closed WebSocket cancels its future) or settled it
+    # itself; once running, the future can no longer be cancelled
+    try:
+        return future.set_running_or_notify_cancel()
+    except RuntimeError:
+        return False
+
+
+def _settle(future, result=None, exception=None):
+    # One caller's future must not be able to stop the worker serving all the others
+    try:
+        if exception is not None:
+            future.set_exception(exception)
+        else:
+            future.set_result(result)
+    except InvalidStateError:
+        pass
@@ -0,0 +1,36 @@
+import os
+import sys
+import time
+import numpy as np
+
+# Benchmarks run against the back-python modules and their relative data paths
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+os.chdir(BACKEND_DIR)
+
+
+def latency_summary(latencies, elapsed):
+    latencies = np.asarray(latencies) * 1000.0
+    return {
+        'requests': len(latencies),
+        'throughput_rps': len(latencies) / elapsed if elapsed > 0 else 0.0,
+        'p50_ms': float(np.percentile(latencies, 50)),
+        'p99_ms': float(np.percentile(latencies, 99)),
+    }
+
+
+def print_summary(name, summary):
+    print(f"{name:<24} " + "  ".join(
+        f"{k}={v:.2f}" if isinstance(v, float) else f"{k}={v}" for k, v in summary.items()))
+
+
+def timeit(fn, repeat=5, number=1):
+    """Best-of-`repeat` wall time in seconds for `number` calls of fn()."""
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(number):
+            fn()
+        best = min(best, (time.perf_counter() - started) / number)
+    return best
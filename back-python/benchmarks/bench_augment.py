@@ -0,0 +1,81 @@
+"""
+On-the-fly augmentation (augment.py) vs CPU training speed: batches per second produced by
+the augmented input pipeline (sampling.keras_dataset) for several worker counts, and training
+steps per second of the ia.py Keras models fed with and without augmentation.
+
+    python benchmarks/bench_augment.py --model deep lstm --steps 60
+"""
+import argparse
+import time
+import numpy as np
+import _common
+from _common import print_summary
+
+AUGMENTATION = {'*': {'scale': 0.1, 'wander': 0.1, 'noise': 0.02, 'shift': 10, 'stretch': 0.05}}
+
+
+def build_model(model_choice, length, n_classes):
+    # Same architectures as ia.py
+    from tensorflow.keras.models import Sequential
+    from tensorflow.keras.layers import LSTM, SimpleRNN, Conv1D, MaxPooling1D, Dense, Dropout, Flatten, Input
+    layers = {
+        'deep': [Flatten(), Dense(128, activation='relu'), Dropout(0.2), Dense(128, activation='relu'), Dropout(0.2)],
+        'cnn': [Conv1D(64, kernel_size=3, activation='relu'), MaxPooling1D(pool_size=2), Dropout(0.2), Flatten(),
+                Dense(128, activation='relu'), Dropout(0.2)],
+        'lstm': [LSTM(64, return_sequences=True), Dropout(0.2), LSTM(64), Dropout(0.2)],
+        'rnn': [SimpleRNN(64, return_sequences=True), Dropout(0.2), SimpleRNN(64), Dropout(0.2)],
+    }[model_choice]
+    model = Sequential([Input(shape=(length, 1))] + layers + [Dense(n_classes, activation='softmax')])
+    model.compile(optimizer='adam', loss='categorical_crossentropy', metrics=['accuracy'])
+    return model
+
+
+def pipeline_rate(X, y, indices, n_classes, batch_size, augment, workers):
+    from sampling import keras_dataset
+    dataset = keras_dataset(X, y, indices, n_classes, batch_size, seed=0, augment=augment, workers=workers)
+    started = time.perf_counter()
+    batches = sum(1 for _ in dataset)
+    return batches / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--model', nargs='+', default=['deep', 'lstm'])
+    parser.add_argument('--rows', type=int, default=8000)
+    parser.add_argument('--classes', type=int, default=15)
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--workers', nargs='+', type=int, default=[0, 1, 2, 4])
+    parser.add_argument('--steps', type=int, default=60)
+    args = parser.parse_args()
+
+    from augment import SignalAugmenter
+    from sampling import keras_dataset
+
+    rng = np.random.default_rng(0)
+    X = rng.standard_normal((args.rows, 361))
+    y = rng.integers(0, args.classes, args.rows)
+    indices = np.arange(args.rows)
+    augmenter = SignalAugmenter(AUGMENTATION, list(range(args.classes)))
+
+    print_summary('pipeline no augmentation', {
+        'batches_per_s': pipeline_rate(X, y, indices, args.classes, args.batch_size, None, 0)})
+    for workers in args.workers:
+        print_summary(f'pipeline augment w={workers}', {
+            'batches_per_s': pipeline_rate(X, y, indices, args.classes, args.batch_size, augmenter, workers)})
+
+    steps_indices = indices[:args.steps * args.batch_size]
+    for model_choice in args.model:
+        summary = {}
+        for name, augment, workers in [('plain', None, 0), ('augmented', augmenter, 2)]:
+            model = build_model(model_choice, X.shape[1], args.classes)
+            dataset = keras_dataset(X, y, steps_indices, args.classes, args.batch_size, seed=0,
+                                    augment=augment, workers=workers)
+            model.fit(dataset.take(3), epochs=1, verbose=0)  # tracing and first-batch costs
+            started = time.perf_counter()
+            model.fit(dataset, epochs=1, verbose=0)
+            summary[f'{name}_steps_per_s'] = args.steps / (time.perf_counter() - started)
+        print_summary(f'fit {model_choice}', summary)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""
+Throughput of /analyze/batch (one zip upload) vs looping over /analyze, one file per request.
+
+Every recording is distinct so the result cache never answers; the loop also pays for
+its plot, as /analyze always renders one.
+
+    python benchmarks/bench_batch.py --model deep --files 50 200
+"""
+import argparse
+import io
+import json
+import os
+import time
+import zipfile
+import numpy as np
+import _common
+from _common import print_summary
+from fastapi.testclient import TestClient
+
+os.environ['ECG_RESULT_CACHE'] = '0'  # every /analyze call does the full work
+import lambda_function
+
+
+def make_recordings(count, length=3600):
+    rng = np.random.default_rng(0)
+    t = np.arange(length) / 360
+    recordings = []
+    for i in range(count):
+        signal = np.sin(2 * np.pi * rng.uniform(0.8, 2.0) * t) + 0.05 * rng.standard_normal(length)
+        recordings.append((f"recording_{i}.csv", "\n".join(f"{v:.5f}" for v in signal).encode()))
+    return recordings
+
+
+def make_zip(recordings):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for name, content in recordings:
+            archive.writestr(name, content)
+    return buffer.getvalue()
+
+
+def run_loop(client, recordings, model):
+    started = time.perf_counter()
+    for name, content in recordings:
+        response = client.post('/analyze', files={'file': (name, content, 'text/csv')},
+                               data={'model_choice': model})
+        assert 'error' not in response.json(), response.json()
+    elapsed = time.perf_counter() - started
+    return {'files': len(recordings), 'seconds': elapsed, 'files_per_s': len(recordings) / elapsed}
+
+
+def run_batch(client, recordings, model, include_plot):
+    archive = make_zip(recordings)
+    started = time.perf_counter()
+    response = client.post('/analyze/batch', files={'files': ('ward.zip', archive, 'application/zip')},
+                           data={'model_choice': model, 'include_plot': str(include_plot).lower()})
+    lines = [json.loads(line) for line in response.iter_lines() if line]
+    elapsed = time.perf_counter() - started
+    errors = [line for line in lines if 'error' in line]
+    assert len(lines) == len(recordings) and not errors, errors[:3]
+    return {'files': len(lines), 'seconds': elapsed, 'files_per_s': len(lines) / elapsed}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--model', default='deep')
+    parser.add_argument('--files', type=int, nargs='+', default=[50, 200])
+    args = parser.parse_args()
+
+    with TestClient(lambda_function.app) as client:
+        run_loop(client, make_recordings(2), args.model)  # load the model and start the pools
+        for count in args.files:
+            recordings = make_recordings(count)
+            print_summary(f"loop /analyze x{count}", run_loop(client, recordings, args.model))
+            print_summary(f"batch {count} no plot", run_batch(client, recordings, args.model, False))
+            print_summary(f"batch {count} with plot", run_batch(client, recordings, args.model, True))
+
+
+if __name__ == '__main__':
+    main()
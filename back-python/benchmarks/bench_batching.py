@@ -0,0 +1,70 @@
+"""
+Load test: per-request predict_ecg vs the micro-batching InferenceScheduler.
+
+    python benchmarks/bench_batching.py --model deep --concurrency 32 --requests 20
+"""
+import argparse
+import threading
+import time
+import numpy as np
+import _common
+from _common import latency_summary, print_summary
+from analyse import load_model, predict_ecg, resize_ecg_data
+from batching import InferenceScheduler
+
+
+def run_load(call, concurrency, requests_per_client, signal):
+    latencies = []
+    lock = threading.Lock()
+    barrier = threading.Barrier(concurrency)
+
+    def client():
+        local = []
+        barrier.wait()
+        for _ in range(requests_per_client):
+            started = time.perf_counter()
+            call(signal)
+            local.append(time.perf_counter() - started)
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return latency_summary(latencies, time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--model', default='deep')
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--requests', type=int, default=20, help='requests per client')
+    parser.add_argument('--max-batch-size', type=int, default=32)
+    parser.add_argument('--max-wait-ms', type=float, default=5)
+    args = parser.parse_args()
+
+    model = load_model(args.model)
+    signal = resize_ecg_data(np.random.default_rng(0).standard_normal(361))
+    predict_ecg(model, signal, args.model)  # warm-up
+
+    def per_request(x):
+        return predict_ecg(model, x, args.model)
+
+    scheduler = InferenceScheduler(lambda m, rows: predict_ecg(model, rows, m),
+                                   max_batch_size=args.max_batch_size, max_wait_ms=args.max_wait_ms)
+
+    def batched(x):
+        return scheduler.predict(args.model, x)
+
+    print(f"model={args.model} concurrency={args.concurrency} requests/client={args.requests}")
+    print_summary('per-request', run_load(per_request, args.concurrency, args.requests, signal))
+    print_summary('micro-batched', run_load(batched, args.concurrency, args.requests, signal))
+    print(f"scheduler: {scheduler.stats()}")
+    scheduler.shutdown()
+
+
+if __name__ == '__main__':
+    main()
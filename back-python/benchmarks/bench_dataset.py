@@ -0,0 +1,86 @@
+"""
+Training data loading: the former serial walk (read every file on each run) vs the parallel
+dataset build (dataset.py) and the memory-mapped reopen used by later runs.
+
+Without --data, writes a synthetic tree of --files single-row CSV records (361 samples each,
+named like data/AR: <record>_<id>_<label>_full.csv).
+
+    python benchmarks/bench_dataset.py --files 5000 --workers 1 4 8
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+import numpy as np
+import _common
+from _common import print_summary
+
+
+def write_synthetic(directory, count, length=361, labels=('N', 'VF', 'AFIB', 'SVTA')):
+    rng = np.random.default_rng(0)
+    for i in range(count):
+        label = labels[i % len(labels)]
+        folder = os.path.join(directory, label)
+        os.makedirs(folder, exist_ok=True)
+        row = ','.join(f'{v:.18e}' for v in rng.random(length))
+        with open(os.path.join(folder, f'rec_{i:05d}_{label}_full.csv'), 'w') as f:
+            f.write(row + '\n')
+
+
+def serial_load(base_dir, file_type):
+    # load_and_label_data before the dataset cache
+    from reader import get_file_paths, read_ecg_file_csv
+    data, labels = [], []
+    for filepath in get_file_paths(base_dir, file_type):
+        X = read_ecg_file_csv(filepath)
+        if X is not None:
+            data.append(X)
+            labels.append(os.path.basename(filepath).split('_')[2])
+    return np.array(data), np.array(labels)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--data', help="Existing data directory (see ia.base_dir)")
+    parser.add_argument('--file-type', default='full')
+    parser.add_argument('--files', type=int, default=3000)
+    parser.add_argument('--workers', nargs='+', type=int, default=[1, 4, os.cpu_count() or 1])
+    args = parser.parse_args()
+
+    # The per-file signal cache would hide the parsing cost of the serial path
+    os.environ['ECG_SIGNAL_CACHE'] = '0'
+    import reader
+    reader.SIGNAL_CACHE_ENABLED = False
+    from dataset import build_dataset, load_dataset
+
+    work_dir = tempfile.mkdtemp(prefix='bench_dataset_')
+    base_dir = args.data or os.path.join(work_dir, 'AR')
+    output_dir = os.path.join(work_dir, 'dataset')
+    if not args.data:
+        write_synthetic(base_dir, args.files)
+
+    try:
+        started = time.perf_counter()
+        X_serial, labels_serial = serial_load(base_dir, args.file_type)
+        print_summary('serial read', {'files': len(labels_serial), 'seconds': time.perf_counter() - started})
+
+        for workers in args.workers:
+            started = time.perf_counter()
+            index = build_dataset(base_dir, args.file_type, workers=workers, output_dir=output_dir)
+            print_summary(f'build workers={workers}', {'files': index['count'],
+                                                       'seconds': time.perf_counter() - started})
+
+        for check in (True, False):
+            started = time.perf_counter()
+            X, labels = load_dataset(base_dir, args.file_type, check=check, output_dir=output_dir)
+            elapsed = time.perf_counter() - started
+            print_summary(f'reopen check={check}', {'files': len(labels), 'ms': elapsed * 1000,
+                                                    'identical': bool(np.array_equal(X, X_serial)
+                                                                      and np.array_equal(labels, labels_serial))})
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
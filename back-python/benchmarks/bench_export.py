@@ -0,0 +1,150 @@
+"""
+Keras (.h5) vs exported TFLite artifacts (export.py): single-row latency, resident memory
+of a worker that loads only the runtime and the model, and accuracy deltas.
+
+The held-out set is the 20 % test split of --data (as in ia.py), scored against the true
+labels. Without --data it falls back to 361-sample windows of uploaded_files/*.csv and only
+reports agreement with the Keras model.
+
+    python benchmarks/bench_export.py --model deep lstm rnn --data data/AR
+"""
+import argparse
+import glob
+import multiprocessing
+import os
+import tempfile
+import time
+import numpy as np
+import _common
+from _common import print_summary
+
+QUANTIZATIONS = ['none', 'float16', 'dynamic', 'int8']
+
+
+def _rss():
+    import psutil
+    return psutil.Process(os.getpid()).memory_info().rss
+
+
+def measure(runtime, path, X, repeat, queue):
+    """Runs in a fresh process so that RSS only counts this runtime and model."""
+    rss_before = _rss()
+    if runtime == 'keras':
+        import tensorflow as tf
+        model = tf.keras.models.load_model(path)
+        fn = tf.function(lambda x: model(x, training=False))
+
+        def predict(rows):
+            return fn(rows[..., np.newaxis].astype(np.float32)).numpy()
+    else:
+        from tflite_model import TFLiteModel
+        model = TFLiteModel(path)
+
+        def predict(rows):
+            return model.predict(rows[..., np.newaxis])
+
+    predict(X[:1])
+    rss_loaded = _rss() - rss_before
+    latencies = []
+    for i in range(repeat):
+        started = time.perf_counter()
+        predict(X[i % len(X):i % len(X) + 1])
+        latencies.append(time.perf_counter() - started)
+    probabilities = np.concatenate([predict(X[i:i + 1]) for i in range(len(X))])
+    queue.put({
+        'rss_mb': rss_loaded / 1024 / 1024,
+        'p50_ms': float(np.percentile(latencies, 50)) * 1000,
+        'p99_ms': float(np.percentile(latencies, 99)) * 1000,
+        'probabilities': probabilities,
+    })
+
+
+def run_isolated(runtime, path, X, repeat):
+    context = multiprocessing.get_context('spawn')
+    queue = context.Queue()
+    process = context.Process(target=measure, args=(runtime, path, X, repeat, queue))
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+
+def load_holdout(data_dir, file_type):
+    from sklearn.model_selection import train_test_split
+    from analyse import load_label_encoder
+    from management import load_and_label_data, normalize_data
+    X, labels = load_and_label_data(data_dir, file_type)
+    X = normalize_data(X)
+    y = load_label_encoder().transform(labels)
+    X_train, X_test, _, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+    return X_train, X_test, y_test
+
+
+def load_windows(length, max_windows=500):
+    from reader import load_signal, ECGReadError
+    from management import normalize_data
+    windows = []
+    for path in sorted(glob.glob('uploaded_files/*.csv')):
+        try:
+            X = normalize_data(load_signal(path, use_cache=False))
+        except ECGReadError:
+            continue
+        for start in range(0, len(X) - length + 1, length // 2):
+            windows.append(X[start:start + length])
+    windows = np.asarray(windows[:max_windows], dtype=np.float64)
+    return windows, windows, None
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--model', nargs='+', default=['deep', 'lstm', 'rnn'])
+    parser.add_argument('--data', help="Training data directory (see ia.base_dir)")
+    parser.add_argument('--file-type', default='full')
+    parser.add_argument('--quantization', nargs='+', choices=QUANTIZATIONS, default=QUANTIZATIONS)
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    import tensorflow as tf
+    from analyse import TARGET_LENGTHS
+    from export import export_tflite
+
+    if args.data:
+        X_calibration, X, y = load_holdout(args.data, args.file_type)
+    else:
+        X_calibration, X, y = load_windows(TARGET_LENGTHS[args.file_type])
+    print(f"held-out: {len(X)} signals ({'labelled' if y is not None else 'agreement with Keras only'})")
+
+    output_dir = tempfile.mkdtemp(prefix='bench_export_')
+    for model_choice in args.model:
+        keras_path = os.path.join('models', args.file_type, f'{model_choice}_model.h5')
+        if not os.path.exists(keras_path):
+            print(f"{model_choice}: {keras_path} not found, skipped")
+            continue
+        model = tf.keras.models.load_model(keras_path)
+
+        reference = run_isolated('keras', keras_path, X, args.repeat)
+        runs = [('keras', reference, os.path.getsize(keras_path))]
+        for quantization in args.quantization:
+            path = os.path.join(output_dir, f'{model_choice}_{quantization}.tflite')
+            try:
+                export_tflite(model, path, quantization, representative_data=X_calibration[..., np.newaxis])
+            except Exception as e:
+                print(f"{model_choice} tflite/{quantization}: export failed ({e})")
+                continue
+            runs.append((f'tflite/{quantization}', run_isolated('tflite', path, X, args.repeat),
+                         os.path.getsize(path)))
+
+        reference_probabilities = reference['probabilities']
+        for name, result, size in runs:
+            probabilities = result.pop('probabilities')
+            summary = dict(result, file_kb=size / 1024)
+            summary['agreement'] = float(np.mean(
+                probabilities.argmax(axis=1) == reference_probabilities.argmax(axis=1)))
+            summary['max_abs_dprob'] = float(np.abs(probabilities - reference_probabilities).max())
+            if y is not None:
+                summary['accuracy'] = float(np.mean(probabilities.argmax(axis=1) == y))
+            print_summary(f"{model_choice} {name}", summary)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""
+Cold start of the API: import-time profile of lambda_function (python -X importtime) and the
+time from a fresh interpreter to the first response of non-inference and inference endpoints.
+
+    python benchmarks/bench_importtime.py --top 20
+"""
+import argparse
+import os
+import subprocess
+import sys
+import _common
+from _common import BACKEND_DIR
+
+# Run in a fresh interpreter: import the app, then time the first call of each endpoint
+COLD_START_SCRIPT = """
+import time
+started = time.perf_counter()
+import lambda_function
+imported = time.perf_counter()
+from fastapi.testclient import TestClient
+client = TestClient(lambda_function.app).__enter__()  # runs the startup handlers, as Mangum does
+timings = {'import lambda_function': imported - started, 'startup handlers': time.perf_counter() - imported}
+for name, call in [
+    ('GET /', lambda: client.get('/')),
+    ('GET /score/stats', lambda: client.get('/score/stats')),
+    ('POST /analyze', lambda: client.post('/analyze', data={'model_choice': '%(model)s'},
+                                          files={'file': ('ecg.csv', open('%(csv)s', 'rb'), 'text/csv')})),
+]:
+    t = time.perf_counter()
+    call()
+    timings[name] = time.perf_counter() - t
+    timings[name + ' (since start)'] = time.perf_counter() - started
+for name, value in timings.items():
+    print(f"{name:<36} {value * 1000:9.1f} ms")
+client.__exit__(None, None, None)
+"""
+
+
+def import_profile(module):
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                            cwd=BACKEND_DIR, capture_output=True, text=True)
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        rows.append((int(cumulative_us), int(self_us), name[1:]))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--module', default='lambda_function')
+    parser.add_argument('--top', type=int, default=20)
+    parser.add_argument('--model', default='deep')
+    parser.add_argument('--csv', default='uploaded_files/patient_test.csv')
+    args = parser.parse_args()
+
+    rows = import_profile(args.module)
+    total = next((cumulative for cumulative, _, name in rows if name == args.module), 0)
+    print(f"import {args.module}: {total / 1000:.1f} ms (python -X importtime)")
+    print(f"{'cumulative ms':>14} {'self ms':>9}  module imported by {args.module}")
+    direct = [row for row in rows if row[2].startswith('  ') and not row[2].startswith('   ')]
+    for cumulative, self_us, name in sorted(direct, reverse=True)[:args.top]:
+        print(f"{cumulative / 1000:14.1f} {self_us / 1000:9.1f}  {name.strip()}")
+
+    print("\ncold start (fresh interpreter):")
+    # Lambda defaults: no pre-warm at startup (see lambda_function.PREWARM)
+    env = dict(os.environ, TF_CPP_MIN_LOG_LEVEL='3', AWS_LAMBDA_FUNCTION_NAME='bench_importtime')
+    script = COLD_START_SCRIPT % {'model': args.model, 'csv': args.csv}
+    result = subprocess.run([sys.executable, '-c', script], cwd=BACKEND_DIR, env=env, capture_output=True, text=True)
+    print(result.stdout or result.stderr[-2000:])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+"""
+Cost of the /metrics instrumentation: one metrics.stage() timer (enabled and disabled), the
+same under contention from several threads, and the time to render a scrape; then the share
+of the instrumentation in analyze_ecg on an in-memory CSV (default: deep model).
+
+    python benchmarks/bench_metrics.py --threads 8 --model deep
+"""
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import _common
+from _common import print_summary, timeit
+import metrics
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--calls', type=int, default=200000)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--model', default='deep')
+    args = parser.parse_args()
+
+    def timers(n):
+        for _ in range(n):
+            with metrics.stage('bench', 'model'):
+                pass
+
+    def bare(n):
+        for _ in range(n):
+            pass
+
+    base = timeit(lambda: bare(args.calls), repeat=3)
+    enabled = timeit(lambda: timers(args.calls), repeat=3)
+    metrics.METRICS_ENABLED = False
+    disabled = timeit(lambda: timers(args.calls), repeat=3)
+    metrics.METRICS_ENABLED = True
+    print_summary('stage timer', {'enabled_us': (enabled - base) / args.calls * 1e6,
+                                  'disabled_us': (disabled - base) / args.calls * 1e6})
+
+    per_thread = args.calls // args.threads
+    with ThreadPoolExecutor(max_workers=args.threads) as executor:
+        started = time.perf_counter()
+        list(executor.map(timers, [per_thread] * args.threads))
+        elapsed = time.perf_counter() - started
+    print_summary(f'stage timer t={args.threads}', {'us_per_call': elapsed / (per_thread * args.threads) * 1e6})
+
+    for i in range(200):
+        metrics.STAGE_SECONDS.observe(0.01, f'stage_{i % 10}', f'model_{i // 10}', '/analyze')
+    print_summary('scrape', {'series': len(metrics.STAGE_SECONDS.snapshot()),
+                             'render_ms': timeit(metrics.registry.render, repeat=20) * 1000})
+
+    import analyse
+    csv = '\n'.join(str(v) for v in np.sin(np.linspace(0, 20, 1000))).encode()
+    analyse.analyze_ecg(csv, args.model, include_plot=False, use_cache=False)
+    metrics.METRICS_ENABLED = False
+    off = timeit(lambda: analyse.analyze_ecg(csv, args.model, include_plot=False, use_cache=False), repeat=50)
+    metrics.METRICS_ENABLED = True
+    on = timeit(lambda: analyse.analyze_ecg(csv, args.model, include_plot=False, use_cache=False), repeat=50)
+    print_summary(f'analyze_ecg {args.model}', {'metrics_off_ms': off * 1000, 'metrics_on_ms': on * 1000,
+                                                'overhead_pct': (on - off) / off * 100})
+    analyse.inference_scheduler.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""
+NumPy forward pass (numpy_model.py, weights from export.export_npz) vs Keras and TFLite:
+agreement with Keras on random signals, per-batch latency, and a check that serving with
+ECG_MODEL_RUNTIME=numpy never imports TensorFlow.
+
+    python benchmarks/bench_numpy_infer.py --model deep lstm rnn --batch 1 32 256
+"""
+import argparse
+import os
+import subprocess
+import sys
+import numpy as np
+import _common
+from _common import BACKEND_DIR, print_summary, timeit
+
+# Fresh interpreter: a prediction through analyse with the NumPy runtime only
+TF_FREE_SCRIPT = """
+import sys
+import numpy as np
+import analyse
+analyse.predict_ecg(analyse.load_model('%(model)s'), np.zeros(361), '%(model)s')
+print('tensorflow' in sys.modules)
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--model', nargs='+', default=['deep', 'lstm', 'rnn'])
+    parser.add_argument('--file-type', default='full')
+    parser.add_argument('--batch', nargs='+', type=int, default=[1, 32, 256])
+    parser.add_argument('--tolerance', type=float, default=1e-4)
+    args = parser.parse_args()
+
+    import tensorflow as tf
+    from export import export_npz, npz_path, tflite_path
+    from numpy_model import NumpyModel
+    from tflite_model import TFLiteModel
+
+    failed = False
+    for model_choice in args.model:
+        keras_path = os.path.join('models', args.file_type, f'{model_choice}_model.h5')
+        if not os.path.exists(keras_path):
+            print(f"{model_choice}: {keras_path} not found, skipped")
+            continue
+        model = tf.keras.models.load_model(keras_path)
+        if not os.path.exists(npz_path(keras_path)):
+            export_npz(model, npz_path(keras_path), args.tolerance)
+        runtimes = {'numpy': NumpyModel(npz_path(keras_path)).predict}
+        keras_fn = tf.function(lambda x: model(x, training=False))
+        runtimes['keras'] = lambda X: keras_fn(X).numpy()
+        if os.path.exists(tflite_path(keras_path)):
+            runtimes['tflite'] = TFLiteModel(tflite_path(keras_path)).predict
+
+        rng = np.random.default_rng(0)
+        X = rng.standard_normal((max(args.batch),) + tuple(model.input_shape[1:])).astype(np.float32)
+        reference = runtimes['keras'](X)
+        error = float(np.abs(runtimes['numpy'](X) - reference).max())
+        failed |= error > args.tolerance
+        print_summary(f"{model_choice} agreement", {
+            'max_abs_dprob': f'{error:.1e}',
+            'argmax_agreement': float(np.mean(runtimes['numpy'](X).argmax(1) == reference.argmax(1))),
+            'within_tolerance': error <= args.tolerance,
+        })
+        for batch in args.batch:
+            rows = X[:batch]
+            summary = {}
+            for name, predict in runtimes.items():
+                predict(rows)
+                summary[f'{name}_us'] = timeit(lambda: predict(rows), repeat=5, number=3) * 1e6
+            print_summary(f"{model_choice} batch={batch}", summary)
+
+    env = dict(os.environ, ECG_MODEL_RUNTIME='numpy', ECG_BATCHING='0')
+    script = TF_FREE_SCRIPT % {'model': args.model[0]}
+    result = subprocess.run([sys.executable, '-c', script], cwd=BACKEND_DIR, env=env, capture_output=True, text=True)
+    print(f"tensorflow imported when serving with ECG_MODEL_RUNTIME=numpy: "
+          f"{result.stdout.strip() or result.stderr[-2000:]}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+"""
+Signal conditioning (preprocessing.py): each stage on a batch of signals in one call vs one
+call per signal, the filter design cost saved by the coefficient cache, and the full
+SignalConditioner on a training-sized batch and on one long recording.
+
+    python benchmarks/bench_preprocessing.py --signals 4096 --length 500 --rate 500
+"""
+import argparse
+import numpy as np
+import _common
+from _common import print_summary, timeit
+import preprocessing
+from preprocessing import SignalConditioner, resample, remove_baseline, apply_filters, filter_sos
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--signals', type=int, default=4096)
+    parser.add_argument('--length', type=int, default=500, help="Samples per signal, at --rate")
+    parser.add_argument('--rate', type=float, default=500.0, help="Sampling rate of the input signals")
+    parser.add_argument('--minutes', type=float, default=30.0, help="Duration of the long recording")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    X = rng.standard_normal((args.signals, args.length))
+    fs = preprocessing.TARGET_SAMPLING_RATE
+    at_target = resample(X, args.rate)
+    sos = filter_sos(('bandpass', 'notch'), fs)
+
+    stages = [
+        ('resample', X, lambda X: resample(X, args.rate)),
+        ('baseline', at_target, lambda X: remove_baseline(X, fs)),
+        ('bandpass+notch', at_target, lambda X: apply_filters(X, sos)),
+    ]
+    for name, data, stage in stages:
+        batched = timeit(lambda: stage(data), repeat=3)
+        per_signal = timeit(lambda: [stage(row) for row in data], repeat=1)
+        print_summary(name, {'batch_ms': batched * 1000, 'per_signal_ms': per_signal * 1000,
+                             'speedup': per_signal / batched})
+
+    cached = timeit(lambda: filter_sos(('bandpass', 'notch'), fs), repeat=5, number=1000)
+    designed = timeit(lambda: filter_sos.__wrapped__(('bandpass', 'notch'), fs), repeat=5, number=20)
+    print_summary('filter design', {'cached_us': cached * 1e6, 'designed_us': designed * 1e6})
+
+    conditioner = SignalConditioner('baseline,bandpass,notch')
+    batch = X.astype(np.float32)
+    print_summary(f'conditioner {args.signals}x{args.length}', {
+        'ms': timeit(lambda: conditioner(batch, args.rate), repeat=3) * 1000,
+        'no_stages_us': timeit(lambda: SignalConditioner('')(batch), repeat=5, number=100) * 1e6,
+    })
+    recording = rng.standard_normal(int(args.minutes * 60 * args.rate))
+    print_summary(f'conditioner {args.minutes:g} min', {
+        'ms': timeit(lambda: conditioner(recording, args.rate), repeat=3) * 1000})
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,47 @@
+"""
+reader.load_signal (NumPy fast path, cold and memory-mapped cache) vs the former pandas path.
+
+    python benchmarks/bench_reader.py
+"""
+import glob
+import os
+import tempfile
+import numpy as np
+import pandas as pd
+import _common
+from _common import timeit
+import reader
+
+
+def pandas_path(path):
+    return pd.read_csv(path, header=None).values.flatten()
+
+
+def main():
+    tall = os.path.join(tempfile.gettempdir(), 'bench_reader_tall.csv')
+    rng = np.random.default_rng(0)
+    with open(tall, 'w') as f:
+        f.write('time,voltage\n')
+        for i, v in enumerate(rng.standard_normal(360 * 600)):
+            f.write(f"{i / 360:.6f},{v:.6f}\n")
+
+    files = [f for f in sorted(glob.glob('uploaded_files/*.csv')) if os.path.getsize(f) > 16] + [tall]
+    print(f"{'file':<48} {'pandas ms':>10} {'parse ms':>10} {'cached ms':>10}")
+    for path in files:
+        try:
+            reader.load_signal(path, use_cache=False)
+        except reader.ECGReadError as e:
+            print(f"{os.path.basename(path):<48} skipped ({e})")
+            continue
+        reader.load_signal(path)  # fill the cache
+        row = [
+            timeit(lambda: pandas_path(path)),
+            timeit(lambda: reader.load_signal(path, use_cache=False)),
+            timeit(lambda: reader.load_signal(path, use_cache=True)),
+        ]
+        print(f"{os.path.basename(path):<48} " + " ".join(f"{t * 1000:>10.3f}" for t in row))
+    os.remove(tall)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,31 @@
+"""
+Render time of the legacy matplotlib plot vs the NumPy/Pillow raster and the JSON polyline.
+
+    python benchmarks/bench_render.py
+"""
+import json
+import _common
+from _common import timeit
+from management import normalize_data
+from reader import load_signal, plot_ecg_medical_to_base64
+from render import render_ecg_png_base64, ecg_polyline
+
+FILES = ['uploaded_files/patient_test.csv', 'uploaded_files/ecg_extracted_physionet.csv']
+
+
+def main():
+    print(f"{'file':<32} {'samples':>8} {'matplotlib ms':>14} {'raster ms':>10} {'polyline ms':>12} "
+          f"{'png KB':>7} {'json KB':>8}")
+    for path in FILES:
+        X = normalize_data(load_signal(path))
+        legacy = timeit(lambda: plot_ecg_medical_to_base64(X), repeat=3)
+        raster = timeit(lambda: render_ecg_png_base64(X), repeat=5)
+        polyline = timeit(lambda: ecg_polyline(X), repeat=5)
+        png_kb = len(render_ecg_png_base64(X)) / 1024
+        json_kb = len(json.dumps(ecg_polyline(X))) / 1024
+        print(f"{path.split('/')[-1]:<32} {len(X):>8} {legacy * 1000:>14.1f} {raster * 1000:>10.1f} "
+              f"{polyline * 1000:>12.2f} {png_kb:>7.0f} {json_kb:>8.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+"""
+Training results logging: time to record one run with the old read / concat / rewrite of the
+whole CSV vs one ResultsStore.append (SQLite WAL), as the history grows; then several processes
+appending at once, checking that no run is lost.
+
+    python benchmarks/bench_results_store.py --history 100 1000 10000 --processes 4
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+import multiprocessing
+import numpy as np
+import pandas as pd
+import _common
+from _common import print_summary, timeit
+from results_store import ResultsStore
+
+LABELS = [str(label) for label in range(16)] + ['macro avg', 'weighted avg']
+
+
+def fake_run(rng):
+    record = {'model': 'rf', 'parameters': "{'n_estimators': 100}", 'file_type': 'full',
+              'balancing_method': 'under', 'augmentation_factor': 1, 'accuracy': rng.random(),
+              'precision': rng.random(), 'recall': rng.random(), 'f1_score': rng.random(),
+              'cpu_usage': 50.0, 'ram_usage': 40.0}
+    classes = {label: {'precision': rng.random(), 'recall': rng.random(), 'f1-score': rng.random()}
+               for label in LABELS}
+    return record, classes
+
+
+def csv_row(record, classes):
+    # Same layout as the former ressources.evaluate_and_log_results
+    from results_store import COLUMNS
+    row = {column: [record[field]] for column, field in COLUMNS}
+    for label, metrics in classes.items():
+        row[f'Precision_Class_{label}'] = [metrics['precision']]
+        row[f'Recall_Class_{label}'] = [metrics['recall']]
+        row[f'F1_Class_{label}'] = [metrics['f1-score']]
+    return pd.DataFrame(row)
+
+
+def csv_append(csv_file, record, classes):
+    df = csv_row(record, classes)
+    if os.path.exists(csv_file):
+        df = pd.concat([pd.read_csv(csv_file), df], ignore_index=True)
+    df.to_csv(csv_file, index=False)
+
+
+def _writer(db_path, count, seed):
+    rng = np.random.default_rng(seed)
+    store = ResultsStore(db_path)
+    for _ in range(count):
+        store.append(*fake_run(rng))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--history', nargs='+', type=int, default=[100, 1000, 10000])
+    parser.add_argument('--processes', type=int, default=4)
+    parser.add_argument('--appends', type=int, default=200, help="Appends per process")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    work_dir = tempfile.mkdtemp(prefix='bench_results_')
+    try:
+        for history in args.history:
+            csv_file = os.path.join(work_dir, f'history_{history}.csv')
+            db_path = os.path.join(work_dir, f'history_{history}.db')
+            runs = [fake_run(rng) for _ in range(history)]
+            pd.concat([csv_row(*run) for run in runs], ignore_index=True).to_csv(csv_file, index=False)
+            store = ResultsStore(db_path, legacy_csv=csv_file)
+            csv_s = timeit(lambda: csv_append(csv_file, *fake_run(rng)), repeat=5)
+            db_s = timeit(lambda: store.append(*fake_run(rng)), repeat=20)
+            summary_s = timeit(lambda: store.summary(), repeat=5)
+            export_s = timeit(lambda: store.export_csv(os.path.join(work_dir, 'export.csv')), repeat=3)
+            print_summary(f'history={history}', {'csv_append_ms': csv_s * 1000, 'store_append_ms': db_s * 1000,
+                                                 'speedup': csv_s / db_s, 'summary_ms': summary_s * 1000,
+                                                 'export_ms': export_s * 1000})
+
+        db_path = os.path.join(work_dir, 'concurrent.db')
+        ResultsStore(db_path)
+        context = multiprocessing.get_context('spawn')
+        writers = [context.Process(target=_writer, args=(db_path, args.appends, seed))
+                   for seed in range(args.processes)]
+        started = time.perf_counter()
+        for writer in writers:
+            writer.start()
+        for writer in writers:
+            writer.join()
+        elapsed = time.perf_counter() - started
+        runs = ResultsStore(db_path).runs()
+        expected = args.processes * args.appends
+        complete = int(runs[[f'F1_Class_{label}' for label in LABELS]].notna().all(axis=1).sum())
+        print_summary(f'concurrent p={args.processes}', {'expected': expected, 'stored': len(runs),
+                                                         'complete_rows': complete,
+                                                         'appends_per_s': expected / elapsed})
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
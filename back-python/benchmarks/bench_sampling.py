@@ -0,0 +1,80 @@
+"""
+Peak memory of the training data preparation in ia.py: the former chain of copies
+(balance_classes_by_duplication, augment_data, train_test_split, StandardScaler, expand_dims)
+vs index-based sampling (sampling.py) feeding one epoch of Keras batches.
+
+Synthetic imbalanced dataset: --classes classes of 361-sample signals, the largest class
+--max-count rows and each following one half as large (at least 10 rows).
+
+    python benchmarks/bench_sampling.py --max-count 4000 --factor 4
+"""
+import argparse
+import time
+import tracemalloc
+import numpy as np
+import _common
+from _common import print_summary
+
+
+def synthetic(classes, max_count, length=361):
+    rng = np.random.default_rng(0)
+    counts = [max(10, max_count >> i) for i in range(classes)]
+    y = np.repeat(np.arange(classes), counts)
+    return rng.standard_normal((len(y), length)), y
+
+
+def former(X, y, factor):
+    from sklearn.model_selection import train_test_split
+    from sklearn.preprocessing import StandardScaler
+    from management import balance_classes_by_duplication, augment_data
+    X, y = balance_classes_by_duplication(X, y)
+    X, y = augment_data(X, y, factor=factor)
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+    scaler = StandardScaler()
+    X_train = np.expand_dims(scaler.fit_transform(X_train), axis=2)
+    X_test = np.expand_dims(scaler.transform(X_test), axis=2)
+    return len(X_train)
+
+
+def indexed(X, y, factor, batch_size=32):
+    from sklearn.model_selection import train_test_split
+    from sampling import training_indices, standard_scaling
+    indices = training_indices(y, equal_class=True, factor=factor, seed=0)
+    train_indices, test_indices = train_test_split(indices, test_size=0.2, random_state=42)
+    mean, scale = standard_scaling(X, train_indices)
+    X -= mean
+    X /= scale
+    eye = np.eye(int(y.max()) + 1, dtype=np.float32)
+    # One epoch of the batches keras_dataset would yield
+    for start in range(0, len(train_indices), batch_size):
+        batch = train_indices[start:start + batch_size]
+        X[batch][..., np.newaxis].astype(np.float32), eye[y[batch]]
+    return len(train_indices)
+
+
+def measure(fn, X, y, factor):
+    X = X.copy()
+    tracemalloc.start()
+    started = time.perf_counter()
+    rows = fn(X, y, factor)
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {'train_rows': rows, 'peak_mb': peak / 1024 / 1024, 'seconds': elapsed}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--classes', type=int, default=15)
+    parser.add_argument('--max-count', type=int, default=4000)
+    parser.add_argument('--factor', type=int, default=4)
+    args = parser.parse_args()
+
+    X, y = synthetic(args.classes, args.max_count)
+    print_summary('raw dataset', {'rows': len(X), 'mb': X.nbytes / 1024 / 1024})
+    print_summary('former copies', measure(former, X, y, args.factor))
+    print_summary('index sampling', measure(indexed, X, y, args.factor))
+
+
+if __name__ == '__main__':
+    main()
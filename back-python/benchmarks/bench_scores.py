@@ -0,0 +1,97 @@
+"""
+Quiz score storage: /score/stats as a full scan of `scores` (former endpoint) vs reading the
+maintained aggregates, as the table grows; then concurrent submissions, committed one session
+per request (former endpoint) vs coalesced by scores.ScoreWriter. Uses a throw-away database.
+
+    python benchmarks/bench_scores.py --rows 1000 100000 --threads 32 --submissions 2000
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+WORK_DIR = tempfile.mkdtemp(prefix='bench_scores_')
+os.environ['ECG_DATABASE_URL'] = f"sqlite:///{os.path.join(WORK_DIR, 'scores.db')}"
+
+import numpy as np
+import _common
+from _common import print_summary, timeit, latency_summary
+
+
+def full_scan_stats(db, Score):
+    scores = db.query(Score).all()
+    if not scores:
+        return {"average": 0, "numberOfUsers": 0}
+    return {"average": sum(score.value for score in scores) / len(scores), "numberOfUsers": len(scores)}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', nargs='+', type=int, default=[1000, 10000, 100000])
+    parser.add_argument('--threads', type=int, default=32)
+    parser.add_argument('--submissions', type=int, default=2000)
+    args = parser.parse_args()
+
+    from sqlalchemy import delete
+    from database import SessionLocal, engine, Base
+    from models import Score, ScoreTotals, ScoreBucket
+    from scores import ScoreWriter, write_scores, read_stats
+    Base.metadata.create_all(bind=engine)
+    rng = np.random.default_rng(0)
+
+    def reset():
+        with SessionLocal() as db:
+            for table in (Score, ScoreTotals, ScoreBucket):
+                db.execute(delete(table))
+            db.commit()
+
+    for rows in args.rows:
+        reset()
+        with SessionLocal() as db:
+            write_scores(db, rng.integers(0, 11, rows).tolist())
+            db.commit()
+        with SessionLocal() as db:
+            assert abs(full_scan_stats(db, Score)['average'] - read_stats(db)['average']) < 1e-9
+            scan_s = timeit(lambda: full_scan_stats(db, Score), repeat=3)
+            aggregate_s = timeit(lambda: read_stats(db), repeat=20)
+        print_summary(f'stats rows={rows}', {'full_scan_ms': scan_s * 1000, 'aggregates_ms': aggregate_s * 1000,
+                                             'speedup': scan_s / aggregate_s})
+
+    values = rng.integers(0, 11, args.submissions).tolist()
+
+    def per_request(value):
+        started = time.perf_counter()
+        with SessionLocal() as db:
+            score = Score(value=value)
+            db.add(score)
+            db.commit()
+            db.refresh(score)
+        return time.perf_counter() - started
+
+    writer = ScoreWriter()
+
+    def coalesced(value):
+        started = time.perf_counter()
+        writer.submit(value).result()
+        return time.perf_counter() - started
+
+    for name, submit in [('per-request commit', per_request), ('score writer', coalesced)]:
+        reset()
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.threads) as executor:
+            latencies = list(executor.map(submit, values))
+        summary = latency_summary(latencies, time.perf_counter() - started)
+        with SessionLocal() as db:
+            summary['stored'] = db.query(Score).count()
+        print_summary(name, summary)
+    print_summary('score writer batches', writer.stats())
+    writer.shutdown()
+
+
+if __name__ == '__main__':
+    try:
+        main()
+    finally:
+        shutil.rmtree(WORK_DIR, ignore_errors=True)
@@ -0,0 +1,72 @@
+"""
+How many real-time 360 Hz streams one worker sustains.
+
+Each simulated stream pushes 100 ms chunks in real time through a StreamSession and awaits
+the batched classification of every completed window, like the /analyze/stream handler.
+A level is sustained when the p99 window latency stays below the stride duration.
+
+    python benchmarks/bench_streaming.py --model deep --streams 16 64 256 --duration 10
+"""
+import argparse
+import asyncio
+import time
+import numpy as np
+import _common
+from _common import latency_summary, print_summary
+from analyse import TARGET_LENGTHS, MODEL_SAMPLING_RATE, file_type, load_model, predict_ecg
+from batching import InferenceScheduler
+from streaming import StreamSession, normalize_window
+
+CHUNK_SECONDS = 0.1
+
+
+async def run_stream(scheduler, model_choice, stride, duration, signal, latencies):
+    session = StreamSession(window=TARGET_LENGTHS[file_type], stride=stride)
+    chunk = int(MODEL_SAMPLING_RATE * CHUNK_SECONDS)
+    started = time.perf_counter()
+    for i in range(int(duration / CHUNK_SECONDS)):
+        # Wait until this chunk would have been recorded
+        delay = started + i * CHUNK_SECONDS - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        offset = (i * chunk) % (len(signal) - chunk)
+        for _, _, window in session.push(signal[offset:offset + chunk]):
+            pushed = time.perf_counter()
+            await asyncio.wrap_future(scheduler.submit(model_choice, normalize_window(window)))
+            latencies.append(time.perf_counter() - pushed)
+
+
+async def run_level(scheduler, model_choice, streams, stride, duration, signal):
+    latencies = []
+    started = time.perf_counter()
+    await asyncio.gather(*[
+        run_stream(scheduler, model_choice, stride, duration, np.roll(signal, i * 7), latencies)
+        for i in range(streams)
+    ])
+    return latency_summary(latencies, time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--model', default='deep')
+    parser.add_argument('--streams', type=int, nargs='+', default=[16, 64, 256])
+    parser.add_argument('--stride', type=int, default=180)
+    parser.add_argument('--duration', type=float, default=10)
+    args = parser.parse_args()
+
+    model = load_model(args.model)
+    scheduler = InferenceScheduler(lambda m, rows: predict_ecg(model, rows, m))
+    signal = np.sin(np.linspace(0, 200 * np.pi, MODEL_SAMPLING_RATE * 60))
+    budget_ms = 1000.0 * args.stride / MODEL_SAMPLING_RATE
+
+    print(f"model={args.model} stride={args.stride} ({budget_ms:.0f} ms per window) duration={args.duration}s")
+    for streams in args.streams:
+        summary = asyncio.run(run_level(scheduler, args.model, streams, args.stride, args.duration, signal))
+        summary['sustained'] = summary['p99_ms'] < budget_ms
+        print_summary(f"{streams} streams", summary)
+    print(f"scheduler: {scheduler.stats()}")
+    scheduler.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,49 @@
+"""
+Hyper-parameter sweep throughput of ia.run_sweep: the same runs with --jobs 1 and more worker
+processes (threads per job = cores / jobs). Synthetic records (see bench_dataset.py); nothing is
+saved under models/ or results/.
+
+    python benchmarks/bench_sweep.py --files 2000 --jobs 1 2 4
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+import _common
+from _common import print_summary
+from bench_dataset import write_synthetic
+
+SWEEP = [
+    {'model_choice': ['rf'], 'rf_n_estimators': [50, 100, 200]},
+    {'model_choice': ['knn'], 'knn_neighbors': [3, 5, 9]},
+    {'model_choice': ['deep'], 'dense_units': [64, 128], 'epochs': [2]},
+]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--files', type=int, default=2000)
+    parser.add_argument('--jobs', nargs='+', type=int, default=[1, os.cpu_count() or 1])
+    args = parser.parse_args()
+
+    import ia
+    work_dir = tempfile.mkdtemp(prefix='bench_sweep_')
+    try:
+        base_dir = os.path.join(work_dir, 'AR')
+        write_synthetic(base_dir, args.files)
+        runs = ia.expand_sweep(SWEEP, {'base_dir': base_dir, 'factor': 1})
+        for jobs in args.jobs:
+            started = time.perf_counter()
+            results = ia.run_sweep(runs, jobs=jobs, save='none', results_db=os.path.join(work_dir, 'results.db'),
+                                   results_csv=None)
+            elapsed = time.perf_counter() - started
+            print_summary(f'sweep jobs={jobs}', {'runs': len(results), 'seconds': elapsed,
+                                                 'runs_per_min': len(results) / elapsed * 60,
+                                                 'cores': os.cpu_count()})
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,306 @@
+"""
+Benchmark suite with stored baselines: reader, preprocessing, rendering, inference and the
+/analyze endpoint. Each case is timed over several samples (after a warm-up) and its fastest
+sample (or median) compared with the baseline recorded on the same kind of machine in
+benchmarks/baselines.json. A case that looks slower is measured again (--confirm times) and
+only reported if the slowdown reproduces; the allowed slowdown of a noisy case is widened to
+its run-to-run spread.
+
+    python benchmarks/suite.py                        # compare with the baselines
+    python benchmarks/suite.py --save                 # record (or update) the baselines
+    python benchmarks/suite.py --filter inference/deep --threshold 0.3 --output run.json
+
+Exit status 1 when a case is slower than its baseline by more than --threshold (fraction), or by
+more than --noise-factor times the combined relative stdev of both runs if that is larger.
+Caches are disabled and compute threads pinned (--threads) so that runs are comparable.
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+
+BASELINES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines.json')
+GROUPS = ['reader', 'preprocessing', 'render', 'inference', 'endpoint']
+BATCH_SIZES = [1, 32, 256]
+
+
+def configure(threads):
+    # Before any import of the modules under test: caches would turn the reader and the
+    # endpoint into lookups, and free thread counts make timings depend on the load
+    os.environ.update({'ECG_SIGNAL_CACHE': '0', 'ECG_RESULT_CACHE': '0', 'ECG_PREWARM': '0',
+                       'ECG_PROFILING': '0', 'TF_CPP_MIN_LOG_LEVEL': '3',
+                       'ECG_DATABASE_URL': f"sqlite:///{os.path.join(tempfile.gettempdir(), 'bench_suite_scores.db')}"})
+    if threads:
+        for name in ['OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS',
+                     'TF_NUM_INTRAOP_THREADS', 'TF_NUM_INTEROP_THREADS']:
+            os.environ[name] = str(threads)
+
+
+def machine_key(threads):
+    """Baselines are only compared on the same CPU model, core count, Python version and threads."""
+    cpu = platform.processor() or platform.machine()
+    try:
+        with open('/proc/cpuinfo') as f:
+            cpu = next(line.split(':', 1)[1].strip() for line in f if line.startswith('model name'))
+    except (OSError, StopIteration):
+        pass
+    python = '.'.join(platform.python_version_tuple()[:2])
+    return f"{platform.system()}-{cpu}-{os.cpu_count()}cpu-py{python}-t{threads}"
+
+
+def environment():
+    import numpy as np
+    versions = {'python': platform.python_version(), 'numpy': np.__version__}
+    for module in ['tensorflow', 'sklearn', 'fastapi']:
+        if module in sys.modules:
+            versions[module] = getattr(sys.modules[module], '__version__', None)
+    return versions
+
+
+# --------- Cases ---------
+# Each group yields (name, fn) pairs; the setup before a yield is not timed
+
+def reader_cases():
+    import glob
+    import reader
+    for path in sorted(glob.glob('uploaded_files/*.csv')):
+        try:
+            reader.load_signal(path, use_cache=False)
+        except reader.ECGReadError:
+            continue  # empty or malformed samples of the folder
+        yield f"reader/read_ecg_file_csv/{os.path.basename(path)}", lambda path=path: reader.read_ecg_file_csv(path)
+
+
+def _signal():
+    import reader
+    return reader.load_signal('uploaded_files/ecg_extracted_physionet.csv', use_cache=False)
+
+
+def preprocessing_cases():
+    import numpy as np
+    from management import normalize_data
+    from preprocessing import SignalConditioner
+    from reader import detect_significant_changes
+    X = _signal()
+    short = X[:1000]
+    yield 'preprocessing/normalize_data', lambda: normalize_data(X)
+    yield 'preprocessing/detect_significant_changes', lambda: detect_significant_changes(X)
+    yield 'preprocessing/detect_significant_changes/1000', lambda: detect_significant_changes(short)
+    conditioner = SignalConditioner('baseline,bandpass,notch')
+    batch = np.random.default_rng(0).standard_normal((256, 500)).astype(np.float32)
+    yield 'preprocessing/condition/500hz', lambda: conditioner(X, 500)
+    yield 'preprocessing/condition/batch256', lambda: conditioner(batch, 500)
+
+
+def render_cases():
+    from management import normalize_data
+    from reader import plot_ecg_medical_to_base64
+    from render import plot_ecg
+    X = normalize_data(_signal()[:5000])
+    yield 'render/plot_ecg_medical_to_base64', lambda: plot_ecg_medical_to_base64(X)
+    yield 'render/plot_ecg/png', lambda: plot_ecg(X, plot_format='png')
+    yield 'render/plot_ecg/polyline', lambda: plot_ecg(X, plot_format='polyline')
+
+
+def inference_cases():
+    import numpy as np
+    import analyse
+    model_dir = f'models/{analyse.file_type}'
+    length = analyse.TARGET_LENGTHS[analyse.file_type]
+    rng = np.random.default_rng(0)
+    batches = {size: rng.standard_normal((size, length)).astype(np.float32) for size in BATCH_SIZES}
+    for filename in sorted(os.listdir(model_dir)):
+        model_choice, _, extension = filename.partition('_model.')
+        try:
+            model = analyse._load_model_from_disk(model_choice, os.path.join(model_dir, filename))
+        except Exception as e:
+            print(f"inference/{model_choice}.{extension}: skipped ({type(e).__name__}: {e})")
+            continue
+        for size, X in batches.items():
+            yield (f"inference/{model_choice}.{extension}/b{size}",
+                   lambda model=model, X=X, model_choice=model_choice: analyse.predict_ecg(model, X, model_choice))
+
+
+def endpoint_cases():
+    from fastapi.testclient import TestClient
+    import lambda_function
+    client = TestClient(lambda_function.app)
+    with open('uploaded_files/patient_test.csv', 'rb') as f:
+        content = f.read()
+
+    def analyze(**form):
+        response = client.post('/analyze', files={'file': ('patient_test.csv', content)},
+                               data=dict({'model_choice': 'deep'}, **form))
+        if response.status_code != 200 or 'error' in response.json():
+            raise RuntimeError(f"/analyze failed: {response.text[:200]}")
+
+    yield 'endpoint/analyze/single/png', lambda: analyze()
+    yield 'endpoint/analyze/single/polyline', lambda: analyze(plot_format='polyline')
+    yield 'endpoint/analyze/windowed/png', lambda: analyze(mode='windowed')
+    yield 'endpoint/score/stats', lambda: client.get('/score/stats')
+    lambda_function.stop_workers()
+
+
+# --------- Measurement ---------
+def measure(fn, repeat, min_sample_seconds, warmup=2):
+    """Median, min and spread of per-call seconds over `repeat` samples of `number` calls."""
+    for _ in range(warmup):
+        fn()
+    # Calibrate: enough calls per sample that the timer resolution does not matter
+    number, elapsed = 1, 0.0
+    while True:
+        started = time.perf_counter()
+        for _ in range(number):
+            fn()
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_sample_seconds or number >= 10000:
+            break
+        number *= 10 if elapsed < min_sample_seconds / 10 else 2
+    samples = [elapsed / number]
+    for _ in range(repeat - 1):
+        started = time.perf_counter()
+        for _ in range(number):
+            fn()
+        samples.append((time.perf_counter() - started) / number)
+    return {
+        'median': statistics.median(samples),
+        'min': min(samples),
+        'stdev': statistics.stdev(samples) if len(samples) > 1 else 0.0,
+        'repeat': len(samples),
+        'number': number,
+    }
+
+
+def tolerance(result, baseline, threshold, noise_factor):
+    """
+    Allowed relative change: `threshold`, or `noise_factor` times the combined relative spread
+    (stdev / median) of the baseline and of this run when the case is noisier than that.
+    """
+    spreads = [case.get('stdev', 0.0) / case['median'] for case in (result, baseline) if case['median'] > 0]
+    return max(threshold, noise_factor * math.hypot(*spreads))
+
+
+def compare(result, baseline, threshold, min_delta, statistic='min', noise_factor=0.0):
+    if baseline is None:
+        return 'new', None
+    expected = baseline[statistic]
+    change = result[statistic] / expected - 1
+    allowed = tolerance(result, baseline, threshold, noise_factor)
+    # Differences below min_delta seconds are timer and scheduling noise
+    if change > allowed and result[statistic] - expected > min_delta:
+        return 'REGRESSION', change
+    if change < -allowed:
+        return 'faster', change
+    return 'ok', change
+
+
+def load_baselines(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_baselines(path, baselines):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(baselines, f, indent=1, sort_keys=True)
+        f.write('\n')
+    os.replace(tmp_path, path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--filter', nargs='+', default=[], help="Only cases whose name starts with one of these")
+    parser.add_argument('--repeat', type=int, default=7, help="Samples per case")
+    parser.add_argument('--min-sample-ms', type=float, default=20.0, help="Minimum duration of one sample")
+    parser.add_argument('--threshold', type=float, default=0.25, help="Allowed slowdown (0.25 = +25 %%)")
+    parser.add_argument('--min-delta-us', type=float, default=5.0, help="Ignore slowdowns smaller than this")
+    parser.add_argument('--statistic', choices=['min', 'median'], default='min',
+                        help="Compared statistic: the fastest sample is the least sensitive to other load")
+    parser.add_argument('--noise-factor', type=float, default=3.0,
+                        help="Widen the threshold of a case to this many times its relative stdev (0 = off)")
+    parser.add_argument('--confirm', type=int, default=2,
+                        help="Measurements repeated before reporting a regression (0 = report the first one)")
+    parser.add_argument('--threads', type=int, default=1, help="Compute threads (0 = library defaults)")
+    parser.add_argument('--baselines', default=BASELINES)
+    parser.add_argument('--save', action='store_true', help="Record the results as the baselines of this machine")
+    parser.add_argument('--output', help="Also write this run's results to a JSON file")
+    args = parser.parse_args()
+
+    configure(args.threads)
+    # After configure(): _common imports NumPy and moves to back-python
+    import _common
+
+    selected = lambda name: not args.filter or any(name.startswith(prefix) for prefix in args.filter)
+    key = machine_key(args.threads)
+    baselines = load_baselines(args.baselines)
+    machine = baselines.get(key, {'cases': {}})
+    if not machine['cases'] and not args.save:
+        print(f"No baselines for {key}: run with --save to record them.")
+
+    results, regressions = {}, []
+    print(f"{'case':<52} {args.statistic + ' ms':>10} {'baseline':>10} {'change':>8}  status")
+    for group in GROUPS:
+        # Skip the setup of groups that no filter can match
+        if args.filter and not any(prefix.split('/')[0] in (group, '') for prefix in args.filter):
+            continue
+        for name, fn in globals()[f'{group}_cases']():
+            if not selected(name):
+                continue
+            try:
+                result = measure(fn, args.repeat, args.min_sample_ms / 1000)
+            except Exception as e:
+                print(f"{name:<52} failed: {type(e).__name__}: {e}")
+                continue
+            baseline = machine['cases'].get(name)
+            options = (args.threshold, args.min_delta_us / 1e6, args.statistic, args.noise_factor)
+            status, change = compare(result, baseline, *options)
+            retries = 0
+            while status == 'REGRESSION' and retries < args.confirm:
+                # A slowdown has to reproduce: keep the fastest of the measurements
+                retries += 1
+                retry = measure(fn, args.repeat, args.min_sample_ms / 1000)
+                retry_status, retry_change = compare(retry, baseline, *options)
+                if retry_change < change:
+                    result, status, change = retry, retry_status, retry_change
+            results[name] = result
+            if status == 'REGRESSION':
+                regressions.append(name)
+            print(f"{name:<52} {result[args.statistic] * 1000:>10.3f} "
+                  f"{baseline[args.statistic] * 1000 if baseline else float('nan'):>10.3f} "
+                  f"{'' if change is None else f'{change:+.0%}':>8}  {status}"
+                  f"{f' (re-measured {retries}x)' if retries else ''}")
+
+    run = {'machine': key, 'environment': environment(), 'cases': results}
+    if args.output:
+        save_baselines(args.output, run)
+    if args.save:
+        machine['cases'].update(results)
+        # A filtered run imports fewer libraries: keep the versions recorded by earlier runs
+        machine.update({'environment': dict(machine.get('environment', {}), **run['environment']),
+                        'recorded_at': time.time()})
+        baselines[key] = machine
+        save_baselines(args.baselines, baselines)
+        print(f"Baselines of {key} saved to {args.baselines} ({len(results)} cases)")
+    else:
+        # Only the libraries imported by both runs (a filtered run imports fewer)
+        recorded = machine.get('environment', {})
+        changed = {name: (recorded[name], version) for name, version in run['environment'].items()
+                   if name in recorded and recorded[name] != version}
+        if changed:
+            print(f"Note: library versions differ from the baselines (baseline, now): {changed}")
+
+    if regressions and not args.save:
+        print(f"{len(regressions)} regression(s) above {args.threshold:.0%} (or the noise of the case): "
+              f"{', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
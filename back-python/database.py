@@ -1,12 +1,35 @@
-from sqlalchemy import create_engine
+import os
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker, declarative_base
 
 # Connect to SQLite (file 'scores.db')
-SQLALCHEMY_DATABASE_URL = "sqlite:///./scores.db"
+SQLALCHEMY_DATABASE_URL = os.environ.get('ECG_DATABASE_URL', "sqlite:///./scores.db")
+# Connection pool of server databases: one connection per concurrent request thread, reused
+# across requests. SQLite keeps SQLAlchemy's default pool: its writes go through one thread
+# (scores.ScoreWriter) and a file connection is cheap to open
+DB_POOL_SIZE = int(os.environ.get('ECG_DB_POOL_SIZE', '8'))
+DB_MAX_OVERFLOW = int(os.environ.get('ECG_DB_MAX_OVERFLOW', '8'))
+# How long (ms) a writer waits for SQLite's write lock before failing
+DB_BUSY_TIMEOUT_MS = int(os.environ.get('ECG_DB_BUSY_TIMEOUT_MS', '5000'))
 
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
-)
+is_sqlite = SQLALCHEMY_DATABASE_URL.startswith('sqlite')
+
+if is_sqlite:
+    engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
+else:
+    engine = create_engine(SQLALCHEMY_DATABASE_URL, pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW,
+                           pool_pre_ping=True)
+
+if is_sqlite:
+    @event.listens_for(engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        # WAL: readers never block the writer and each commit is one append to the log
+        # instead of a rewrite of the database file; NORMAL only syncs at checkpoints
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute(f"PRAGMA busy_timeout={DB_BUSY_TIMEOUT_MS}")
+        cursor.close()
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
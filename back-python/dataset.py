@@ -0,0 +1,173 @@
+import os
+import json
+import hashlib
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from reader import get_file_paths, load_signal, ECGReadError
+
+# Jeu de données consolidé par file_type : tous les signaux bout à bout dans un .npy
+# (ouvert en mémoire partagée, mmap) et un index JSON (étiquettes, positions, empreinte des sources)
+
+# Version du format : la changer force la reconstruction
+DATASET_VERSION = 1
+# Dossier de sortie ; par défaut <base_dir>/.dataset, à côté des données
+DATASET_DIR = os.environ.get('ECG_DATASET_DIR')
+# Processus de lecture des fichiers (0 = lecture séquentielle dans le processus courant)
+DATASET_WORKERS = int(os.environ.get('ECG_DATASET_WORKERS', str(os.cpu_count() or 1)))
+
+
+def dataset_paths(base_dir, file_type, output_dir=None):
+    output_dir = output_dir or DATASET_DIR or os.path.join(base_dir, '.dataset')
+    return (os.path.join(output_dir, f'{file_type}_signals.npy'),
+            os.path.join(output_dir, f'{file_type}_index.json'))
+
+
+def _label(filepath):
+    return os.path.basename(filepath).split('_')[2]
+
+
+def _stat_file(filepath, file_type):
+    # Un enregistrement WFDB (frag) est désigné sans extension : on suit le .dat
+    stat = os.stat(filepath + '.dat' if file_type == 'frag' else filepath)
+    return stat.st_size, stat.st_mtime_ns
+
+
+def source_fingerprint(base_dir, file_type, file_paths=None):
+    """Empreinte de la liste des fichiers sources (chemins, tailles, dates de modification)."""
+    if file_paths is None:
+        file_paths = get_file_paths(base_dir, file_type)
+    digest = hashlib.blake2b(digest_size=16)
+    for filepath in file_paths:
+        size, mtime = _stat_file(filepath, file_type)
+        digest.update(f'{os.path.relpath(filepath, base_dir)}\0{size}\0{mtime}\n'.encode())
+    return digest.hexdigest()
+
+
+def _read_record(filepath):
+    # Exécuté dans un processus de lecture : pas de cache .npy par fichier, le jeu consolidé le remplace
+    try:
+        return filepath, load_signal(filepath, use_cache=False), None
+    except ECGReadError as e:
+        return filepath, None, str(e)
+
+
+def _read_records(file_paths, workers):
+    if workers <= 1 or len(file_paths) < 2:
+        return [_read_record(filepath) for filepath in file_paths]
+    # fork : les processus de lecture n'ont pas à réimporter le script appelant (graph.py n'a pas de garde __main__)
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context('fork' if 'fork' in methods else None)
+    chunksize = max(1, len(file_paths) // (workers * 8))
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+        return list(executor.map(_read_record, file_paths, chunksize=chunksize))
+
+
+def _write_atomic(path, write, binary=False):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb' if binary else 'w') as f:
+        write(f)
+    os.replace(tmp_path, path)
+
+
+def build_dataset(base_dir, file_type, workers=DATASET_WORKERS, expected_length=None, output_dir=None):
+    """
+    Lit en parallèle tous les enregistrements `file_type` de base_dir et écrit le jeu consolidé.
+
+    Les fichiers illisibles sont écartés (et listés dans l'index). Si expected_length est donné,
+    une longueur différente lève une ValueError ; sinon les longueurs sont enregistrées telles
+    quelles et load_dataset indique si elles sont toutes égales. Renvoie l'index.
+    """
+    signals_path, index_path = dataset_paths(base_dir, file_type, output_dir)
+    file_paths = get_file_paths(base_dir, file_type)
+    fingerprint = source_fingerprint(base_dir, file_type, file_paths)
+
+    entries, rejected, signals = [], [], []
+    offset = 0
+    for filepath, X, error in _read_records(file_paths, workers):
+        if X is None:
+            print(f"Erreur lors de la lecture du fichier {filepath}: {error}")
+            rejected.append({'path': filepath, 'error': error})
+            continue
+        entries.append({'path': filepath, 'label': _label(filepath), 'offset': offset, 'length': len(X)})
+        signals.append(X)
+        offset += len(X)
+
+    lengths = sorted({entry['length'] for entry in entries})
+    if expected_length is not None and lengths and lengths != [expected_length]:
+        wrong = [entry['path'] for entry in entries if entry['length'] != expected_length]
+        raise ValueError(f"{len(wrong)} séquences ECG n'ont pas la longueur attendue ({expected_length}) : "
+                         f"{wrong[:5]}")
+
+    os.makedirs(os.path.dirname(signals_path), exist_ok=True)
+    flat = np.concatenate(signals) if signals else np.zeros(0)
+    _write_atomic(signals_path, lambda f: np.save(f, flat), binary=True)
+    index = {
+        'version': DATASET_VERSION,
+        'file_type': file_type,
+        'fingerprint': fingerprint,
+        'lengths': lengths,
+        'count': len(entries),
+        'entries': entries,
+        'rejected': rejected,
+    }
+    # L'index est écrit en dernier : il ne décrit jamais un fichier de signaux incomplet
+    _write_atomic(index_path, lambda f: json.dump(index, f))
+    return index
+
+
+def _load_index(index_path, signals_path):
+    try:
+        with open(index_path) as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if index.get('version') != DATASET_VERSION or not os.path.exists(signals_path):
+        return None
+    return index
+
+
+def load_dataset(base_dir, file_type, rebuild=False, check=True, workers=DATASET_WORKERS, output_dir=None):
+    """
+    Ouvre le jeu consolidé de `file_type` (construit au besoin) et renvoie (signaux, étiquettes).
+
+    Les signaux sont un tableau 2D mmap si tous ont la même longueur, sinon une liste de vues
+    1D. check=False saute la comparaison avec les fichiers sources (aucun parcours de base_dir).
+    """
+    signals_path, index_path = dataset_paths(base_dir, file_type, output_dir)
+    index = None if rebuild else _load_index(index_path, signals_path)
+    if index is not None and check and index['fingerprint'] != source_fingerprint(base_dir, file_type):
+        print(f"Jeu de données {file_type} obsolète : reconstruction")
+        index = None
+    if index is None:
+        index = build_dataset(base_dir, file_type, workers=workers, output_dir=output_dir)
+
+    flat = np.load(signals_path, mmap_mode='r')
+    labels = np.array([entry['label'] for entry in index['entries']])
+    if len(index['lengths']) == 1:
+        return flat.reshape(index['count'], index['lengths'][0]), labels
+    if not index['entries']:
+        return np.zeros((0, 0)), labels
+    return [flat[entry['offset']:entry['offset'] + entry['length']] for entry in index['entries']], labels
+
+
+def main():
+    import argparse
+    import time
+    parser = argparse.ArgumentParser(description="Construit le jeu de données consolidé (signaux .npy + index).")
+    parser.add_argument('--base-dir', default='data/AR')
+    parser.add_argument('--file-type', nargs='+', default=['full'])
+    parser.add_argument('--workers', type=int, default=DATASET_WORKERS)
+    parser.add_argument('--expected-length', type=int)
+    args = parser.parse_args()
+
+    for file_type in args.file_type:
+        started = time.perf_counter()
+        index = build_dataset(args.base_dir, file_type, args.workers, args.expected_length)
+        print(f"{file_type} : {index['count']} signaux (longueurs {index['lengths']}), "
+              f"{len(index['rejected'])} rejetés, {time.perf_counter() - started:.1f} s "
+              f"-> {dataset_paths(args.base_dir, file_type)[0]}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+import os
+import asyncio
+import contextvars
+import functools
+import multiprocessing
+import threading
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from profiling import current_profile
+
+# Executor settings (overridable through the environment)
+# Threads mostly wait on the batching scheduler, so this bounds how many requests share a batch
+INFERENCE_WORKERS = int(os.environ.get('ECG_INFERENCE_WORKERS', '32'))
+# 0 renders in a single dedicated thread instead of a process pool
+# (e.g. on AWS Lambda, where /dev/shm is missing and multiprocessing pools fail)
+RENDER_WORKERS = int(os.environ.get('ECG_RENDER_WORKERS', '2'))
+# Maximum number of queued + running jobs per executor before answering 503
+MAX_QUEUE_DEPTH = int(os.environ.get('ECG_MAX_QUEUE_DEPTH', '64'))
+
+
+class ExecutorSaturated(RuntimeError):
+    """Raised when an executor already has `max_depth` jobs queued or running."""
+
+
+class BoundedExecutor:
+    """
+    Wraps a concurrent.futures executor so that coroutines can await blocking work,
+    refusing new jobs once `max_depth` are queued or running.
+    """
+
+    def __init__(self, name, factory, max_depth=MAX_QUEUE_DEPTH, copy_context=True):
+        self.name = name
+        self.max_depth = max_depth
+        self._factory = factory
+        self._executor = None
+        self._copy_context = copy_context
+        self._depth = 0
+        self._lock = threading.Lock()
+
+    @property
+    def depth(self):
+        return self._depth
+
+    async def run(self, fn, *args, **kwargs):
+        with self._lock:
+            if self._depth >= self.max_depth:
+                raise ExecutorSaturated(f"{self.name} executor is saturated ({self._depth} jobs pending), retry later.")
+            if self._executor is None:
+                self._executor = self._factory()
+            executor = self._executor
+            self._depth += 1
+
+        call = functools.partial(fn, *args, **kwargs)
+        profile = current_profile.get()
+        if self._copy_context:
+            if profile is not None:
+                # cProfile only sees the thread it runs in: profile the job in the worker
+                call = functools.partial(profile.run, call)
+            # Keep request-scoped context variables visible inside the worker thread
+            call = functools.partial(contextvars.copy_context().run, call)
+        elif profile is not None:
+            profile.note(f"{getattr(fn, '__name__', fn)} ran in the {self.name} process pool, not profiled")
+        try:
+            future = executor.submit(call)
+        except BaseException:
+            self._release()
+            raise
+        # Counted until the job itself ends: a cancelled caller leaves a started job running
+        future.add_done_callback(self._release)
+        return await asyncio.wrap_future(future)
+
+    def _release(self, future=None):
+        with self._lock:
+            self._depth -= 1
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
+
+
+def _render_executor_factory():
+    if RENDER_WORKERS <= 0:
+        return ThreadPoolExecutor(max_workers=1, thread_name_prefix='render')
+    # matplotlib is not thread-safe: render in separate processes (spawned, not forked,
+    # so the children do not inherit TensorFlow's threads)
+    return ProcessPoolExecutor(max_workers=RENDER_WORKERS, mp_context=multiprocessing.get_context('spawn'))
+
+
+inference_executor = BoundedExecutor(
+    'inference',
+    lambda: ThreadPoolExecutor(max_workers=INFERENCE_WORKERS, thread_name_prefix='inference'),
+)
+render_executor = BoundedExecutor('render', _render_executor_factory, copy_context=RENDER_WORKERS <= 0)
+
+
+async def run_inference(fn, *args, **kwargs):
+    return await inference_executor.run(fn, *args, **kwargs)
+
+
+async def run_render(fn, *args, **kwargs):
+    return await render_executor.run(fn, *args, **kwargs)
+
+
+def queue_depths():
+    return {
+        inference_executor.name: inference_executor.depth,
+        render_executor.name: render_executor.depth,
+    }
+
+
+def shutdown_executors(wait=True):
+    inference_executor.shutdown(wait=wait)
+    render_executor.shutdown(wait=wait)
@@ -0,0 +1,172 @@
+import os
+import json
+import argparse
+import numpy as np
+import tensorflow as tf
+from numpy_model import NumpyModel, LAYERS
+
+# Formats d'export : TFLite, ou poids .npz pour l'inférence NumPy (numpy_model.py)
+FORMATS = ['tflite', 'npz']
+# Quantifications proposées pour l'export TFLite
+QUANTIZATIONS = ['none', 'float16', 'dynamic', 'int8']
+# Taille de lot figée dans l'artefact : les couches récurrentes exigent des formes statiques,
+# et un lot de 1 donne la latence la plus faible par requête
+EXPORT_BATCH_SIZE = 1
+# Nombre d'échantillons utilisés pour calibrer la quantification int8
+REPRESENTATIVE_SAMPLES = 200
+# Écart maximal toléré entre les probabilités NumPy et Keras à l'export .npz
+NPZ_TOLERANCE = 1e-4
+# Paramètres de configuration Keras conservés dans l'architecture .npz
+NPZ_CONFIG_KEYS = ['activation', 'recurrent_activation', 'return_sequences', 'strides', 'padding',
+                   'dilation_rate', 'pool_size']
+
+
+def tflite_path(model_path):
+    return os.path.splitext(model_path)[0] + '.tflite'
+
+
+def npz_path(model_path):
+    return os.path.splitext(model_path)[0] + '.npz'
+
+
+def _write_atomic(output_path, write):
+    # Écriture atomique : un serveur en cours d'exécution ne lit jamais un fichier partiel
+    tmp_path = f"{output_path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        write(f)
+    os.replace(tmp_path, output_path)
+    return output_path
+
+
+def _describe_layer(layer):
+    """Configuration utile à numpy_model pour une couche Keras, et ses poids nommés."""
+    layer_type = type(layer).__name__
+    if layer_type not in LAYERS:
+        raise ValueError(f"Couche non prise en charge par l'inférence NumPy : {layer_type} ({layer.name})")
+    config = layer.get_config()
+    if config.get('go_backwards') or config.get('stateful') or config.get('return_state'):
+        raise ValueError(f"Option récurrente non prise en charge par l'inférence NumPy : {layer.name}")
+    description = {'type': layer_type, 'name': layer.name}
+    for key in NPZ_CONFIG_KEYS:
+        if key in config:
+            value = config[key]
+            # Keras stocke strides, pool_size et dilation_rate sous forme de tuples d'un élément
+            description[key] = value[0] if isinstance(value, (list, tuple)) else value
+    names = {'Dense': ['kernel', 'bias'], 'Conv1D': ['kernel', 'bias'],
+             'SimpleRNN': ['kernel', 'recurrent_kernel', 'bias'],
+             'LSTM': ['kernel', 'recurrent_kernel', 'bias']}.get(layer_type, [])
+    if not config.get('use_bias', True):
+        names = [name for name in names if name != 'bias']
+    weights = layer.get_weights()
+    if len(weights) != len(names):
+        raise ValueError(f"Poids inattendus pour la couche {layer.name} : {len(weights)} au lieu de {len(names)}")
+    description['weights'] = names
+    return description, dict(zip(names, weights))
+
+
+def export_npz(model, output_path, tolerance=NPZ_TOLERANCE, representative_data=None):
+    """
+    Extrait l'architecture et les poids d'un modèle Keras Sequential dans un .npz compact,
+    exécuté sans TensorFlow par numpy_model.NumpyModel.
+
+    Le fichier n'est conservé que si les sorties NumPy et Keras concordent à `tolerance` près
+    (écart absolu maximal des probabilités) sur representative_data ou, à défaut, sur des
+    signaux aléatoires.
+    """
+    layers, arrays = [], {}
+    for index, layer in enumerate(model.layers):
+        description, weights = _describe_layer(layer)
+        layers.append(description)
+        for name, value in weights.items():
+            arrays[f'{index}/{name}'] = np.asarray(value, dtype=np.float32)
+    input_shape = [int(d) for d in model.input_shape[1:]]
+    architecture = json.dumps({'input_shape': input_shape, 'layers': layers})
+
+    tmp_path = f"{output_path}.{os.getpid()}.check.npz"
+    with open(tmp_path, 'wb') as f:
+        np.savez(f, architecture=np.array(architecture), **arrays)
+    try:
+        if representative_data is None:
+            samples = np.random.default_rng(0).standard_normal((64,) + tuple(input_shape))
+        else:
+            samples = np.asarray(representative_data)[:REPRESENTATIVE_SAMPLES]
+        samples = samples.reshape((-1,) + tuple(input_shape)).astype(np.float32)
+        expected = np.asarray(model(samples, training=False))
+        error = float(np.abs(NumpyModel(tmp_path).predict(samples) - expected).max())
+        if error > tolerance:
+            raise ValueError(f"L'inférence NumPy diverge de Keras : écart maximal {error:.2e} > {tolerance:.0e}")
+        os.replace(tmp_path, output_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return output_path
+
+
+def export_tflite(model, output_path, quantization='none', representative_data=None):
+    """
+    Exporte un modèle Keras au format TFLite, chargé en priorité par analyse.load_model.
+
+    quantization : 'none' (float32), 'float16' (poids en float16), 'dynamic' (poids int8,
+    calculs en float) ou 'int8' (poids et activations int8, calibrés sur representative_data ;
+    modèles non récurrents uniquement).
+    Les entrées et sorties restent en float32.
+    """
+    if quantization not in QUANTIZATIONS:
+        raise ValueError(f"Quantification invalide : {quantization}. Choix possibles : {QUANTIZATIONS}")
+
+    input_shape = tuple(model.input_shape[1:])
+    inputs = tf.keras.Input(batch_size=EXPORT_BATCH_SIZE, shape=input_shape)
+    converter = tf.lite.TFLiteConverter.from_keras_model(tf.keras.Model(inputs, model(inputs)))
+
+    if quantization != 'none':
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    if quantization == 'float16':
+        converter.target_spec.supported_types = [tf.float16]
+    elif quantization == 'int8':
+        if representative_data is None:
+            raise ValueError("La quantification int8 nécessite des données représentatives.")
+        # La calibration int8 des couches récurrentes fait planter le convertisseur TFLite
+        if any(isinstance(layer, tf.keras.layers.RNN) for layer in model.layers):
+            raise ValueError("La quantification int8 n'est pas prise en charge pour les modèles récurrents "
+                             "(LSTM/RNN) : utiliser 'dynamic'.")
+        samples = np.asarray(representative_data, dtype=np.float32)[:REPRESENTATIVE_SAMPLES]
+
+        def representative_dataset():
+            for sample in samples:
+                yield [sample.reshape((EXPORT_BATCH_SIZE,) + input_shape)]
+
+        converter.representative_dataset = representative_dataset
+
+    content = converter.convert()
+    return _write_atomic(output_path, lambda f: f.write(content))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Exporte les modèles Keras entraînés (TFLite ou poids .npz).")
+    parser.add_argument('--model', nargs='+', default=['deep', 'lstm', 'rnn', 'cnn'])
+    parser.add_argument('--file-type', default='full')
+    parser.add_argument('--format', choices=FORMATS, default='tflite')
+    parser.add_argument('--quantization', choices=QUANTIZATIONS, default='none')
+    parser.add_argument('--tolerance', type=float, default=NPZ_TOLERANCE)
+    parser.add_argument('--calibration', help="Fichier .npy de signaux normalisés (requis pour int8)")
+    args = parser.parse_args()
+
+    representative_data = np.load(args.calibration) if args.calibration else None
+    for model_choice in args.model:
+        model_path = os.path.join('models', args.file_type, f'{model_choice}_model.h5')
+        if not os.path.exists(model_path):
+            print(f"Modèle introuvable, ignoré : {model_path}")
+            continue
+        model = tf.keras.models.load_model(model_path)
+        if args.format == 'npz':
+            output_path = export_npz(model, npz_path(model_path), args.tolerance, representative_data)
+            label = 'NumPy'
+        else:
+            output_path = export_tflite(model, tflite_path(model_path), args.quantization, representative_data)
+            label = f'TFLite ({args.quantization})'
+        print(f"Modèle {label} sauvegardé sous : {output_path} "
+              f"({os.path.getsize(output_path) / 1024:.0f} Ko)")
+
+
+if __name__ == '__main__':
+    main()
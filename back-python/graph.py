@@ -6,6 +6,8 @@ from scipy.fft import fft
 import wfdb
 import random
 from reader import *
+from preprocessing import TARGET_SAMPLING_RATE
+from dataset import load_dataset
 
 base_dir = "data/AR"
 
@@ -25,29 +27,14 @@ def get_file_paths(base_dir, file_type):
 
 # Fonction pour lire et stocker tous les ECG fragments dans un DataFrame
 def load_ecg_data(base_dir, file_type='frag'):
-    file_paths = get_file_paths(base_dir, file_type)
-    if not file_paths:
-        print(f"Aucun fichier trouvé pour le type {file_type} dans le répertoire {base_dir}")
+    # Jeu consolidé de dataset.py : les fichiers ne sont relus que s'ils ont changé
+    ecg_data, labels = load_dataset(base_dir, file_type)
+    if len(labels) == 0:
+        print(f"Aucun fragment ECG n'a pu être lu pour le type {file_type} dans le répertoire {base_dir}")
     else:
-        print(f"Fichiers trouvés : {file_paths}")
+        print(f"{len(labels)} fragments ECG chargés pour le type {file_type}")
 
-    ecg_data = []
-    labels = []
-    for filepath in file_paths:
-        if file_type == 'frag':
-            ecg_fragment = read_ecg_file_frag(filepath)
-        else:
-            ecg_fragment = read_ecg_file_csv(filepath)
-
-        if ecg_fragment is not None:
-            ecg_data.append(ecg_fragment)
-            label = os.path.basename(filepath).split('_')[2]  # extrait le label du nom de fichier
-            labels.append(label)
-
-    if not ecg_data:
-        print(f"Aucun fragment ECG n'a pu être lu pour le type {file_type}")
-
-    return pd.DataFrame({'ECG': ecg_data, 'Label': labels})
+    return pd.DataFrame({'ECG': list(ecg_data), 'Label': labels})
 
 # Fonction pour visualiser un fragment ECG
 def plot_ecg_fragment(ecg_fragment, title="ECG Fragment"):
@@ -61,7 +48,7 @@ def plot_ecg_fragment(ecg_fragment, title="ECG Fragment"):
 # Fonction pour visualiser le spectre d'un fragment ECG
 def plot_ecg_spectrum(ecg_fragment, title="ECG Spectrum"):
     N = len(ecg_fragment)
-    T = 1.0 / 360.0  # Sample spacing (assuming 360 Hz sampling rate)
+    T = 1.0 / TARGET_SAMPLING_RATE  # Sample spacing
     yf = fft(ecg_fragment)
     xf = np.fft.fftfreq(N, T)[:N // 2]
     plt.figure(figsize=(10, 4))
@@ -101,7 +88,7 @@ def save_ecg_visualizations(ecg_data, file_type, output_base_dir="ecg_visualizat
         plt.close()
 
         N = len(ecg_fragment)
-        T = 1.0 / 360.0
+        T = 1.0 / TARGET_SAMPLING_RATE
         yf = fft(ecg_fragment)
         xf = np.fft.fftfreq(N, T)[:N // 2]
 
@@ -1,38 +1,71 @@
 import os
 os.environ['TF_ENABLE_ONEDNN_OPTS'] = '0'
+import argparse
+import json
+import multiprocessing
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
 import joblib
-import plotly.express as px
-from sklearn.model_selection import train_test_split
-from sklearn.preprocessing import StandardScaler, LabelEncoder
+from sklearn.model_selection import train_test_split, ParameterGrid
+from sklearn.preprocessing import LabelEncoder
 from sklearn.ensemble import RandomForestClassifier, GradientBoostingClassifier
 from sklearn.svm import SVC
 from sklearn.neighbors import KNeighborsClassifier
 from sklearn.metrics import classification_report, accuracy_score
-import tensorflow as tf
-from tensorflow.keras.models import Sequential
-from tensorflow.keras.layers import LSTM, SimpleRNN, Conv1D, MaxPooling1D, Dense, Dropout, Flatten, Input
-from tensorflow.keras.utils import to_categorical
 from management import *
 from ressources import evaluate_and_log_results
+from results_store import ResultsStore, RESULTS_DB, RESULTS_CSV
+from preprocessing import PREPROCESSING, TARGET_SAMPLING_RATE
+from sampling import training_indices, sample_weights, standard_scaling, predict_in_batches, keras_dataset
+from augment import SignalAugmenter
+
+# TensorFlow (modèles Keras et export.py) n'est importé que par les entraînements Keras :
+# les processus qui n'entraînent que des modèles scikit-learn ne le chargent jamais
 
 # -----------------------------------------------------------------
 # Paramètres globaux de traitement des données
+# (valeurs par défaut ; modifiables en ligne de commande avec --set, ou balayées avec --sweep)
 # -----------------------------------------------------------------
 
 # Chemin du répertoire contenant les données
 base_dir = "data/AR"
 # Type de fichier à charger ('frag', 'full', '10_3', '15_2')
 file_type = 'full'
+# Fréquence d'échantillonnage des fichiers de base_dir (rééchantillonnés vers celle des modèles, 360 Hz)
+sampling_rate = TARGET_SAMPLING_RATE
+# Étages de conditionnement des signaux ('baseline,bandpass,notch', voir preprocessing.py) ; l'API
+# doit appliquer les mêmes (ECG_PREPROCESSING) aux modèles entraînés ainsi
+preprocessing = PREPROCESSING
 # Méthode d'équilibrage des classes ('smote', 'under', 'none')
 method = 'none'
-# Facteur d'augmentation des données
+# Facteur d'augmentation des données (avec l'augmentation à la volée, chaque répétition est une variante différente)
 factor = 4
+# Augmentation à la volée des lots d'entraînement des modèles Keras (voir augment.py) ; {} la désactive.
+# Clé : nom de classe, ou '*' pour toutes les autres. Amplitudes en unités du signal normalisé,
+# 'shift' en échantillons ; une perturbation absente vaut 0. Exemple : 'N': {'noise': 0.05}
+# Désactivée par défaut ; --augment active DEFAULT_AUGMENTATION ou la configuration donnée
+augmentation = {}
+# Perturbations appliquées par --augment sans argument
+DEFAULT_AUGMENTATION = {
+    '*': {'scale': 0.1, 'wander': 0.1, 'noise': 0.02, 'shift': 10, 'stretch': 0.05},
+}
+# Threads qui préparent les lots augmentés en parallèle de l'entraînement
+augment_workers = 2
 # Paramètres globaux de traitement des données (True/False)
 use_scaler = True
 # Équilibrer les classes en dupliquant les échantillons pour égaliser le nombre d'échantillons par classe
 equal_class = True
 # Sauvegarder le modèle après l'entraînement (True/False)
 save_model = True
+# Exporter aussi les modèles Keras au format TFLite (True/False). Désactivé par défaut : l'export
+# est figé à un lot de 1 et l'API ne le charge qu'avec ECG_MODEL_RUNTIME=tflite (voir analyse.py)
+export_lite = False
+# Quantification de l'export TFLite ('none', 'float16', 'dynamic', 'int8')
+export_quantization = 'none'
+# Exporter aussi les poids au format .npz pour l'inférence NumPy sans TensorFlow (True/False)
+export_numpy = True
 
 # -----------------------------------------------------------------
 # Paramètres des modèles d'IA
@@ -68,180 +101,475 @@ qlearning_params = {
 }
 
 # -----------------------------------------------------------------
-# Début du pipeline d'entraînement
+# Paramètres reconnus par la ligne de commande et les balayages
 # -----------------------------------------------------------------
+KERAS_MODELS = ['lstm', 'rnn', 'cnn', 'deep']
+# Paramètres de préparation des données : les entraînements qui les partagent réutilisent les mêmes données
+DATA_PARAMS = ['base_dir', 'file_type', 'sampling_rate', 'preprocessing', 'method', 'factor', 'use_scaler',
+               'equal_class']
+# Paramètres propres à chaque modèle (les autres sont ignorés pour ce modèle dans un balayage)
+MODEL_PARAMS = {
+    'svm': ['svm_kernel'],
+    'knn': ['knn_neighbors'],
+    'rf': ['rf_n_estimators'],
+    'gbm': ['gbm_n_estimators'],
+    'lstm': ['lstm_units', 'epochs', 'batch_size', 'augmentation'],
+    'rnn': ['rnn_units', 'epochs', 'batch_size', 'augmentation'],
+    'cnn': ['cnn_filters', 'dense_units', 'epochs', 'batch_size', 'augmentation'],
+    'deep': ['dense_units', 'epochs', 'batch_size', 'augmentation'],
+}
+RUN_PARAMS = ['model_choice', 'augment_workers', 'export_lite', 'export_quantization', 'export_numpy']
+PARAMS = DATA_PARAMS + RUN_PARAMS + sorted({name for names in MODEL_PARAMS.values() for name in names})
+def default_params():
+    """Paramètres par défaut : les valeurs des variables globales ci-dessus."""
+    return {name: globals()[name] for name in PARAMS}
+
+
+def expand_sweep(spec, overrides=None):
+    """
+    Liste des entraînements d'un balayage. spec est une grille {paramètre: [valeurs]} ou une
+    liste de grilles (comme sklearn.model_selection.ParameterGrid) ; les paramètres absents
+    gardent leur valeur par défaut, puis overrides s'applique. Un paramètre qui ne concerne pas
+    le modèle ne multiplie pas ses entraînements (les doublons sont retirés).
+    """
+    grids = spec if isinstance(spec, list) else [spec]
+    for grid in grids:
+        unknown = set(grid) - set(PARAMS)
+        if unknown:
+            raise ValueError(f"Paramètres inconnus dans le balayage : {sorted(unknown)}")
+    runs, seen = [], set()
+    for point in ParameterGrid([{key: values if isinstance(values, list) else [values]
+                                 for key, values in grid.items()} for grid in grids]):
+        params = dict(default_params(), **point, **(overrides or {}))
+        if params['model_choice'] not in MODEL_PARAMS:
+            raise ValueError(f"Modèle non supporté : {params['model_choice']}. "
+                             f"Choisissez l'un de ceux disponibles : {list(MODEL_PARAMS)}")
+        relevant = DATA_PARAMS + RUN_PARAMS + MODEL_PARAMS[params['model_choice']]
+        key = json.dumps({name: params[name] for name in relevant}, sort_keys=True)
+        if key not in seen:
+            seen.add(key)
+            runs.append(params)
+    return runs
 
-# Charger les données et étiquettes
-X, y = load_and_label_data(base_dir, file_type)
 
+# -----------------------------------------------------------------
+# Préparation des données (une fois par combinaison de DATA_PARAMS)
+# -----------------------------------------------------------------
 
-# Vérifier que toutes les séquences ont la même longueur
-def verify_length():
-    if len(set(map(len, X))) != 1:
-        raise ValueError(
-            "Les séquences ECG n'ont pas la même longueur. Assurez-vous de choisir un seul type de fichier à la fois.")
+def prepare_data(params, output_dir, save_classes=True):
+    """
+    Charge, encode, normalise et échantillonne les données, puis les écrit dans output_dir
+    (X.npy, y.npy, train.npy, test.npy, classes.npy) : les processus d'entraînement les
+    ouvrent en mmap au lieu de les recevoir en copie.
+    """
+    X, y = load_and_label_data(params['base_dir'], params['file_type'], preprocessing=params['preprocessing'],
+                               sampling_rate=params['sampling_rate'])
+
+    # Encoder les étiquettes
+    label_encoder = LabelEncoder()
+    y = label_encoder.fit_transform(y)
+
+    # Sauvegarder les classes d'étiquettes pour une utilisation future (l'API les associe aux modèles sauvegardés)
+    if save_classes:
+        np.save('results/label_classes.npy', label_encoder.classes_)
+
+    # Normaliser les données
+    X = normalize_data(X)
+
+    # Duplication par classe, équilibrage et augmentation s'expriment en indices dans X (voir sampling.py) :
+    # la matrice n'est jamais recopiée, les lots et les poids d'échantillons sont construits à partir des indices
+    if params['method'] == 'smote':
+        # SMOTE synthétise de nouveaux signaux : les données équilibrées sont matérialisées
+        if params['equal_class']:
+            X, y = balance_classes_by_duplication(X, y)
+        X, y = balance_classes(X, y, method=params['method'])
+        indices = training_indices(y, equal_class=False, factor=params['factor'])
+    else:
+        indices = training_indices(y, equal_class=params['equal_class'], method=params['method'],
+                                   factor=params['factor'])
 
+    # Afficher la quantité de données et la distribution des classes
+    print(f"Quantité totale de données: {len(indices)}")
+    print(f"Classes disponibles: {label_encoder.classes_}")
+    unique, counts = np.unique(y[indices], return_counts=True)
+    class_distribution = dict(zip(label_encoder.inverse_transform(unique), counts))
+    print("Distribution des classes :", class_distribution)
 
-verify_length()
+    # Diviser les indices en ensembles d'entraînement et de test
+    train_indices, test_indices = train_test_split(indices, test_size=0.2, random_state=42)
 
-# Encoder les étiquettes
-label_encoder = LabelEncoder()
-y = label_encoder.fit_transform(y)
+    # Normalisation des données (statistiques de l'ensemble d'entraînement, appliquées une seule fois à X)
+    if params['use_scaler']:
+        mean, scale = standard_scaling(X, train_indices)
+        X -= mean
+        X /= scale
 
-# Sauvegarder les classes d'étiquettes pour une utilisation future
-np.save('results/label_classes.npy', label_encoder.classes_)
+    os.makedirs(output_dir, exist_ok=True)
+    for name, array in [('X', X), ('y', y), ('train', train_indices), ('test', test_indices),
+                        ('classes', label_encoder.classes_)]:
+        np.save(os.path.join(output_dir, f'{name}.npy'), array)
+    return output_dir
 
-# Normaliser les données
-X = normalize_data(X)
 
-# Équilibrer les classes en dupliquant les échantillons pour égaliser le nombre d'échantillons par classe
-if equal_class:
-    X, y = balance_classes_by_duplication(X, y)
-
-# Équilibrer les classes (si nécessaire)
-X, y = balance_classes(X, y, method=method)
-
-# Augmenter les données (si nécessaire)
-if factor > 1:
-    X, y = augment_data(X, y, factor=factor)
-
-# Afficher la quantité de données et la distribution des classes
-print(f"Quantité totale de données: {len(X)}")
-print(f"Classes disponibles: {label_encoder.classes_}")
-unique, counts = np.unique(y, return_counts=True)
-class_distribution = dict(zip(label_encoder.inverse_transform(unique), counts))
-print("Distribution des classes :", class_distribution)
-
-# Diviser les données en ensembles d'entraînement et de test
-X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-
-# Normalisation des données (utilisation d'un scaler après la division)
-if use_scaler:
-    scaler = StandardScaler()
-    X_train = scaler.fit_transform(X_train)
-    X_test = scaler.transform(X_test)
-
-# Reshaper les données pour le LSTM, RNN, CNN et deep learning si nécessaire
-if model_choice in ['lstm', 'rnn', 'cnn', 'deep']:
-    # Ajouter une dimension de temps pour RNN/LSTM/CNN
-    X_train = np.expand_dims(X_train, axis=2)
-    X_test = np.expand_dims(X_test, axis=2)
-    # Conversion des labels pour les rendre compatibles avec les modèles de Keras
-    y_train = to_categorical(y_train)
-    y_test = to_categorical(y_test)
-
-# Utilisation de match-case pour choisir le modèle
-match model_choice:
-    case 'svm':
-        # Entraîner une SVM avec un noyau radial
-        model = SVC(kernel=svm_kernel, probability=True)
-        model_params = {'kernel': svm_kernel}
-    case 'knn':
-        # Entraîner un KNN
-        model = KNeighborsClassifier(n_neighbors=knn_neighbors)
-        model_params = {'n_neighbors': knn_neighbors}
-    case 'rf':
-        # Entraîner un Random Forest
-        model = RandomForestClassifier(n_estimators=rf_n_estimators, random_state=42)
-        model_params = {'n_estimators': rf_n_estimators}
-    case 'gbm':
-        # Entraîner un Gradient Boosting Machine
-        model = GradientBoostingClassifier(n_estimators=gbm_n_estimators, random_state=42)
-        model_params = {'n_estimators': gbm_n_estimators}
-    case 'lstm':
-        # Construire et entraîner un modèle LSTM
-        model = Sequential()
-        model.add(Input(shape=(X_train.shape[1], X_train.shape[2])))  # Utiliser Input pour définir la forme d'entrée
-        model.add(LSTM(lstm_units, return_sequences=True))
-        model.add(Dropout(0.2))
-        model.add(LSTM(lstm_units))
-        model.add(Dropout(0.2))
-        model.add(Dense(y_train.shape[1], activation='softmax'))
+# Données ouvertes par chaque processus d'entraînement, par dossier
+_data_cache = {}
 
-        model.compile(optimizer='adam', loss='categorical_crossentropy', metrics=['accuracy'])
-        model.fit(X_train, y_train, epochs=epochs, batch_size=batch_size, validation_data=(X_test, y_test))
-        model_params = {'lstm_units': lstm_units, 'epochs': epochs, 'batch_size': batch_size}
-    case 'rnn':
-        # Construire et entraîner un modèle RNN
-        model = Sequential()
-        model.add(Input(shape=(X_train.shape[1], X_train.shape[2])))  # Utiliser Input pour définir la forme d'entrée
-        model.add(SimpleRNN(rnn_units, return_sequences=True))
-        model.add(Dropout(0.2))
-        model.add(SimpleRNN(rnn_units))
-        model.add(Dropout(0.2))
-        model.add(Dense(y_train.shape[1], activation='softmax'))
 
-        model.compile(optimizer='adam', loss='categorical_crossentropy', metrics=['accuracy'])
-        model.fit(X_train, y_train, epochs=epochs, batch_size=batch_size, validation_data=(X_test, y_test))
-        model_params = {'rnn_units': rnn_units, 'epochs': epochs, 'batch_size': batch_size}
-    case 'cnn':
-        # Construire et entraîner un modèle CNN
-        model = Sequential()
-        model.add(Input(shape=(X_train.shape[1], X_train.shape[2])))  # Utiliser Input pour définir la forme d'entrée
-        model.add(Conv1D(cnn_filters, kernel_size=3, activation='relu'))
-        model.add(MaxPooling1D(pool_size=2))
-        model.add(Dropout(0.2))
-        model.add(Flatten())
-        model.add(Dense(dense_units, activation='relu'))
-        model.add(Dropout(0.2))
-        model.add(Dense(y_train.shape[1], activation='softmax'))
+def _open_data(data_dir):
+    if data_dir not in _data_cache:
+        _data_cache[data_dir] = {name: np.load(os.path.join(data_dir, f'{name}.npy'), mmap_mode='r')
+                                 for name in ['X', 'y', 'train', 'test', 'classes']}
+    return _data_cache[data_dir]
 
-        model.compile(optimizer='adam', loss='categorical_crossentropy', metrics=['accuracy'])
-        model.fit(X_train, y_train, epochs=epochs, batch_size=batch_size, validation_data=(X_test, y_test))
-        model_params = {'cnn_filters': cnn_filters, 'dense_units': dense_units, 'epochs': epochs,
-                        'batch_size': batch_size}
-    case 'deep':
-        # Construire et entraîner un modèle Deep Learning (Dense)
-        model = Sequential()
-        model.add(Input(shape=(X_train.shape[1], X_train.shape[2])))  # Aplatir les données pour l'entrée Dense
-        model.add(Flatten())
-        model.add(Dense(dense_units, activation='relu'))
-        model.add(Dropout(0.2))
-        model.add(Dense(dense_units, activation='relu'))
-        model.add(Dropout(0.2))
-        model.add(Dense(y_train.shape[1], activation='softmax'))
 
+# -----------------------------------------------------------------
+# Entraînement d'un modèle
+# -----------------------------------------------------------------
+
+def build_model(params, input_length, n_classes, threads=None):
+    """Construit le modèle `params['model_choice']` et renvoie (modèle, paramètres enregistrés)."""
+    model_choice = params['model_choice']
+    if model_choice in KERAS_MODELS:
+        from tensorflow.keras.models import Sequential
+        from tensorflow.keras.layers import LSTM, SimpleRNN, Conv1D, MaxPooling1D, Dense, Dropout, Flatten, Input
+
+    # Utilisation de match-case pour choisir le modèle
+    match model_choice:
+        case 'svm':
+            # Entraîner une SVM avec un noyau radial
+            model = SVC(kernel=params['svm_kernel'], probability=True)
+            model_params = {'kernel': params['svm_kernel']}
+        case 'knn':
+            # Entraîner un KNN
+            model = KNeighborsClassifier(n_neighbors=params['knn_neighbors'], n_jobs=threads)
+            model_params = {'n_neighbors': params['knn_neighbors']}
+        case 'rf':
+            # Entraîner un Random Forest
+            model = RandomForestClassifier(n_estimators=params['rf_n_estimators'], random_state=42, n_jobs=threads)
+            model_params = {'n_estimators': params['rf_n_estimators']}
+        case 'gbm':
+            # Entraîner un Gradient Boosting Machine
+            model = GradientBoostingClassifier(n_estimators=params['gbm_n_estimators'], random_state=42)
+            model_params = {'n_estimators': params['gbm_n_estimators']}
+        case 'lstm':
+            # Construire un modèle LSTM
+            model = Sequential()
+            model.add(Input(shape=(input_length, 1)))  # Utiliser Input pour définir la forme d'entrée
+            model.add(LSTM(params['lstm_units'], return_sequences=True))
+            model.add(Dropout(0.2))
+            model.add(LSTM(params['lstm_units']))
+            model.add(Dropout(0.2))
+            model.add(Dense(n_classes, activation='softmax'))
+            model_params = {'lstm_units': params['lstm_units'], 'epochs': params['epochs'],
+                            'batch_size': params['batch_size']}
+        case 'rnn':
+            # Construire un modèle RNN
+            model = Sequential()
+            model.add(Input(shape=(input_length, 1)))  # Utiliser Input pour définir la forme d'entrée
+            model.add(SimpleRNN(params['rnn_units'], return_sequences=True))
+            model.add(Dropout(0.2))
+            model.add(SimpleRNN(params['rnn_units']))
+            model.add(Dropout(0.2))
+            model.add(Dense(n_classes, activation='softmax'))
+            model_params = {'rnn_units': params['rnn_units'], 'epochs': params['epochs'],
+                            'batch_size': params['batch_size']}
+        case 'cnn':
+            # Construire un modèle CNN
+            model = Sequential()
+            model.add(Input(shape=(input_length, 1)))  # Utiliser Input pour définir la forme d'entrée
+            model.add(Conv1D(params['cnn_filters'], kernel_size=3, activation='relu'))
+            model.add(MaxPooling1D(pool_size=2))
+            model.add(Dropout(0.2))
+            model.add(Flatten())
+            model.add(Dense(params['dense_units'], activation='relu'))
+            model.add(Dropout(0.2))
+            model.add(Dense(n_classes, activation='softmax'))
+            model_params = {'cnn_filters': params['cnn_filters'], 'dense_units': params['dense_units'],
+                            'epochs': params['epochs'], 'batch_size': params['batch_size']}
+        case 'deep':
+            # Construire un modèle Deep Learning (Dense)
+            model = Sequential()
+            model.add(Input(shape=(input_length, 1)))  # Aplatir les données pour l'entrée Dense
+            model.add(Flatten())
+            model.add(Dense(params['dense_units'], activation='relu'))
+            model.add(Dropout(0.2))
+            model.add(Dense(params['dense_units'], activation='relu'))
+            model.add(Dropout(0.2))
+            model.add(Dense(n_classes, activation='softmax'))
+            model_params = {'dense_units': params['dense_units'], 'epochs': params['epochs'],
+                            'batch_size': params['batch_size']}
+        case _:
+            raise ValueError("Modèle non supporté. Choisissez l'un de ceux disponible.")
+
+    if model_choice in KERAS_MODELS:
         model.compile(optimizer='adam', loss='categorical_crossentropy', metrics=['accuracy'])
-        model.fit(X_train, y_train, epochs=epochs, batch_size=batch_size, validation_data=(X_test, y_test))
-        model_params = {'dense_units': dense_units, 'epochs': epochs, 'batch_size': batch_size}
-    case _:
-        raise ValueError("Modèle non supporté. Choisissez l'un de ceux disponible.")
-
-# Entraînement du modèle
-model.fit(X_train, y_train)
-
-# Prédiction et évaluation du modèle
-if model_choice in ['lstm', 'rnn', 'cnn', 'deep']:
-    # Évaluation du modèle LSTM/RNN/CNN/Deep
-    loss, accuracy = model.evaluate(X_test, y_test)
-    y_pred = model.predict(X_test)
-    y_pred = y_pred.argmax(axis=1)  # Convertir les prédictions en classes pour les métriques
-
-    if len(y_test.shape) > 1 and y_test.shape[1] > 1:
-        y_test = y_test.argmax(axis=1)  # Convertir y_test en classes pour les métriques
-    print("Accuracy:", accuracy)
-else:
-    # Évaluation pour les autres modèles
-    y_pred = model.predict(X_test)
-    accuracy = accuracy_score(y_test, y_pred)
-    print("Accuracy:", accuracy)
-    print(classification_report(y_test, y_pred))
-
-# Enregistrer les résultats
-evaluate_and_log_results(model, X_test, y_test, y_pred, model_choice, model_params, file_type, method, factor,
-                         csv_file='results/results.csv')
-
-# Sauvegarder le modèle si l'option est activée
-if save_model:
-    # Créer le répertoire spécifique au type de fichier s'il n'existe pas
-    model_dir = f'models/{file_type}'
-    os.makedirs(model_dir, exist_ok=True)
+    return model, model_params
 
-    if model_choice in ['lstm', 'rnn', 'cnn', 'deep']:
-        model_save_path = os.path.join(model_dir, f'{model_choice}_model.h5')
-        model.save(model_save_path)
-        print(f"Modèle Keras sauvegardé sous: {model_save_path}")
-    else:
+
+def save_trained_model(model, params, model_dir, X, train_indices, test_indices):
+    """Sauvegarde le modèle (et ses exports TFLite / .npz pour les modèles Keras) dans model_dir."""
+    os.makedirs(model_dir, exist_ok=True)
+    model_choice = params['model_choice']
+    if model_choice not in KERAS_MODELS:
         model_save_path = os.path.join(model_dir, f'{model_choice}_model.pkl')
         joblib.dump(model, model_save_path)
         print(f"Modèle Scikit-learn sauvegardé sous: {model_save_path}")
+        return
+
+    from export import export_tflite, tflite_path, export_npz, npz_path, REPRESENTATIVE_SAMPLES
+    model_save_path = os.path.join(model_dir, f'{model_choice}_model.h5')
+    model.save(model_save_path)
+    print(f"Modèle Keras sauvegardé sous: {model_save_path}")
+    if params['export_lite']:
+        lite_path = export_tflite(model, tflite_path(model_save_path), params['export_quantization'],
+                                  representative_data=X[train_indices[:REPRESENTATIVE_SAMPLES], :, np.newaxis])
+        print(f"Modèle TFLite ({params['export_quantization']}) sauvegardé sous: {lite_path}")
+    if params['export_numpy']:
+        numpy_path = export_npz(model, npz_path(model_save_path),
+                                representative_data=X[test_indices[:REPRESENTATIVE_SAMPLES], :, np.newaxis])
+        print(f"Poids NumPy sauvegardés sous: {numpy_path}")
+
+
+def train_model(params, data_dir, model_dir=None, threads=None, verbose='auto'):
+    """
+    Entraîne et évalue un modèle sur les données préparées dans data_dir. Si model_dir est donné,
+    le modèle y est sauvegardé. Renvoie un dictionnaire (paramètres, précision, prédictions).
+    """
+    started = time.perf_counter()
+    data = _open_data(data_dir)
+    X, y, train_indices, test_indices = data['X'], data['y'], data['train'], data['test']
+    n_classes = len(data['classes'])
+    model_choice = params['model_choice']
+    model, model_params = build_model(params, X.shape[1], n_classes, threads)
+    y_test = np.asarray(y[test_indices])
+
+    if model_choice in KERAS_MODELS:
+        # Lots construits à la volée (axe temporel et étiquettes one-hot)
+        augmenter = SignalAugmenter(params['augmentation'], list(data['classes']))
+        train_data = keras_dataset(X, y, train_indices, n_classes, params['batch_size'], shuffle=True, seed=42,
+                                   augment=augmenter if augmenter.enabled else None,
+                                   workers=params['augment_workers'])
+        test_data = keras_dataset(X, y, test_indices, n_classes, params['batch_size'], shuffle=False)
+        model.fit(train_data, epochs=params['epochs'], validation_data=test_data, verbose=verbose)
+        if augmenter.enabled:
+            model_params['augmentation'] = params['augmentation']
+
+        # Évaluation du modèle LSTM/RNN/CNN/Deep
+        loss, accuracy = model.evaluate(test_data, verbose=verbose)
+        y_pred = predict_in_batches(lambda batch: model.predict_on_batch(batch[..., np.newaxis]), X, test_indices)
+        y_pred = y_pred.argmax(axis=1)  # Convertir les prédictions en classes pour les métriques
+    else:
+        if model_choice == 'knn':
+            # KNN n'accepte pas de poids : les échantillons dupliqués comptent comme voisins, ils sont recopiés
+            model.fit(X[train_indices], y[train_indices])
+        else:
+            # Chaque signal distinct une seule fois, pondéré par son nombre de duplications
+            unique, weights = sample_weights(train_indices, len(X))
+            model.fit(X[unique], y[unique], sample_weight=weights)
+
+        # Évaluation pour les autres modèles
+        y_pred = predict_in_batches(model.predict, X, test_indices)
+        accuracy = accuracy_score(y_test, y_pred)
+        print(classification_report(y_test, y_pred))
+    print(f"Accuracy ({model_choice}):", accuracy)
+
+    if model_dir is not None:
+        save_trained_model(model, params, model_dir, X, train_indices, test_indices)
+    return {
+        'params': params,
+        'model_params': model_params,
+        'accuracy': float(accuracy),
+        'y_test': y_test,
+        'y_pred': np.asarray(y_pred),
+        'model_dir': model_dir,
+        'seconds': time.perf_counter() - started,
+    }
+
+
+# -----------------------------------------------------------------
+# Balayages parallèles
+# -----------------------------------------------------------------
+
+# Limites de threads du processus courant (conservées pour rester actives)
+_thread_limits = None
+
+
+def limit_threads(threads):
+    """
+    Limite les threads de calcul d'un processus d'entraînement : BLAS/OpenMP (NumPy, scikit-learn)
+    et TensorFlow, qui lit ses variables d'environnement au premier import.
+    """
+    global _thread_limits
+    for variable in ['OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS', 'TF_NUM_INTRAOP_THREADS']:
+        os.environ[variable] = str(threads)
+    os.environ['TF_NUM_INTEROP_THREADS'] = '1'
+    from threadpoolctl import threadpool_limits
+    _thread_limits = threadpool_limits(limits=threads)
+
+
+def _run_job(job):
+    return train_model(job['params'], job['data_dir'], job['model_dir'], job['threads'], job['verbose'])
+
+
+def _promote(result, model_dir):
+    """Déplace les fichiers du meilleur entraînement d'un modèle vers models/<file_type>."""
+    model_choice = result['params']['model_choice']
+    os.makedirs(model_dir, exist_ok=True)
+    # L'API charge .npz avant .h5 (et .tflite sur demande) : un export absent du nouvel entraînement ne doit pas survivre
+    for extension in ['h5', 'tflite', 'npz', 'pkl']:
+        target = os.path.join(model_dir, f'{model_choice}_model.{extension}')
+        source = os.path.join(result['model_dir'], f'{model_choice}_model.{extension}')
+        if os.path.exists(source):
+            os.replace(source, target)
+        elif os.path.exists(target):
+            os.remove(target)
+
+
+def run_sweep(runs, jobs=1, threads_per_job=None, save='best', results_db=RESULTS_DB, results_csv=RESULTS_CSV):
+    """
+    Entraîne la liste de paramètres `runs` (voir expand_sweep) sur `jobs` processus.
+
+    Les données sont préparées une seule fois par combinaison de DATA_PARAMS et partagées par
+    mmap. Chaque processus est limité à threads_per_job threads (par défaut cœurs / jobs).
+    Chaque entraînement est ajouté à results_db dès qu'il se termine ; results_csv (format
+    historique, lu par les notebooks) est régénéré une fois à la fin. save='best'
+    sauvegarde dans models/<file_type> le meilleur entraînement de chaque modèle, 'none' aucun.
+    Renvoie les résultats dans l'ordre de `runs`.
+    """
+    if save not in ('best', 'none'):
+        raise ValueError(f"Option de sauvegarde invalide : {save} ('best' ou 'none')")
+    jobs = max(1, min(jobs, len(runs)))
+    if threads_per_job is None and jobs > 1:
+        threads_per_job = max(1, (os.cpu_count() or 1) // jobs)
+    # Crée la base au besoin (en y important le CSV historique) avant le premier entraînement
+    store = ResultsStore(results_db, legacy_csv=results_csv)
+    work_dir = tempfile.mkdtemp(prefix='ecg_sweep_')
+    try:
+        data_dirs = {}
+        queue = []
+        for index, params in enumerate(runs):
+            data_key = json.dumps({name: params[name] for name in DATA_PARAMS}, sort_keys=True)
+            if data_key not in data_dirs:
+                data_dirs[data_key] = prepare_data(params, os.path.join(work_dir, f'data_{len(data_dirs)}'),
+                                                   save_classes=save != 'none')
+            queue.append({
+                'params': params,
+                'data_dir': data_dirs[data_key],
+                'model_dir': os.path.join(work_dir, f'run_{index}') if save != 'none' else None,
+                'threads': threads_per_job,
+                # Une ligne par époque quand plusieurs entraînements écrivent en même temps
+                'verbose': 'auto' if jobs == 1 else 2,
+            })
+
+        results = [None] * len(queue)
+
+        def record(index, result):
+            results[index] = result
+            params = result['params']
+            print(f"[{index + 1}/{len(queue)}] {params['model_choice']} {result['model_params']} : "
+                  f"accuracy {result['accuracy']:.4f} en {result['seconds']:.1f} s")
+            # Enregistrer les résultats
+            evaluate_and_log_results(None, None, result['y_test'], result['y_pred'], params['model_choice'],
+                                     result['model_params'], params['file_type'], params['method'],
+                                     params['factor'], results_db=results_db)
+
+        if jobs == 1:
+            if threads_per_job:
+                limit_threads(threads_per_job)
+            for index, job in enumerate(queue):
+                record(index, _run_job(job))
+        else:
+            # 'spawn' : chaque processus applique ses limites de threads avant d'importer TensorFlow
+            context = multiprocessing.get_context('spawn')
+            with ProcessPoolExecutor(max_workers=jobs, mp_context=context,
+                                     initializer=limit_threads, initargs=(threads_per_job,)) as executor:
+                futures = {executor.submit(_run_job, job): index for index, job in enumerate(queue)}
+                for future in as_completed(futures):
+                    record(futures[future], future.result())
+
+        if results_csv:
+            store.export_csv(results_csv)
+            print(f"Résultats exportés vers {results_csv}")
+        if save == 'best':
+            best = {}
+            for result in results:
+                key = (result['params']['file_type'], result['params']['model_choice'])
+                if key not in best or result['accuracy'] > best[key]['accuracy']:
+                    best[key] = result
+            for (run_file_type, _), result in best.items():
+                _promote(result, f'models/{run_file_type}')
+                print(f"Meilleur {result['params']['model_choice']} ({run_file_type}) sauvegardé : "
+                      f"{result['model_params']}, accuracy {result['accuracy']:.4f}")
+        return results
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def _parse_value(text):
+    try:
+        return json.loads(text)
+    except ValueError:
+        return text
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Entraîne un ou plusieurs modèles ECG. Sans option : le modèle model_choice avec les "
+                    "paramètres par défaut de ce fichier.",
+        epilog="Exemples : python ia.py --model rf knn deep --set epochs=5 --jobs 3 ; "
+               "python ia.py --model lstm --augment ; "
+               "python ia.py --sweep '{\"model_choice\": [\"rf\"], \"rf_n_estimators\": [100, 300]}' --jobs 2")
+    parser.add_argument('--model', nargs='+', choices=list(MODEL_PARAMS),
+                        help="Modèles à entraîner (remplace model_choice)")
+    parser.add_argument('--sweep', help="Grille de paramètres : JSON en ligne ou chemin d'un fichier .json "
+                                        "({paramètre: [valeurs]} ou liste de grilles)")
+    parser.add_argument('--set', action='append', default=[], metavar='PARAM=VALEUR',
+                        help="Remplace un paramètre par défaut (valeur JSON ou texte), répétable")
+    parser.add_argument('--augment', nargs='?', const=json.dumps(DEFAULT_AUGMENTATION), metavar='CONFIG',
+                        help="Active l'augmentation des modèles Keras : DEFAULT_AUGMENTATION sans argument, "
+                             "sinon configuration JSON en ligne ou chemin d'un fichier .json")
+    parser.add_argument('--jobs', type=int, default=1, help="Entraînements en parallèle (processus)")
+    parser.add_argument('--threads-per-job', type=int, help="Threads de calcul par entraînement (défaut : cœurs / jobs)")
+    parser.add_argument('--save', choices=['best', 'none'], default='best' if save_model else 'none')
+    parser.add_argument('--results', default=RESULTS_DB, help="Base des résultats (SQLite)")
+    parser.add_argument('--results-csv', default=RESULTS_CSV,
+                        help="Export CSV de l'historique en fin de campagne (vide : aucun export)")
+    parser.add_argument('--dry-run', action='store_true', help="Affiche les entraînements prévus sans les lancer")
+    args = parser.parse_args(argv)
+
+    overrides = {}
+    for assignment in args.set:
+        name, _, value = assignment.partition('=')
+        if name not in PARAMS:
+            parser.error(f"Paramètre inconnu : {name}")
+        overrides[name] = _parse_value(value)
+    if args.augment:
+        if os.path.exists(args.augment):
+            with open(args.augment) as f:
+                overrides['augmentation'] = json.load(f)
+        else:
+            overrides['augmentation'] = json.loads(args.augment)
+
+    spec = {}
+    if args.sweep:
+        if os.path.exists(args.sweep):
+            with open(args.sweep) as f:
+                spec = json.load(f)
+        else:
+            spec = json.loads(args.sweep)
+    if args.model:
+        spec = [dict(grid, model_choice=args.model) for grid in (spec if isinstance(spec, list) else [spec])]
+    runs = expand_sweep(spec, overrides)
+
+    print(f"{len(runs)} entraînement(s), {min(args.jobs, len(runs))} en parallèle")
+    if args.dry_run:
+        for params in runs:
+            relevant = ['file_type', 'method', 'factor'] + MODEL_PARAMS[params['model_choice']]
+            print(params['model_choice'], {name: params[name] for name in relevant})
+        return
+    run_sweep(runs, jobs=args.jobs, threads_per_job=args.threads_per_job, save=args.save,
+              results_db=args.results, results_csv=args.results_csv or None)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,18 +1,57 @@
-from fastapi import FastAPI, UploadFile, File, Form, Depends
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, UploadFile, File, Form, Depends, WebSocket, WebSocketDisconnect, BackgroundTasks, Request
+from fastapi.responses import JSONResponse, StreamingResponse, Response, FileResponse
 from fastapi.middleware.cors import CORSMiddleware
 from mangum import Mangum
-from typing import Optional
-import uvicorn
+from typing import Optional, List
+import json
+import logging
+import os
+import asyncio
 import numpy as np
-from analyse import analyze_ecg, save_dataset, get_ecg_plot_base64_from_color_choice, get_random_dataset_by_color, get_random_color
+from analyse import analyze_signal, load_ecg, save_dataset, secure_upload_filename, get_random_color, sample_library, analyze_library_sample, analyze_batch, expand_batch_upload, BATCH_MAX_FILES, result_cache, analysis_cache_key, RESULT_CACHE_ENABLED, model_registry, inference_scheduler, prewarm, load_class_names, resolve_models, available_models, build_analysis_result, TARGET_LENGTHS, MODEL_SAMPLING_RATE, file_type, signal_conditioner, validate_analysis_options
+from render import plot_ecg
+from reader import ECGReadError
+from executors import run_inference, run_render, shutdown_executors, ExecutorSaturated, queue_depths
+from streaming import StreamSession, SessionLimiter, parse_samples, normalize_window, STREAM_CONTEXT_SECONDS, STREAM_LOOKAHEAD_SECONDS
 from sqlalchemy.orm import Session
 from database import SessionLocal, engine
-from models import Base, Score
+from models import Base
+from scores import score_writer, ensure_totals, read_stats
+from metrics import registry, stage, MetricsMiddleware, CONTENT_TYPE as METRICS_CONTENT_TYPE
+from profiling import ProfilingMiddleware, PROFILING_ENABLED, PROFILING_TOKEN, profile_limiter, authorized, list_profiles, load_report, artifact_path
+
+logger = logging.getLogger(__name__)
 
 UPLOAD_FOLDER = '/tmp'
+# Keep a copy of every upload in UPLOAD_FOLDER (written after the response is sent)
+PERSIST_UPLOADS = os.environ.get('ECG_PERSIST_UPLOADS', '0') == '1'
+# Comma-separated list of models loaded at startup, e.g. "deep,lstm"
+WARMUP_MODELS = [m.strip() for m in os.environ.get('ECG_WARMUP_MODELS', '').split(',') if m.strip()]
+# Pre-warm (lazy imports, renderer, sample library) in the startup handler. Off by default on
+# Lambda, where it would delay the cold start of every endpoint; use SnapStart there instead
+PREWARM = os.environ.get('ECG_PREWARM', '0' if 'AWS_LAMBDA_FUNCTION_NAME' in os.environ else '1') == '1'
+# /analyze/batch: recordings classified per predict call, and files parsed concurrently
+BATCH_CHUNK_SIZE = int(os.environ.get('ECG_BATCH_CHUNK_SIZE', '32'))
+BATCH_PARSE_CONCURRENCY = int(os.environ.get('ECG_BATCH_PARSE_CONCURRENCY', '8'))
+
 app = FastAPI()
 Base.metadata.create_all(bind=engine)
+# Score aggregates for databases created before they existed
+ensure_totals()
+stream_sessions = SessionLimiter()
+
+# Gauges read on each /metrics scrape (latency histograms are filled by metrics.stage)
+registry.gauge('ecg_executor_queue_depth', 'Jobs queued or running per executor.', queue_depths, ('executor',))
+registry.gauge('ecg_inference_pending', 'Signals waiting for the batching scheduler.',
+               lambda: inference_scheduler.stats()['pending'], ('model',))
+registry.gauge('ecg_score_writer_pending', 'Scores waiting to be committed.', lambda: score_writer.stats()['pending'])
+registry.gauge('ecg_stream_sessions', 'Open streaming sessions.', lambda: stream_sessions.active)
+registry.gauge('ecg_model_cache_bytes', 'Estimated memory of the resident models.', model_registry.total_bytes)
+registry.gauge('ecg_result_cache_entries', 'Analyses held in the result cache.', lambda: result_cache.stats()['entries'])
+
+app.add_middleware(MetricsMiddleware)
+# Opt-in (ECG_PROFILING=1): profiles requests sent with `X-Profile: 1`, see /profiles
+app.add_middleware(ProfilingMiddleware)
 
 # CORS middleware for local development
 app.add_middleware(
@@ -33,6 +72,35 @@ def to_python_type(obj):
     else:
         return obj
 
+@app.on_event("startup")
+def warm_up_models():
+    if PREWARM:
+        # Also indexes the sample library (and its cached plots and predictions)
+        loaded, failed = prewarm(WARMUP_MODELS)
+        logger.info("Sample library: %s", sample_library.stats())
+    elif WARMUP_MODELS:
+        loaded, failed = model_registry.warm_up(WARMUP_MODELS)
+    else:
+        return
+    if WARMUP_MODELS:
+        logger.info("Models warmed up: %s", loaded)
+    if failed:
+        logger.warning("Models failed to warm up: %s", failed)
+
+@app.on_event("shutdown")
+def stop_workers():
+    inference_scheduler.shutdown()
+    score_writer.shutdown()
+    shutdown_executors(wait=False)
+
+async def timed(name, awaitable, model=''):
+    # Times work handed to another process (the render pool), where metrics.stage would not be seen
+    with stage(name, model):
+        return await awaitable
+
+def saturated_response(e):
+    return JSONResponse(content={"error": str(e)}, status_code=503, headers={"Retry-After": "1"})
+
 def get_db():
     db = SessionLocal()
     try:
@@ -42,51 +110,300 @@ def get_db():
 
 @app.post("/analyze")
 async def analyze(
+    background_tasks: BackgroundTasks,
     file: Optional[UploadFile] = File(None),
     color_choice: str = Form("green"),
-    model_choice: str = Form("cnn")
+    model_choice: str = Form("cnn"),
+    mode: str = Form("single"),
+    stride: Optional[int] = Form(None),
+    plot_format: str = Form("png"),
+    sampling_rate: Optional[float] = Form(None)
 ):
-    saved_path = None
+    # Skicka in allt som argument, inget med globals längre
+    try:
+        # Invalid options (unknown models included) are rejected before the upload is read
+        resolve_models(model_choice)
+        validate_analysis_options(mode, stride, plot_format)
+    except ValueError as e:
+        return JSONResponse(content={"error": str(e)}, status_code=400)
+    try:
+        # If a file is given, it is parsed straight from memory; keeping a copy on disk is optional
+        if file is not None:
+            secure_upload_filename(file.filename)
+            source = await file.read()
+            if PERSIST_UPLOADS:
+                background_tasks.add_task(save_dataset, file.filename, UPLOAD_FOLDER, content=source)
+        else:
+            # Library samples are already parsed, plotted and possibly classified
+            entry = await run_inference(sample_library.random_entry, color_choice)
+            result = await run_inference(analyze_library_sample, entry, model_choice, mode=mode, stride=stride,
+                                         plot_format=plot_format)
+            return to_python_type(result)
 
-    # If a file is given, save it to the upload folder 
-    if file is not None:
-        saved_path = save_dataset(file, UPLOAD_FOLDER)
-    else:
-        saved_path = get_random_dataset_by_color(color_choice)
+        # Parsing and inference run on the inference thread pool, the plot on the render pool
+        # Recordings at another rate than MODEL_SAMPLING_RATE are resampled while loading
+        X = await run_inference(load_ecg, source, sampling_rate)
+        # Re-uploaded recordings are answered from the result cache
+        cache_key = None
+        if RESULT_CACHE_ENABLED:
+            with stage('cache_lookup'):
+                cache_key = await run_inference(analysis_cache_key, X, model_choice, True, mode, stride, plot_format)
+                cached = await run_inference(result_cache.get, cache_key)
+            if cached is not None:
+                return cached
 
-    # Skicka in allt som argument, inget med globals längre
+        if mode == 'windowed':
+            # The plot shows the highest-risk window, so it is rendered after inference
+            result = await run_inference(analyze_signal, X, model_choice, include_plot=False, mode=mode, stride=stride)
+            window = result["plot_window"]
+            result.update(await timed('plot', run_render(
+                plot_ecg, X[window["start_sample"]:window["end_sample"]], plot_format=plot_format)))
+        else:
+            plot, result = await asyncio.gather(
+                timed('plot', run_render(plot_ecg, X, plot_format=plot_format)),
+                run_inference(analyze_signal, X, model_choice, include_plot=False, mode=mode),
+                return_exceptions=True,
+            )
+            for outcome in (result, plot):
+                if isinstance(outcome, BaseException):
+                    raise outcome
+            result.update(plot)
+
+        result = to_python_type(result)
+        if cache_key is not None:
+            background_tasks.add_task(result_cache.put, cache_key, result)
+        return result
+    except ExecutorSaturated as e:
+        return saturated_response(e)
+    except ECGReadError as e:
+        # The upload is not a readable ECG
+        return JSONResponse(content={"error": str(e)}, status_code=400)
+    except Exception as e:
+        return JSONResponse(content={"error": str(e)}, status_code=500)
+
+@app.post("/analyze/batch")
+async def analyze_batch_files(
+    files: List[UploadFile] = File(...),
+    model_choice: str = Form("cnn"),
+    include_plot: bool = Form(False),
+    plot_format: str = Form("png"),
+    sampling_rate: Optional[float] = Form(None)
+):
     try:
-        result = analyze_ecg(file_path=saved_path, model_choice=model_choice)
-        return to_python_type(result)
+        resolve_models(model_choice)
+        validate_analysis_options(plot_format=plot_format)
+    except ValueError as e:
+        return JSONResponse(content={"error": str(e)}, status_code=400)
+    try:
+        recordings = []
+        for file in files:
+            recordings.extend(await run_inference(expand_batch_upload, file.filename, await file.read()))
+        if len(recordings) > BATCH_MAX_FILES:
+            return JSONResponse(content={"error": f"Too many files: at most {BATCH_MAX_FILES} per batch."},
+                                status_code=400)
+    except ExecutorSaturated as e:
+        return saturated_response(e)
     except Exception as e:
         return JSONResponse(content={"error": str(e)}, status_code=500)
 
+    return StreamingResponse(stream_batch_results(recordings, model_choice, include_plot, plot_format, sampling_rate),
+                             media_type="application/x-ndjson")
+
+async def stream_batch_results(recordings, model_choice, include_plot, plot_format, sampling_rate=None):
+    """Yield one NDJSON line per recording, in completion order (each line carries its index)."""
+    semaphore = asyncio.Semaphore(BATCH_PARSE_CONCURRENCY)
+
+    async def parse(index, filename, content):
+        async with semaphore:
+            try:
+                return index, filename, await run_inference(load_ecg, content, sampling_rate), None
+            except Exception as e:
+                return index, filename, None, str(e)
+
+    async def classify(chunk):
+        try:
+            signals = [X for _, _, X in chunk]
+            results = await run_inference(analyze_batch, signals, model_choice)
+            if include_plot:
+                plots = await asyncio.gather(*[timed('plot', run_render(plot_ecg, X, plot_format=plot_format))
+                                               for X in signals])
+                for result, plot in zip(results, plots):
+                    result.update(plot)
+            return [line(index, filename, to_python_type(result))
+                    for (index, filename, _), result in zip(chunk, results)]
+        except Exception as e:
+            return [line(index, filename, {"error": str(e)}) for index, filename, _ in chunk]
+
+    def line(index, filename, payload):
+        return json.dumps({"index": index, "filename": filename, **payload}) + "\n"
+
+    chunk = []
+    for task in asyncio.as_completed([parse(i, name, content) for i, (name, content) in enumerate(recordings)]):
+        index, filename, X, error = await task
+        if error is not None:
+            yield line(index, filename, {"error": error})
+            continue
+        chunk.append((index, filename, X))
+        if len(chunk) >= BATCH_CHUNK_SIZE:
+            for result in await classify(chunk):
+                yield result
+            chunk = []
+    if chunk:
+        for result in await classify(chunk):
+            yield result
+
+@app.websocket("/analyze/stream")
+async def analyze_stream(websocket: WebSocket, model_choice: str = "cnn", stride: Optional[int] = None):
+    """
+    Stream samples (360 Hz) as they arrive; every completed window is classified and a
+    rolling danger-level update is pushed back. See streaming.parse_samples for the frame format.
+    """
+    if not stream_sessions.acquire():
+        # 1013: try again later
+        await websocket.close(code=1013)
+        return
+
+    try:
+        await websocket.accept()
+        try:
+            models = resolve_models(model_choice)
+            if len(models) != 1:
+                raise ValueError("Streaming analysis runs a single model.")
+            # Signal around each window is only needed by the preprocessing filters
+            margins = {}
+            if signal_conditioner.stages:
+                margins = {'context': int(STREAM_CONTEXT_SECONDS * MODEL_SAMPLING_RATE),
+                           'lookahead': int(STREAM_LOOKAHEAD_SECONDS * MODEL_SAMPLING_RATE)}
+            session = StreamSession(window=TARGET_LENGTHS[file_type], stride=stride, **margins)
+        except ValueError as e:
+            # 1008: policy violation (invalid request)
+            await websocket.send_json({"error": str(e)})
+            await websocket.close(code=1008)
+            return
+        model_choice = models[0]
+        class_names = await run_inference(load_class_names)
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+            samples = parse_samples(message.get("bytes") or message.get("text"))
+            for index, start_sample, segment in session.push(samples):
+                if signal_conditioner.stages:
+                    # Filtered with its context (already at 360 Hz), off the event loop
+                    with stage('condition'):
+                        segment = await run_inference(signal_conditioner, segment)
+                window = session.cut(segment)
+                # Windows from all open streams share the batched predict
+                y_pred_prob = await asyncio.wrap_future(
+                    inference_scheduler.submit(model_choice, normalize_window(window)))
+                update = build_analysis_result(y_pred_prob.flatten(), class_names)
+                del update["ecg_plot_base64"]
+                update.update({
+                    "window": index,
+                    "start_sample": start_sample,
+                    "start_time": start_sample / MODEL_SAMPLING_RATE,
+                    "rolling_danger_level": session.update_danger(update["danger_level"]),
+                })
+                await websocket.send_json(to_python_type(update))
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        try:
+            await websocket.send_json({"error": str(e)})
+            await websocket.close(code=1011)
+        except Exception:
+            # The error came from (or closed) the socket itself: nobody is left to tell
+            pass
+    finally:
+        stream_sessions.release()
+
 @app.get("/get-random-plot")
 async def get_random_plot():
     try:
         # Get a random color choice from the available datasets
         color_choice = get_random_color()
         # Get a random ECG plot in base64 format
-        result = get_ecg_plot_base64_from_color_choice(color_choice)
+        entry = await run_inference(sample_library.random_entry, color_choice)
+        result = {
+            "plot_url": sample_library.plot(entry),
+            "color_choice": color_choice
+        }
         return to_python_type(result)
+    except ExecutorSaturated as e:
+        return saturated_response(e)
     except Exception as e:
         return JSONResponse(content={"error": str(e)}, status_code=500)
 
+@app.get("/models")
+def list_models():
+    return {
+        "available": available_models(),
+        "resident": model_registry.resident(),
+        "total_bytes": model_registry.total_bytes(),
+        "max_bytes": model_registry.max_bytes,
+    }
+
+@app.get("/metrics")
+def metrics():
+    return Response(content=registry.render(), media_type=METRICS_CONTENT_TYPE)
+
+def profiles_forbidden(request):
+    if not PROFILING_ENABLED:
+        return JSONResponse(content={"error": "Profiling is disabled (ECG_PROFILING=1)."}, status_code=404)
+    if not PROFILING_TOKEN:
+        return JSONResponse(content={"error": "Set ECG_PROFILING_TOKEN to use the profiling endpoints."},
+                            status_code=403)
+    if not authorized(request.headers):
+        return JSONResponse(content={"error": "Missing or invalid X-Profile-Token."}, status_code=403)
+    return None
+
+@app.get("/profiles")
+def profiles(request: Request):
+    return profiles_forbidden(request) or {"limits": profile_limiter.stats(), "profiles": list_profiles()}
+
+@app.post("/profiles/arm")
+def arm_profiles(request: Request, count: int = 1):
+    # Profile the next `count` requests, whatever their headers (still rate limited)
+    return profiles_forbidden(request) or {"armed": profile_limiter.arm(count)}
+
+@app.get("/profiles/{profile_id}")
+def get_profile(profile_id: str, request: Request):
+    try:
+        return profiles_forbidden(request) or load_report(profile_id)
+    except FileNotFoundError:
+        return JSONResponse(content={"error": "Unknown profile."}, status_code=404)
+
+@app.get("/profiles/{profile_id}/{kind}")
+def download_profile(profile_id: str, kind: str, request: Request):
+    # kind: 'pstats' (open with pstats or snakeviz), 'text' or 'json'
+    try:
+        forbidden = profiles_forbidden(request)
+        if forbidden:
+            return forbidden
+        path = artifact_path(profile_id, kind)
+    except FileNotFoundError as e:
+        return JSONResponse(content={"error": str(e)}, status_code=404)
+    except ValueError as e:
+        return JSONResponse(content={"error": str(e)}, status_code=400)
+    return FileResponse(path, filename=os.path.basename(path))
+
+@app.get("/cache/stats")
+def cache_stats():
+    return result_cache.stats()
+
+@app.get("/library")
+def library_stats():
+    return sample_library.stats()
+
 @app.post("/score")
-def create_score(value: int, db: Session = Depends(get_db)):
-    score = Score(value=value)
-    db.add(score)
-    db.commit()
-    db.refresh(score)
+async def create_score(value: int):
+    # Coalesced with concurrent submissions into one transaction by the score writer
+    await asyncio.wrap_future(score_writer.submit(value))
     return JSONResponse(content="Score saved", status_code=201)
 
 @app.get("/score/stats")
 def get_average_score(db: Session = Depends(get_db)):
-    scores = db.query(Score).all()
-    if not scores:
-        return {"average": 0, "numberOfUsers": 0}
-    average = sum(score.value for score in scores) / len(scores)
-    return JSONResponse(content={"average": average, "numberOfUsers": len(scores)}, status_code=200)
+    return JSONResponse(content=read_stats(db), status_code=200)
 
 @app.get("/")
 def index():
@@ -95,8 +412,18 @@ def index():
 # Lambda handler
 handler = Mangum(app)
 
+# Lambda SnapStart: pre-warm once before the execution environment is snapshotted, so that
+# restored environments start with everything imported and loaded
+try:
+    from snapshot_restore_py import register_before_snapshot
+except ImportError:
+    register_before_snapshot = None
+if register_before_snapshot is not None:
+    register_before_snapshot(lambda: prewarm(WARMUP_MODELS))
+
 # For local development
 if __name__ == "__main__":
+    import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
 
 
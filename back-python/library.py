@@ -0,0 +1,254 @@
+import os
+import json
+import random
+import threading
+import time
+import numpy as np
+from management import normalize_data
+from reader import load_signal, ECGReadError
+from render import plot_ecg, PLOT_RENDERER
+from serialization import json_default
+
+# Sample library settings (overridable through the environment)
+LIBRARY_DIR = os.environ.get('ECG_LIBRARY_DIR', 'categorize_dataset/categorize')
+LIBRARY_CACHE_DIR = os.environ.get('ECG_LIBRARY_CACHE_DIR', 'categorize_dataset/.cache')
+# Minimum delay between two checks of the library folders for changes (after the first scan,
+# checks run in a background thread while requests are served from the current index)
+LIBRARY_REFRESH_SECONDS = float(os.environ.get('ECG_LIBRARY_REFRESH_SECONDS', '30'))
+# 2: plots on the models' sampling rate time axis (was 500 Hz)
+# 3: predictions stored in predictions.json instead of index.json
+LIBRARY_CACHE_VERSION = 3
+
+# Danger-level folders of the library for each color
+COLOR_RANGES = {
+    "green": ["0.0-9.0", "10.0-19.0", "20.0-29.0"],
+    "yellow": ["30.0-39.0", "40.0-49.0", "50.0-59.0"],
+    "red": ["60.0-69.0", "70.0-79.0", "80.0-89.0", "90.0-99.0"],
+}
+
+
+class SampleLibrary:
+    """
+    In-memory index of the categorized sample ECGs.
+
+    The library folders are scanned on first use, then rescanned in a background thread at
+    most every LIBRARY_REFRESH_SECONDS; a rescan builds a new index and swaps it in, so
+    requests never wait for it. Each file is parsed, normalized and plotted only when it is
+    new or its mtime changed. Signals, plots and per-model predictions are persisted in
+    LIBRARY_CACHE_DIR (signals.npy, index.json and the small predictions.json rewritten on
+    each new prediction) so that restarts do not redo the work. Signals go through
+    `conditioner` (a preprocessing.SignalConditioner), like uploaded recordings.
+    """
+
+    def __init__(self, base_path=LIBRARY_DIR, cache_dir=LIBRARY_CACHE_DIR,
+                 refresh_seconds=LIBRARY_REFRESH_SECONDS, conditioner=None):
+        self.base_path = base_path
+        self.cache_dir = cache_dir
+        self.refresh_seconds = refresh_seconds
+        self.conditioner = conditioner
+        self._entries = {}
+        self._signals = {}
+        self._by_color = {color: [] for color in COLOR_RANGES}
+        self._last_scan = 0.0
+        self._loaded = False
+        self._lock = threading.RLock()
+        # Held for a whole scan: one rescan at a time
+        self._refresh_lock = threading.Lock()
+
+    # --------- Public API ---------
+    def random_entry(self, color_choice):
+        if color_choice not in COLOR_RANGES:
+            raise ValueError("Invalid color choice. Use 'green', 'yellow', or 'red'.")
+        self.maybe_refresh()
+        with self._lock:
+            paths, entries = self._by_color[color_choice], self._entries
+        if not paths:
+            raise FileNotFoundError(f"No CSV files found for color choice '{color_choice}'")
+        return entries[random.choice(paths)]
+
+    def signal(self, entry):
+        return self._signals[entry['path']]
+
+    def plot(self, entry):
+        return entry['plot']
+
+    def prediction(self, entry, model_choice, model_version, compute):
+        """
+        Cached result of `compute(signal)` for this entry and model; recomputed when
+        `model_version` (the model file mtime) changes.
+        """
+        cached = entry['predictions'].get(model_choice)
+        if cached is not None and cached['version'] == model_version:
+            return cached['result']
+
+        result = compute(self.signal(entry))
+        with self._lock:
+            entry['predictions'][model_choice] = {'version': model_version, 'result': result}
+            self._save_predictions()
+        return result
+
+    def stats(self):
+        with self._lock:
+            return {
+                'files': len(self._entries),
+                'by_color': {color: len(paths) for color, paths in self._by_color.items()},
+                'last_scan': self._last_scan,
+            }
+
+    def maybe_refresh(self):
+        """First scan in the calling thread; later ones in the background, at most every refresh_seconds."""
+        if not self._loaded:
+            self.refresh()
+            return
+        with self._lock:
+            if time.time() - self._last_scan < self.refresh_seconds:
+                return
+            # Set before scanning: requests arriving during the rescan do not start another one
+            self._last_scan = time.time()
+        threading.Thread(target=self._refresh_in_background, name='library-refresh', daemon=True).start()
+
+    def refresh(self):
+        """Rescan the library folders and (re)index new or modified files."""
+        with self._refresh_lock:
+            with self._lock:
+                if not self._loaded:
+                    self._load_cache()
+                    self._loaded = True
+                # Entries are shared with the new index: predictions added meanwhile are kept
+                entries, signals = dict(self._entries), dict(self._signals)
+
+            found = self._scan()
+            changed = False
+            for path in list(entries):
+                if path not in found:
+                    del entries[path]
+                    signals.pop(path, None)
+                    changed = True
+
+            for path, (color, folder_range, mtime, size) in found.items():
+                entry = entries.get(path)
+                if entry is not None and entry['mtime'] == mtime and entry['size'] == size:
+                    continue
+                try:
+                    X = load_signal(path)
+                    if self.conditioner is not None:
+                        X = self.conditioner(X)
+                    X = normalize_data(X).astype(np.float32)
+                except ECGReadError as e:
+                    print(f"Skipping library file {path}: {e}")
+                    continue
+                entries[path] = {
+                    'path': path,
+                    'color': color,
+                    'range': folder_range,
+                    'mtime': mtime,
+                    'size': size,
+                    'plot': plot_ecg(X)['ecg_plot_base64'],
+                    'predictions': {},
+                }
+                signals[path] = X
+                changed = True
+
+            if changed:
+                signals = self._save_signals(entries, signals)
+                self._save_index(entries)
+            by_color = {color: sorted(p for p, e in entries.items() if e['color'] == color)
+                        for color in COLOR_RANGES}
+            with self._lock:
+                self._entries, self._signals, self._by_color = entries, signals, by_color
+                self._last_scan = time.time()
+
+    def _refresh_in_background(self):
+        try:
+            self.refresh()
+        except Exception as e:
+            # The current index keeps being served; the next check retries
+            print(f"Unable to refresh the sample library: {e}")
+
+    # --------- Internals ---------
+    def _scan(self):
+        found = {}
+        if not os.path.exists(self.base_path):
+            return found
+        for color, folder_ranges in COLOR_RANGES.items():
+            for folder_range in folder_ranges:
+                folder_path = os.path.join(self.base_path, folder_range)
+                if not os.path.isdir(folder_path):
+                    continue
+                for item in os.scandir(folder_path):
+                    if item.name.lower().endswith('.csv') and item.is_file():
+                        stat = item.stat()
+                        found[item.path] = (color, folder_range, stat.st_mtime, stat.st_size)
+        return found
+
+    def _preprocessing(self):
+        return self.conditioner.description if self.conditioner is not None else None
+
+    def _index_path(self):
+        return os.path.join(self.cache_dir, 'index.json')
+
+    def _signals_path(self):
+        return os.path.join(self.cache_dir, 'signals.npy')
+
+    def _predictions_path(self):
+        return os.path.join(self.cache_dir, 'predictions.json')
+
+    def _load_cache(self):
+        try:
+            with open(self._index_path()) as f:
+                index = json.load(f)
+            signals = np.load(self._signals_path(), mmap_mode='r')
+        except (OSError, ValueError):
+            return
+        # Plots depend on the renderer, signals on the cache layout and the preprocessing
+        if (index.get('version') != LIBRARY_CACHE_VERSION or index.get('renderer') != PLOT_RENDERER
+                or index.get('preprocessing') != self._preprocessing()):
+            return
+        try:
+            with open(self._predictions_path()) as f:
+                predictions = json.load(f)
+        except (OSError, ValueError):
+            predictions = {}
+        for path, entry in index['entries'].items():
+            entry['predictions'] = predictions.get(path, {})
+            self._entries[path] = entry
+            self._signals[path] = signals[entry['offset']:entry['offset'] + entry['length']]
+
+    def _save_signals(self, entries, signals):
+        """Writes the signals of `entries` and returns them memory-mapped from the file."""
+        # One flat float32 array; each entry records its offset and length in index.json
+        os.makedirs(self.cache_dir, exist_ok=True)
+        offset = 0
+        for path, entry in entries.items():
+            entry['offset'], entry['length'] = offset, len(signals[path])
+            offset += entry['length']
+        flat = np.concatenate([signals[path] for path in entries]) if entries else np.empty(0, dtype=np.float32)
+        _atomic_write(self._signals_path(), lambda f: np.save(f, flat), binary=True)
+        # Reopen memory-mapped so the index does not keep a second copy in RAM
+        mapped = np.load(self._signals_path(), mmap_mode='r')
+        return {path: mapped[entry['offset']:entry['offset'] + entry['length']] for path, entry in entries.items()}
+
+    def _save_index(self, entries):
+        # Plots and file metadata only: predictions change far more often (see _save_predictions)
+        index = {'version': LIBRARY_CACHE_VERSION, 'renderer': PLOT_RENDERER, 'preprocessing': self._preprocessing(),
+                 'entries': {path: {k: v for k, v in entry.items() if k != 'predictions'}
+                             for path, entry in entries.items()}}
+        self._write_json(self._index_path(), index)
+
+    def _save_predictions(self):
+        predictions = {path: entry['predictions'] for path, entry in self._entries.items() if entry['predictions']}
+        self._write_json(self._predictions_path(), predictions)
+
+    def _write_json(self, path, data):
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            _atomic_write(path, lambda f: json.dump(data, f, default=json_default))
+        except OSError as e:
+            print(f"Unable to save the sample library cache: {e}")
+
+
+def _atomic_write(path, write, binary=False):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb' if binary else 'w') as f:
+        write(f)
+    os.replace(tmp_path, path)
@@ -1,27 +1,26 @@
 import numpy as np
-from imblearn.over_sampling import SMOTE
-from imblearn.under_sampling import RandomUnderSampler
-from sklearn.utils import shuffle
 from reader import *
+from dataset import load_dataset
+from preprocessing import SignalConditioner, PREPROCESSING, TARGET_SAMPLING_RATE
 
+# imblearn et scikit-learn ne servent qu'à l'entraînement : ils sont importés à la demande
 
-# Fonction pour charger et étiqueter les données
-def load_and_label_data(base_dir, file_type):
-    all_data = []
-    all_labels = []
-
-    file_paths = get_file_paths(base_dir, file_type)
-    for filepath in file_paths:
-        if file_type == 'frag':
-            data = read_ecg_file_frag(filepath)
-        else:
-            data = read_ecg_file_csv(filepath)
 
-        if data is not None:
-            all_data.append(data)
-            label = os.path.basename(filepath).split('_')[2]
-            all_labels.append(label)
-    return np.array(all_data), np.array(all_labels)
+# Fonction pour charger et étiqueter les données
+def load_and_label_data(base_dir, file_type, use_cache=True, preprocessing=PREPROCESSING,
+                        sampling_rate=TARGET_SAMPLING_RATE):
+    """
+    Renvoie (X, étiquettes) depuis le jeu consolidé de dataset.py : les fichiers ne sont relus
+    (en parallèle) que s'ils ont changé depuis la dernière construction, ou si use_cache=False.
+    Les signaux, enregistrés à sampling_rate, sont ensuite conditionnés par lots (voir
+    preprocessing.py) comme dans l'API ; sans étage ni rééchantillonnage, X reste le tableau mmap.
+    """
+    X, labels = load_dataset(base_dir, file_type, rebuild=not use_cache)
+    if isinstance(X, list):
+        raise ValueError(
+            "Les séquences ECG n'ont pas la même longueur. Assurez-vous de choisir un seul type de fichier à la fois.")
+    X = SignalConditioner(preprocessing)(X, sampling_rate)
+    return X, labels
 
 
 # Fonction pour équilibrer les classes
@@ -30,6 +29,8 @@ def balance_classes(X, y, method):
     Équilibre les classes dans les données.
     method : 'smote' pour sur-échantillonnage, 'under' pour sous-échantillonnage
     """
+    from sklearn.utils import shuffle
+
     unique, counts = np.unique(y, return_counts=True)
     class_distribution = dict(zip(unique, counts))
 
@@ -39,9 +40,11 @@ def balance_classes(X, y, method):
             print("SMOTE ne peut pas être appliqué car certaines classes ont moins de 2 échantillons.")
             return X, y  # Retourner les données sans modification
 
+        from imblearn.over_sampling import SMOTE
         smote = SMOTE()
         X_res, y_res = smote.fit_resample(X, y)
     elif method == 'under':
+        from imblearn.under_sampling import RandomUnderSampler
         under = RandomUnderSampler()
         X_res, y_res = under.fit_resample(X, y)
     elif method == 'none':
@@ -62,6 +65,8 @@ def augment_data(X, y, factor):
     if len(X) != len(y):
         raise ValueError("Les dimensions de X et y doivent être compatibles avant l'augmentation.")
 
+    from sklearn.utils import shuffle
+
     X_augmented = np.repeat(X, factor, axis=0)
     y_augmented = np.repeat(y, factor, axis=0)
 
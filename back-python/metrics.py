@@ -0,0 +1,257 @@
+import os
+import time
+import contextvars
+import threading
+from bisect import bisect_left
+import psutil
+
+# Latency histograms and gauges in the Prometheus text format (served on /metrics)
+METRICS_ENABLED = os.environ.get('ECG_METRICS', '1') == '1'
+# Upper bounds (seconds) of the latency buckets: from sub-millisecond stages to slow uploads
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _format_labels(names, values, extra=''):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _escape(value):
+    return str(value).replace('\\', r'\\').replace('\n', r'\n').replace('"', r'\"')
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    """
+    Cumulative histogram per label combination. observe() is one bisect and one locked
+    increment, so it can sit on the request path; buckets are only summed when rendered.
+    """
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        # Bucket i counts values in (buckets[i-1], buckets[i]]; the last one is +Inf
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def time(self, *labels):
+        return _Timer(self, labels)
+
+    def snapshot(self):
+        with self._lock:
+            return {labels: (list(counts), total) for labels, (counts, total) in self._series.items()}
+
+    def collect(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        for labels, (counts, total) in sorted(self.snapshot().items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f'{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}')
+            lines.append(f'{self.name}_sum{_format_labels(self.labelnames, labels)} {total!r}')
+            lines.append(f'{self.name}_count{_format_labels(self.labelnames, labels)} {cumulative}')
+        return lines
+
+
+class Gauge:
+    """
+    Value read when /metrics is scraped. `read` returns a number, or a dict mapping a label
+    value (or a tuple of label values) to a number. kind='counter' for monotonic totals.
+    """
+
+    def __init__(self, name, documentation, read, labelnames=(), kind='gauge'):
+        self.name = name
+        self.documentation = documentation
+        self.read = read
+        self.labelnames = tuple(labelnames)
+        self.kind = kind
+
+    def collect(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        try:
+            values = self.read()
+        except Exception:
+            # A failing source must not break the whole scrape
+            return lines
+        if not isinstance(values, dict):
+            values = {(): values}
+        for labels, value in sorted(values.items(), key=lambda item: str(item[0])):
+            labels = labels if isinstance(labels, tuple) else (labels,)
+            lines.append(f'{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}')
+        return lines
+
+
+class _Timer:
+    __slots__ = ('histogram', 'labels', 'started')
+
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.started, *self.labels)
+        return False
+
+
+class _NoTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NO_TIMER = _NoTimer()
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} is already registered.")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def gauge(self, name, documentation, read, labelnames=(), kind='gauge'):
+        return self.register(Gauge(name, documentation, read, labelnames, kind))
+
+    def get(self, name):
+        return self._metrics.get(name)
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.collect())
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+STAGE_SECONDS = registry.histogram(
+    'ecg_stage_seconds', 'Duration of each stage of the analysis pipeline.', ('stage', 'model', 'endpoint'))
+REQUEST_SECONDS = registry.histogram(
+    'ecg_http_request_seconds', 'HTTP request duration until the response starts.', ('endpoint', 'method', 'status'))
+
+# Values of the `model` label: names validated by analyse.resolve_models. Any other name is
+# recorded as 'unknown', so a request cannot create new series
+MODEL_LABELS = set()
+# Scope of the request being served, set by MetricsMiddleware (executors copy the context
+# into their threads). Stages run outside a request, e.g. a batch predicted by the
+# scheduler thread for several requests at once, get endpoint=""
+_request_scope = contextvars.ContextVar('ecg_request_scope', default=None)
+
+
+def model_label(model):
+    return model if not model or model in MODEL_LABELS else 'unknown'
+
+
+def _endpoint_label(scope):
+    if scope is None:
+        return ''
+    # The router stores the matched route in the (shared) scope
+    return getattr(scope.get('route'), 'path', 'unmatched')
+
+
+def stage(name, model=''):
+    """Context manager timing one pipeline stage into ecg_stage_seconds{stage, model, endpoint}."""
+    if not METRICS_ENABLED:
+        return _NO_TIMER
+    return _Timer(STAGE_SECONDS, (name, model_label(model), _endpoint_label(_request_scope.get())))
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording ecg_http_request_seconds for every HTTP request, labelled with
+    the route template (not the raw path), so the number of series stays bounded. It also
+    gives the stages of HTTP and WebSocket requests their `endpoint` label.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] not in ('http', 'websocket') or not METRICS_ENABLED:
+            await self.app(scope, receive, send)
+            return
+        token = _request_scope.set(scope)
+        try:
+            if scope['type'] == 'http':
+                await self._timed(scope, receive, send)
+            else:
+                await self.app(scope, receive, send)
+        finally:
+            _request_scope.reset(token)
+
+    async def _timed(self, scope, receive, send):
+        started = time.perf_counter()
+        recorded = False
+
+        def record(status):
+            nonlocal recorded
+            recorded = True
+            REQUEST_SECONDS.observe(time.perf_counter() - started, _endpoint_label(scope), scope['method'], str(status))
+
+        async def send_with_metrics(message):
+            if message['type'] == 'http.response.start':
+                record(message['status'])
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_metrics)
+        finally:
+            if not recorded:
+                record(500)
+
+
+# --------- Process metrics ---------
+# ressources.monitor_resources samples CPU for a full second (system wide); a scrape only
+# reads this process's counters, which psutil returns without waiting (looked up per scrape,
+# so a forked worker reports itself)
+def _process():
+    return psutil.Process(os.getpid())
+
+
+registry.gauge('process_resident_memory_bytes', 'Resident memory size in bytes.',
+               lambda: _process().memory_info().rss)
+registry.gauge('process_virtual_memory_bytes', 'Virtual memory size in bytes.',
+               lambda: _process().memory_info().vms)
+registry.gauge('process_cpu_seconds_total', 'User and system CPU time in seconds.',
+               lambda: sum(_process().cpu_times()[:2]), kind='counter')
+registry.gauge('process_threads', 'Number of OS threads.', lambda: _process().num_threads())
+registry.gauge('process_start_time_seconds', 'Start time of the process since the epoch.',
+               lambda: _process().create_time())
@@ -5,3 +5,16 @@ class Score(Base):
     __tablename__ = "scores"
     id = Column(Integer, primary_key=True, index=True)
     value = Column(Integer, nullable=False)
+
+class ScoreTotals(Base):
+    # Single row (id=1) kept in step with `scores`: /score/stats reads it instead of scanning
+    __tablename__ = "score_totals"
+    id = Column(Integer, primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+    total = Column(Integer, nullable=False, default=0)
+
+class ScoreBucket(Base):
+    # Histogram of submitted values: one row per distinct score
+    __tablename__ = "score_buckets"
+    value = Column(Integer, primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
@@ -0,0 +1,153 @@
+import json
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+def _sigmoid(x):
+    # Same function as 1 / (1 + exp(-x)), with fewer temporaries and no overflow warning
+    return np.tanh(x * 0.5) * 0.5 + 0.5
+
+
+def _softmax(x):
+    e = np.exp(x - x.max(axis=-1, keepdims=True))
+    return e / e.sum(axis=-1, keepdims=True)
+
+
+ACTIVATIONS = {
+    'linear': lambda x: x,
+    'relu': lambda x: np.maximum(x, 0),
+    'tanh': np.tanh,
+    'sigmoid': _sigmoid,
+    'hard_sigmoid': lambda x: np.clip(x / 6.0 + 0.5, 0.0, 1.0),
+    'softmax': _softmax,
+}
+
+
+def _same_padding(length, span, strides):
+    # Same split as TensorFlow: the extra sample goes after the signal
+    out = -(-length // strides)
+    total = max((out - 1) * strides + span - length, 0)
+    return total // 2, total - total // 2
+
+
+def _dense(x, layer, weights):
+    y = x @ weights['kernel']
+    if 'bias' in weights:
+        y = y + weights['bias']
+    return ACTIVATIONS[layer['activation']](y)
+
+
+def _conv1d(x, layer, weights):
+    kernel = weights['kernel']
+    size, channels, filters = kernel.shape
+    strides, dilation = layer['strides'], layer['dilation_rate']
+    span = (size - 1) * dilation + 1
+    if layer['padding'] == 'same':
+        x = np.pad(x, ((0, 0), _same_padding(x.shape[1], span, strides), (0, 0)))
+    elif layer['padding'] == 'causal':
+        x = np.pad(x, ((0, 0), (span - 1, 0), (0, 0)))
+    # (n, out, channels, span) -> (n, out, size, channels), then one matrix product
+    windows = sliding_window_view(x, span, axis=1)[:, ::strides, :, ::dilation].transpose(0, 1, 3, 2)
+    y = windows.reshape(-1, size * channels) @ kernel.reshape(size * channels, filters)
+    y = y.reshape(x.shape[0], -1, filters)
+    if 'bias' in weights:
+        y = y + weights['bias']
+    return ACTIVATIONS[layer['activation']](y)
+
+
+def _max_pooling1d(x, layer, weights):
+    pool, strides = layer['pool_size'], layer['strides']
+    if layer['padding'] == 'same':
+        x = np.pad(x, ((0, 0), _same_padding(x.shape[1], pool, strides), (0, 0)), constant_values=-np.inf)
+    return sliding_window_view(x, pool, axis=1)[:, ::strides].max(axis=-1)
+
+
+def _flatten(x, layer, weights):
+    return x.reshape(x.shape[0], -1)
+
+
+def _identity(x, layer, weights):
+    # Dropout and InputLayer do nothing at inference
+    return x
+
+
+def _input_projection(x, weights):
+    # Input projections of all time steps at once, time-major so that each step reads
+    # a contiguous block; only the recurrence itself is sequential
+    projected = np.ascontiguousarray((x @ weights['kernel']).transpose(1, 0, 2))
+    if 'bias' in weights:
+        projected += weights['bias']
+    return projected
+
+
+def _simple_rnn(x, layer, weights):
+    activation = ACTIVATIONS[layer['activation']]
+    projected = _input_projection(x, weights)
+    recurrent = weights['recurrent_kernel']
+    h = np.zeros((x.shape[0], recurrent.shape[0]), dtype=x.dtype)
+    outputs = np.empty_like(projected[..., :recurrent.shape[0]]) if layer['return_sequences'] else None
+    for t in range(len(projected)):
+        h = activation(projected[t] + h @ recurrent)
+        if outputs is not None:
+            outputs[t] = h
+    return outputs.transpose(1, 0, 2) if outputs is not None else h
+
+
+def _lstm(x, layer, weights):
+    activation = ACTIVATIONS[layer['activation']]
+    recurrent_activation = ACTIVATIONS[layer['recurrent_activation']]
+    projected = _input_projection(x, weights)
+    recurrent = weights['recurrent_kernel']
+    units = recurrent.shape[0]
+    h = np.zeros((x.shape[0], units), dtype=x.dtype)
+    c = np.zeros_like(h)
+    outputs = np.empty_like(projected[..., :units]) if layer['return_sequences'] else None
+    for t in range(len(projected)):
+        # Keras gate order: input, forget, cell, output. One activation call over all the
+        # gates is cheaper than four on slices; the cell slice of `gates` is unused.
+        z = projected[t] + h @ recurrent
+        gates = recurrent_activation(z)
+        c = gates[:, units:2 * units] * c + gates[:, :units] * activation(z[:, 2 * units:3 * units])
+        h = gates[:, 3 * units:] * activation(c)
+        if outputs is not None:
+            outputs[t] = h
+    return outputs.transpose(1, 0, 2) if outputs is not None else h
+
+
+LAYERS = {
+    'InputLayer': _identity,
+    'Dropout': _identity,
+    'Dense': _dense,
+    'Conv1D': _conv1d,
+    'MaxPooling1D': _max_pooling1d,
+    'Flatten': _flatten,
+    'SimpleRNN': _simple_rnn,
+    'LSTM': _lstm,
+}
+
+
+class NumpyModel:
+    """
+    Forward pass of a Keras Sequential model in NumPy, from the .npz written by
+    export.export_npz (architecture as JSON plus one array per weight). No TensorFlow,
+    no shared state: calls from several threads run in parallel.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with np.load(path, allow_pickle=False) as archive:
+            architecture = json.loads(str(archive['architecture']))
+            arrays = {name: archive[name] for name in archive.files if name != 'architecture'}
+        self.input_shape = tuple(architecture['input_shape'])
+        self.layers = []
+        for index, layer in enumerate(architecture['layers']):
+            if layer['type'] not in LAYERS:
+                raise ValueError(f"Unsupported layer in {path}: {layer['type']}")
+            weights = {name: arrays[f'{index}/{name}'] for name in layer['weights']}
+            self.layers.append((LAYERS[layer['type']], layer, weights))
+
+    def predict(self, X):
+        x = np.asarray(X, dtype=np.float32).reshape((-1,) + self.input_shape)
+        for forward, layer, weights in self.layers:
+            x = forward(x, layer, weights)
+        return x
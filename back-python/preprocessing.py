@@ -0,0 +1,177 @@
+import os
+from fractions import Fraction
+from functools import lru_cache
+import numpy as np
+
+# Conditionnement des signaux avant normalize_data : rééchantillonnage vers la fréquence des
+# modèles, retrait de la ligne de base, filtres passe-bande et coupe-bande. Appliqué de la même
+# façon à l'inférence (analyse.load_ecg) et à l'entraînement (management.load_and_label_data).
+# Chaque étage traite un signal 1D ou un lot 2D (signaux, échantillons) le long du dernier axe.
+# SciPy n'est importé que si des filtres sont configurés ou qu'un signal doit être conditionné.
+
+# Fréquence d'échantillonnage des enregistrements d'entraînement des modèles (MIT-BIH)
+TARGET_SAMPLING_RATE = 360
+# Étages appliqués après le rééchantillonnage, toujours dans cet ordre
+STAGES = ['baseline', 'bandpass', 'notch']
+# Étages activés, séparés par des virgules (ex. 'baseline,bandpass,notch'). Vide par défaut :
+# les modèles actuels sont entraînés sur les signaux bruts. L'API et l'entraînement doivent
+# utiliser les mêmes étages.
+PREPROCESSING = os.environ.get('ECG_PREPROCESSING', '')
+# Bande passante (Hz) : 0.5 Hz retire la dérive respiratoire, 40 Hz le bruit musculaire
+BANDPASS_HZ = tuple(float(f) for f in os.environ.get('ECG_BANDPASS_HZ', '0.5,40').split(','))
+# Fréquence du secteur (50 Hz en Europe, 60 Hz en Amérique du Nord)
+NOTCH_HZ = float(os.environ.get('ECG_NOTCH_HZ', '50'))
+NOTCH_QUALITY = 30.0
+FILTER_ORDER = 4
+# Fenêtres (secondes) des deux médianes glissantes qui estiment la ligne de base :
+# la première efface les QRS et les ondes P, la seconde les ondes T
+BASELINE_WINDOWS = (0.2, 0.6)
+# Signaux d'un lot 2D traités à la fois : borne la mémoire des intermédiaires float64
+CHUNK_ROWS = int(os.environ.get('ECG_PREPROCESSING_CHUNK', '4096'))
+# Plus grand dénominateur du rapport de rééchantillonnage (la longueur du filtre polyphase en dépend)
+MAX_RESAMPLING_DENOMINATOR = 1000
+
+
+def parse_stages(stages):
+    """Étages demandés (liste ou chaîne 'a,b'), dans l'ordre d'application."""
+    if isinstance(stages, str):
+        stages = [stage.strip() for stage in stages.split(',') if stage.strip()]
+    unknown = set(stages) - set(STAGES)
+    if unknown:
+        raise ValueError(f"Étages de prétraitement inconnus : {sorted(unknown)}. Choisissez parmi {STAGES}.")
+    return tuple(stage for stage in STAGES if stage in stages)
+
+
+# --------- Coefficients (conçus une fois par jeu de paramètres) ---------
+@lru_cache(maxsize=32)
+def filter_sos(stages, fs, bandpass=BANDPASS_HZ, notch=NOTCH_HZ, order=FILTER_ORDER, quality=NOTCH_QUALITY):
+    """
+    Sections du second ordre de la cascade passe-bande + coupe-bande pour ces étages, ou None
+    si aucun filtre : les deux filtres sont appliqués en un seul passage de sosfiltfilt.
+    """
+    if 'bandpass' not in stages and 'notch' not in stages:
+        return None
+    from scipy.signal import butter, iirnotch, tf2sos
+
+    nyquist = fs / 2
+    sections = []
+    if 'bandpass' in stages:
+        low, high = bandpass
+        if not 0 < low < high < nyquist:
+            raise ValueError(f"Bande passante invalide {bandpass} Hz pour fs = {fs} Hz.")
+        sections.append(butter(order, [low, high], btype='bandpass', fs=fs, output='sos'))
+    if 'notch' in stages:
+        if not 0 < notch < nyquist:
+            raise ValueError(f"Fréquence du coupe-bande invalide {notch} Hz pour fs = {fs} Hz.")
+        sections.append(tf2sos(*iirnotch(notch, quality, fs=fs)))
+    return np.concatenate(sections)
+
+
+def resampling_ratio(from_rate, to_rate=TARGET_SAMPLING_RATE):
+    """(up, down) tels que to_rate / from_rate = up / down."""
+    if not from_rate > 0:
+        raise ValueError(f"Fréquence d'échantillonnage invalide : {from_rate}.")
+    ratio = (Fraction(float(to_rate)) / Fraction(float(from_rate))).limit_denominator(MAX_RESAMPLING_DENOMINATOR)
+    return ratio.numerator, ratio.denominator
+
+
+@lru_cache(maxsize=32)
+def resampling_filter(up, down):
+    """Filtre anti-repliement de resample_poly pour up/down (la conception par défaut de SciPy)."""
+    from scipy.signal import firwin
+
+    max_rate = max(up, down)
+    h = firwin(2 * 10 * max_rate + 1, 1.0 / max_rate, window=('kaiser', 5.0))
+    h.flags.writeable = False
+    return h
+
+
+# --------- Étages ---------
+def resample(X, from_rate, to_rate=TARGET_SAMPLING_RATE):
+    """Rééchantillonnage polyphase de X (1D ou 2D) le long du dernier axe."""
+    from scipy.signal import resample_poly
+
+    up, down = resampling_ratio(from_rate, to_rate)
+    if up == down:
+        return X
+    # padtype='line' : les bords ne sont pas tirés vers 0 quand le signal a un décalage
+    return resample_poly(X, up, down, axis=-1, window=resampling_filter(up, down), padtype='line')
+
+
+def remove_baseline(X, fs, windows=BASELINE_WINDOWS):
+    """Soustrait la ligne de base estimée par deux médianes glissantes successives."""
+    from scipy.ndimage import median_filter
+
+    baseline = X
+    for seconds in windows:
+        size = int(seconds * fs) // 2 * 2 + 1
+        if baseline.ndim == 1:
+            baseline = median_filter(baseline, size=size, mode='nearest')
+        else:
+            # Le chemin 1D de median_filter est ~20x plus rapide que le filtre 2D générique (size=(1, k))
+            baseline = np.stack([median_filter(row, size=size, mode='nearest') for row in baseline])
+    return X - baseline
+
+
+def apply_filters(X, sos):
+    """Filtrage aller-retour (sans déphasage) de X le long du dernier axe."""
+    from scipy.signal import sosfiltfilt
+
+    # Le remplissage par défaut de sosfiltfilt dépasse la longueur des signaux très courts
+    padlen = min(3 * (2 * len(sos) + 1), X.shape[-1] - 1)
+    return sosfiltfilt(sos, X, axis=-1, padlen=padlen)
+
+
+class SignalConditioner:
+    """
+    Étages de prétraitement configurés une fois et appliqués par conditioner(X, sampling_rate).
+
+    X est un signal 1D ou un tableau 2D de signaux de même longueur ; sampling_rate est la
+    fréquence d'échantillonnage de X (par défaut celle des modèles). X est rééchantillonné vers
+    target_rate puis passe par les étages activés ; il est renvoyé tel quel (sans copie) quand
+    il n'y a rien à faire.
+    """
+
+    def __init__(self, stages=PREPROCESSING, target_rate=TARGET_SAMPLING_RATE, chunk_rows=CHUNK_ROWS):
+        self.stages = parse_stages(stages)
+        self.target_rate = target_rate
+        self.chunk_rows = chunk_rows
+        # Conçoit (et valide) les filtres dès la configuration
+        self.sos = filter_sos(self.stages, target_rate)
+
+    @property
+    def description(self):
+        """Étages et paramètres, pour invalider les caches de signaux conditionnés."""
+        parts = [f'fs={self.target_rate}']
+        for stage in self.stages:
+            parts.append({'baseline': f'baseline{BASELINE_WINDOWS}', 'bandpass': f'bandpass{BANDPASS_HZ}',
+                          'notch': f'notch({NOTCH_HZ}, {NOTCH_QUALITY})'}[stage])
+        return ','.join(parts)
+
+    def __call__(self, X, sampling_rate=None):
+        rate = self.target_rate if sampling_rate is None else float(sampling_rate)
+        if not self.stages and rate == self.target_rate:
+            return X
+        if X.ndim == 1:
+            return self._condition(np.asarray(X, dtype=np.float64), rate)
+        if X.ndim != 2:
+            raise ValueError("Le signal doit être un tableau 1D ou 2D (signaux, échantillons).")
+
+        # Lot 2D : par blocs de lignes, dans un tableau du type d'origine (float32 pour un jeu de données)
+        output = None
+        for start in range(0, len(X), self.chunk_rows):
+            chunk = self._condition(np.asarray(X[start:start + self.chunk_rows], dtype=np.float64), rate)
+            if output is None:
+                dtype = X.dtype if np.issubdtype(X.dtype, np.floating) else np.float64
+                output = np.empty((len(X), chunk.shape[-1]), dtype=dtype)
+            output[start:start + len(chunk)] = chunk
+        return X if output is None else output
+
+    def _condition(self, X, rate):
+        X = resample(X, rate, self.target_rate)
+        if 'baseline' in self.stages:
+            X = remove_baseline(X, self.target_rate)
+        if self.sos is not None:
+            X = apply_filters(X, self.sos)
+        return X
+
@@ -0,0 +1,329 @@
+import os
+import io
+import hmac
+import asyncio
+import json
+import time
+import uuid
+import random
+import threading
+import contextvars
+import cProfile
+import pstats
+import tracemalloc
+from collections import deque
+import psutil
+
+# On-demand profiling of single requests (cProfile call tree + tracemalloc allocations).
+# Off unless ECG_PROFILING=1; a request is profiled when it sends `X-Profile: 1`, when an
+# admin armed the next requests (POST /profiles/arm), or when it is drawn by the sample rate.
+PROFILING_ENABLED = os.environ.get('ECG_PROFILING', '0') == '1'
+# Triggering a profile (X-Profile), arming and reading the artifacts require
+# `X-Profile-Token: <token>`. Left empty, they are refused and only the sample rate profiles requests
+PROFILING_TOKEN = os.environ.get('ECG_PROFILING_TOKEN', '')
+# Fraction of requests profiled without being asked (0 = only on demand)
+PROFILING_SAMPLE_RATE = float(os.environ.get('ECG_PROFILING_SAMPLE_RATE', '0'))
+# At most this many profiles per minute, one at a time (tracemalloc is process-wide)
+PROFILING_MAX_PER_MINUTE = int(os.environ.get('ECG_PROFILING_MAX_PER_MINUTE', '6'))
+PROFILING_DIR = os.environ.get('ECG_PROFILING_DIR', '/tmp/ecg-profiles')
+# Artifacts kept on disk (oldest deleted first)
+PROFILING_MAX_ARTIFACTS = int(os.environ.get('ECG_PROFILING_MAX_ARTIFACTS', '50'))
+PROFILING_TOP_N = int(os.environ.get('ECG_PROFILING_TOP_N', '25'))
+# Frames kept per allocation by tracemalloc (more frames, more overhead while tracing)
+PROFILING_TRACE_FRAMES = int(os.environ.get('ECG_PROFILING_TRACE_FRAMES', '5'))
+
+# Profile of the request being handled, copied into the executor threads with the context
+current_profile = contextvars.ContextVar('current_profile', default=None)
+
+
+class ProfileLimiter:
+    """Allows at most `max_per_minute` profiles in any 60 s window and one at a time."""
+
+    def __init__(self, max_per_minute=PROFILING_MAX_PER_MINUTE):
+        self.max_per_minute = max_per_minute
+        self._started = deque()
+        self._active = False
+        self._armed = 0
+        self._lock = threading.Lock()
+
+    def arm(self, count):
+        with self._lock:
+            self._armed = max(0, int(count))
+            return self._armed
+
+    @property
+    def armed(self):
+        return self._armed
+
+    def take_armed(self):
+        with self._lock:
+            if self._armed <= 0:
+                return False
+            self._armed -= 1
+            return True
+
+    def acquire(self):
+        now = time.monotonic()
+        with self._lock:
+            while self._started and now - self._started[0] >= 60:
+                self._started.popleft()
+            if self._active or len(self._started) >= self.max_per_minute:
+                return False
+            self._started.append(now)
+            self._active = True
+            return True
+
+    def release(self):
+        with self._lock:
+            self._active = False
+
+    def stats(self):
+        with self._lock:
+            return {'active': self._active, 'armed': self._armed, 'last_minute': len(self._started),
+                    'max_per_minute': self.max_per_minute}
+
+
+class ProfileSession:
+    """
+    One profiled request. cProfile only sees the thread it is enabled in, so every piece of
+    work run for the request (see run) gets its own profiler; they are merged at the end.
+    tracemalloc is process-wide: allocations of concurrent requests are included.
+    """
+
+    def __init__(self, label, profile_id=None):
+        self.id = profile_id or uuid.uuid4().hex[:16]
+        self.label = label
+        self.profiles = []
+        self.notes = []
+        self._lock = threading.Lock()
+        self._owns_tracemalloc = False
+
+    def start(self):
+        self.started_at = time.time()
+        self._started = time.perf_counter()
+        self._rss_before = psutil.Process(os.getpid()).memory_info().rss
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(PROFILING_TRACE_FRAMES)
+            self._owns_tracemalloc = True
+        tracemalloc.reset_peak()
+        self._traced_before = tracemalloc.get_traced_memory()[0]
+        self._snapshot_before = tracemalloc.take_snapshot()
+        return self
+
+    def run(self, fn, *args, **kwargs):
+        """Runs fn in the current thread under a profiler attached to this session."""
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError as e:
+            # Another profiler is active in this thread
+            self.note(f"{getattr(fn, '__name__', fn)} not profiled: {e}")
+            return fn(*args, **kwargs)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            profile.disable()
+            with self._lock:
+                self.profiles.append(profile)
+
+    def note(self, note):
+        with self._lock:
+            self.notes.append(note)
+
+    def finish(self, **details):
+        """Stops tracing, writes the artifacts and returns the report."""
+        wall_seconds = time.perf_counter() - self._started
+        traced, peak = tracemalloc.get_traced_memory()
+        snapshot = tracemalloc.take_snapshot()
+        if self._owns_tracemalloc:
+            tracemalloc.stop()
+        growth = [stat for stat in snapshot.compare_to(self._snapshot_before, 'lineno') if stat.size_diff > 0]
+        growth = sorted(growth, key=lambda stat: stat.size_diff, reverse=True)[:PROFILING_TOP_N]
+
+        report = {
+            'id': self.id,
+            'label': self.label,
+            'started_at': self.started_at,
+            'wall_seconds': wall_seconds,
+            # Highest traced memory above the level at the start of the request
+            'peak_allocated_bytes': max(0, peak - self._traced_before),
+            'retained_bytes': traced - self._traced_before,
+            'rss_before_bytes': self._rss_before,
+            'rss_after_bytes': psutil.Process(os.getpid()).memory_info().rss,
+            'top_allocations': [
+                {'location': f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+                 'size_diff_bytes': stat.size_diff, 'count_diff': stat.count_diff}
+                for stat in growth
+            ],
+            'profiled_calls': len(self.profiles),
+            'notes': self.notes,
+        }
+        report.update(details)
+        if self.profiles:
+            stats = pstats.Stats(*self.profiles)
+            report['profile_seconds'] = stats.total_tt
+            report['top_functions'] = _top_functions(stats, PROFILING_TOP_N)
+        else:
+            report['profile_seconds'] = 0.0
+            report['top_functions'] = []
+            stats = None
+        save_artifacts(report, stats)
+        return report
+
+
+def _top_functions(stats, top_n):
+    # Sorted by cumulative time, like `pstats ... sort_stats('cumulative')`
+    rows = []
+    for (filename, lineno, name), (cc, nc, tt, ct, _) in stats.stats.items():
+        rows.append({'function': f"{filename}:{lineno}({name})", 'calls': nc,
+                     'total_seconds': tt, 'cumulative_seconds': ct})
+    rows.sort(key=lambda row: row['cumulative_seconds'], reverse=True)
+    return rows[:top_n]
+
+
+def _artifact_path(profile_id, extension):
+    if not profile_id.isalnum():
+        raise FileNotFoundError("Unknown profile.")
+    return os.path.join(PROFILING_DIR, f"{profile_id}.{extension}")
+
+
+def save_artifacts(report, stats=None):
+    os.makedirs(PROFILING_DIR, exist_ok=True)
+    if stats is not None:
+        stats.dump_stats(_artifact_path(report['id'], 'prof'))
+        text = io.StringIO()
+        pstats.Stats(_artifact_path(report['id'], 'prof'), stream=text).sort_stats('cumulative').print_stats(
+            PROFILING_TOP_N * 2)
+        with open(_artifact_path(report['id'], 'txt'), 'w') as f:
+            f.write(text.getvalue())
+    tmp_path = _artifact_path(report['id'], 'json') + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(report, f)
+    os.replace(tmp_path, _artifact_path(report['id'], 'json'))
+    _prune()
+
+
+def _prune():
+    reports = sorted((entry for entry in os.scandir(PROFILING_DIR) if entry.name.endswith('.json')),
+                     key=lambda entry: entry.stat().st_mtime)
+    for entry in reports[:max(0, len(reports) - PROFILING_MAX_ARTIFACTS)]:
+        profile_id = entry.name[:-len('.json')]
+        for extension in ('json', 'prof', 'txt'):
+            try:
+                os.remove(_artifact_path(profile_id, extension))
+            except FileNotFoundError:
+                pass
+
+
+def list_profiles():
+    if not os.path.isdir(PROFILING_DIR):
+        return []
+    summaries = []
+    for entry in os.scandir(PROFILING_DIR):
+        if entry.name.endswith('.json'):
+            try:
+                report = load_report(entry.name[:-len('.json')])
+            except (OSError, ValueError):
+                continue
+            summaries.append({key: report.get(key) for key in
+                              ('id', 'label', 'started_at', 'wall_seconds', 'peak_allocated_bytes', 'status')})
+    return sorted(summaries, key=lambda summary: summary['started_at'], reverse=True)
+
+
+def load_report(profile_id):
+    with open(_artifact_path(profile_id, 'json')) as f:
+        return json.load(f)
+
+
+def artifact_path(profile_id, kind):
+    """Path of a stored artifact: 'pstats' (cProfile dump), 'text' (pstats listing) or 'json'."""
+    extension = {'pstats': 'prof', 'text': 'txt', 'json': 'json'}.get(kind)
+    if extension is None:
+        raise ValueError("Unknown artifact kind. Use 'pstats', 'text' or 'json'.")
+    path = _artifact_path(profile_id, extension)
+    if not os.path.exists(path):
+        raise FileNotFoundError("Unknown profile.")
+    return path
+
+
+def profile_call(fn, *args, label=None, **kwargs):
+    """
+    Runs fn(*args, **kwargs) profiled, outside of any request (e.g. analyze_ecg from a shell).
+    Returns (result, report). Not rate limited.
+    """
+    session = ProfileSession(label or getattr(fn, '__name__', 'call')).start()
+    token = current_profile.set(session)
+    try:
+        result = session.run(fn, *args, **kwargs)
+    finally:
+        current_profile.reset(token)
+        report = session.finish()
+    return result, report
+
+
+def authorized(headers):
+    # No token configured: the profiles (paths, arguments, allocations) are never exposed
+    return bool(PROFILING_TOKEN) and hmac.compare_digest(headers.get('x-profile-token', ''), PROFILING_TOKEN)
+
+
+profile_limiter = ProfileLimiter()
+
+
+class ProfilingMiddleware:
+    """
+    ASGI middleware profiling the requests selected by the header, the armed count or the
+    sample rate (within profile_limiter's limits). The profile id is returned in the
+    `X-Profile-Id` response header; see the /profiles endpoints for the artifacts.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or not PROFILING_ENABLED or scope['path'].startswith('/profiles'):
+            await self.app(scope, receive, send)
+            return
+
+        headers = {name.decode('latin-1').lower(): value.decode('latin-1') for name, value in scope['headers']}
+        requested = headers.get('x-profile') == '1' and authorized(headers)
+        armed = not requested and profile_limiter.armed > 0
+        if not (requested or armed or random.random() < PROFILING_SAMPLE_RATE):
+            await self.app(scope, receive, send)
+            return
+        if not profile_limiter.acquire():
+            await self.app(scope, receive, _with_header(send, b'x-profile-skipped', b'rate-limited')
+                           if requested else send)
+            return
+        # An armed slot is only used up by a request that is actually profiled
+        if armed:
+            profile_limiter.take_armed()
+
+        session = ProfileSession(f"{scope['method']} {scope['path']}")
+        status = {}
+
+        async def send_with_id(message):
+            if message['type'] == 'http.response.start':
+                status['status'] = message['status']
+            await _with_header(send, b'x-profile-id', session.id.encode())(message)
+
+        try:
+            # Snapshots, their comparison and the artifact writes take up to seconds: off the event loop
+            await asyncio.to_thread(session.start)
+            token = current_profile.set(session)
+            try:
+                await self.app(scope, receive, send_with_id)
+            finally:
+                current_profile.reset(token)
+                route = scope.get('route')
+                await asyncio.to_thread(session.finish, status=status.get('status', 500),
+                                        endpoint=getattr(route, 'path', scope['path']))
+        finally:
+            profile_limiter.release()
+
+
+def _with_header(send, name, value):
+    async def send_with_header(message):
+        if message['type'] == 'http.response.start':
+            message = dict(message, headers=list(message.get('headers', [])) + [(name, value)])
+        await send(message)
+    return send_with_header
@@ -1,12 +1,24 @@
 import os
-import wfdb
-import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-import scipy.signal as signal
 import io
 import base64
-import scipy.interpolate as interp
+import hashlib
+import tempfile
+import threading
+import functools
+from preprocessing import TARGET_SAMPLING_RATE
+
+# wfdb, pandas, scipy et matplotlib sont importés dans les fonctions qui les utilisent :
+# ils ne coûtent rien au démarrage de l'API tant qu'ils ne servent pas
+
+@functools.lru_cache(maxsize=None)
+def _pyarrow_csv():
+    # pyarrow est optionnel : il accélère la lecture des longs CSV (importé au premier long fichier)
+    try:
+        import pyarrow.csv as pa_csv
+    except ImportError:
+        return None
+    return pa_csv
 
 # 1. Téléchargement et lecture des données
 # Fonction pour obtenir tous les chemins des fichiers selon le type de fichier
@@ -22,25 +34,286 @@ def get_file_paths(base_dir, file_type):
                     file_paths.append(os.path.join(root, file))
     return file_paths
 
+# 2. Lecture validée des signaux (CSV / WFDB) avec cache binaire
+# Version du format de lecture : la changer invalide le cache
+READER_VERSION = b'1'
+# Dossier du cache .npy (clé = hash du contenu) ; ECG_SIGNAL_CACHE=0 le désactive
+SIGNAL_CACHE_DIR = os.environ.get('ECG_SIGNAL_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'ecg_signal_cache'))
+SIGNAL_CACHE_ENABLED = os.environ.get('ECG_SIGNAL_CACHE', '1') == '1'
+# Les contenus en mémoire (envois à l'API) ne sont pas mis en cache par défaut : ce serait une
+# écriture disque par requête, et des signaux de patients conservés même sans ECG_PERSIST_UPLOADS
+# (les renvois sont déjà servis par le cache de résultats de l'API)
+SIGNAL_CACHE_UPLOADS = os.environ.get('ECG_SIGNAL_CACHE_UPLOADS', '0') == '1'
+SIGNAL_CACHE_MAX_FILES = int(os.environ.get('ECG_SIGNAL_CACHE_MAX_FILES', '10000'))
+# Le dossier n'est parcouru pour supprimer les plus anciens fichiers qu'une écriture sur N, en arrière-plan
+SIGNAL_CACHE_PRUNE_EVERY = int(os.environ.get('ECG_SIGNAL_CACHE_PRUNE_EVERY', '100'))
+MIN_SIGNAL_LENGTH = 2
+
+# Noms de colonnes reconnus dans les en-têtes, par ordre de priorité
+SIGNAL_COLUMN_NAMES = ['voltage', 'signal', 'ecg', 'mlii', 'ii', 'v1', 'v5', 'lead', 'mv', 'amplitude', 'value']
+TIME_COLUMN_NAMES = ['time', 't', 'seconds', 's', 'sample', 'samples', 'index', 'unnamed: 0', '']
+
+
+class ECGReadError(ValueError):
+    """Fichier ECG illisible ou ne contenant pas de signal exploitable."""
+
+
+def _is_number(token):
+    try:
+        float(token)
+        return True
+    except ValueError:
+        return False
+
+
+def _split_first_line(data):
+    """Renvoie (première ligne non vide, reste du fichier) sans découper tout le fichier."""
+    rest = data.lstrip()
+    while rest:
+        line, _, rest = rest.partition(b'\n')
+        line = line.strip()
+        if line.strip(b','):
+            return line, rest
+    return None, b''
+
+
+def choose_signal_column(names):
+    """Renvoie l'index de la colonne du signal parmi les noms d'en-tête."""
+    lowered = [name.strip().strip('"').lower() for name in names]
+    for candidate in SIGNAL_COLUMN_NAMES:
+        if candidate in lowered:
+            return lowered.index(candidate)
+    # Sinon, la dernière colonne qui n'est pas une colonne de temps/index
+    for i in range(len(lowered) - 1, -1, -1):
+        if lowered[i] not in TIME_COLUMN_NAMES:
+            return i
+    raise ECGReadError(f"Aucune colonne de signal trouvée dans l'en-tête {names}.")
+
+
+def _parse_table(body, n_cols):
+    """Parse un bloc CSV numérique régulier en tableau (n_lignes, n_cols)."""
+    pa_csv = _pyarrow_csv() if body.count(b'\n') > 1000 else None
+    if pa_csv is not None:
+        table = pa_csv.read_csv(io.BytesIO(body),
+                                read_options=pa_csv.ReadOptions(autogenerate_column_names=True))
+        return np.column_stack([table.column(i).to_numpy(zero_copy_only=False).astype(np.float64)
+                                for i in range(table.num_columns)])
+    try:
+        tokens = body.replace(b'\r', b'').replace(b'\n', b',').strip(b',').split(b',')
+        values = np.array(tokens, dtype=np.float64)
+        if values.size % n_cols == 0:
+            return values.reshape(-1, n_cols)
+    except ValueError:
+        pass
+    # Fichier irrégulier (cellules vides, lignes de longueurs différentes) : pandas
+    import pandas as pd
+    return pd.read_csv(io.BytesIO(body), header=None).values.astype(np.float64)
+
+
+def parse_ecg_csv(data):
+    """
+    Extrait le signal d'un CSV (bytes). Détecte l'en-tête et choisit la colonne du signal
+    (ex. time,voltage -> voltage). Sans en-tête : une ligne ou une colonne est prise telle
+    quelle, deux colonnes dont la première est croissante sont lues comme (temps, signal),
+    sinon le tableau est aplati ligne par ligne comme auparavant.
+    """
+    first_line, rest = _split_first_line(data)
+    if first_line is None:
+        raise ECGReadError("Le fichier est vide.")
+
+    first = [token.strip().decode('utf-8', 'replace') for token in first_line.split(b',')]
+    has_header = not all(_is_number(token) for token in first if token)
+
+    try:
+        if has_header:
+            column = choose_signal_column(first)
+            table = _parse_table(rest, len(first))
+            X = table[:, column]
+        else:
+            table = _parse_table(first_line + b'\n' + rest, len(first))
+            if table.shape[1] == 2 and table.shape[0] > 2 and np.all(np.diff(table[:, 0]) > 0):
+                X = table[:, 1]
+            else:
+                X = table.flatten()
+    except ECGReadError:
+        raise
+    except Exception as e:
+        raise ECGReadError(f"CSV illisible : {e}")
+    return X
+
+
+def validate_signal(X):
+    X = np.asarray(X, dtype=np.float64).ravel()
+    # Les cellules vides en fin de ligne/fichier ne font pas partie du signal
+    finite = np.flatnonzero(np.isfinite(X))
+    if len(finite) == 0:
+        raise ECGReadError("Aucune valeur numérique dans le signal.")
+    X = X[finite[0]:finite[-1] + 1]
+    if not np.all(np.isfinite(X)):
+        raise ECGReadError("Le signal contient des valeurs manquantes.")
+    if len(X) < MIN_SIGNAL_LENGTH:
+        raise ECGReadError(f"Signal trop court ({len(X)} échantillons, minimum {MIN_SIGNAL_LENGTH}).")
+    return X
+
+
+def _is_wfdb_record(path):
+    root, extension = os.path.splitext(path)
+    return extension in ('.dat', '.hea') or (extension != '.csv' and os.path.exists(path + '.hea'))
+
+
+def _read_wfdb(path):
+    import wfdb
+    record_path = os.path.splitext(path)[0] if path.endswith(('.dat', '.hea')) else path
+    try:
+        record = wfdb.rdrecord(record_path)
+    except Exception as e:
+        raise ECGReadError(f"Enregistrement WFDB illisible : {e}")
+    return record.p_signal.flatten()
+
+
+def _source_bytes(source):
+    """
+    Contenu brut de la source pour le hash du cache, fonction de parsing associée, et si la
+    source était en mémoire (True) ou un fichier (False).
+    """
+    if hasattr(source, 'read'):
+        source = source.read()
+    if isinstance(source, str) and not os.path.exists(source) and '\n' in source:
+        source = source.encode('utf-8')
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return bytes(source), lambda: parse_ecg_csv(bytes(source)), True
+
+    if not os.path.exists(source) and not _is_wfdb_record(source):
+        raise ECGReadError(f"Fichier introuvable : {source}")
+    if _is_wfdb_record(source):
+        record_path = os.path.splitext(source)[0] if source.endswith(('.dat', '.hea')) else source
+        content = b''
+        for extension in ('.hea', '.dat'):
+            if os.path.exists(record_path + extension):
+                with open(record_path + extension, 'rb') as f:
+                    content += f.read()
+        return content, lambda: _read_wfdb(source), False
+
+    with open(source, 'rb') as f:
+        content = f.read()
+    return content, lambda: parse_ecg_csv(content), False
+
+
+def _cache_path(content):
+    digest = hashlib.blake2b(READER_VERSION + content, digest_size=20).hexdigest()
+    return os.path.join(SIGNAL_CACHE_DIR, f"{digest}.npy")
+
+
+def _cache_dir_ready():
+    """
+    Crée le dossier du cache, accessible à ce seul utilisateur ; False si le dossier
+    appartient à un autre utilisateur (dossier partagé /tmp) ou n'a pas pu être restreint.
+    """
+    try:
+        os.makedirs(SIGNAL_CACHE_DIR, mode=0o700, exist_ok=True)
+        stat = os.lstat(SIGNAL_CACHE_DIR)
+        if stat.st_uid != os.getuid() or not os.path.isdir(SIGNAL_CACHE_DIR) or os.path.islink(SIGNAL_CACHE_DIR):
+            return False
+        if stat.st_mode & 0o077:
+            # Dossier créé par une version précédente avec les droits par défaut
+            os.chmod(SIGNAL_CACHE_DIR, 0o700)
+    except OSError:
+        return False
+    return True
+
+
+_cache_writes = 0
+_prune_lock = threading.Lock()
+
+
+def _write_cache(path, X):
+    global _cache_writes
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        np.save(f, X)
+    os.replace(tmp_path, path)
+    _cache_writes += 1
+    if _cache_writes % SIGNAL_CACHE_PRUNE_EVERY == 0 and not _prune_lock.locked():
+        threading.Thread(target=_prune_cache, name='signal-cache-prune', daemon=True).start()
+
+
+def _prune_cache():
+    # Un seul nettoyage à la fois ; il parcourt tout le dossier, hors du chemin des requêtes
+    if not _prune_lock.acquire(blocking=False):
+        return
+    try:
+        entries = [entry for entry in os.scandir(SIGNAL_CACHE_DIR) if entry.name.endswith('.npy')]
+        if len(entries) <= SIGNAL_CACHE_MAX_FILES:
+            return
+        entries.sort(key=lambda entry: entry.stat().st_mtime)
+        for entry in entries[:len(entries) - SIGNAL_CACHE_MAX_FILES]:
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
+    except OSError:
+        pass
+    finally:
+        _prune_lock.release()
+
+
+def load_signal(source, use_cache=None):
+    """
+    Lit un signal ECG validé depuis un chemin CSV, un enregistrement WFDB (chemin sans
+    extension, .dat ou .hea), des bytes/str CSV ou un objet fichier.
+
+    Les signaux parsés sont mis en cache en .npy, indexés par le hash du contenu :
+    une relecture du même contenu renvoie un tableau memory-mappé (lecture seule).
+    Par défaut (use_cache=None), seuls les fichiers sont mis en cache, les contenus en
+    mémoire seulement avec ECG_SIGNAL_CACHE_UPLOADS=1.
+
+    Lève ECGReadError si le contenu est illisible ou ne contient pas de signal valide.
+    """
+    content, parse, in_memory = _source_bytes(source)
+    if use_cache is None:
+        use_cache = SIGNAL_CACHE_ENABLED and (SIGNAL_CACHE_UPLOADS or not in_memory)
+    use_cache = use_cache and _cache_dir_ready()
+    if use_cache:
+        cache_path = _cache_path(content)
+        if os.path.exists(cache_path):
+            try:
+                return np.load(cache_path, mmap_mode='r')
+            except (OSError, ValueError):
+                pass
+
+    X = validate_signal(parse())
+    if use_cache:
+        try:
+            _write_cache(cache_path, X)
+        except OSError as e:
+            print(f"Impossible d'écrire le cache du signal {cache_path}: {e}")
+    return X
+
+
 # Fonction pour lire un fichier ECG avec wfdb (pour frag)
 def read_ecg_file_frag(filepath):
     try:
-        record = wfdb.rdrecord(filepath)
-        data = record.p_signal.flatten()
-        return data
-    except Exception as e:
+        return load_signal(filepath)
+    except ECGReadError as e:
         print(f"Erreur lors de la lecture du fichier {filepath}: {e}")
         return None
 
 # Fonction pour lire un fichier CSV (pour full, 10_3, 15_2)
 def read_ecg_file_csv(filepath):
     try:
-        data = pd.read_csv(filepath, header=None)
-        return data.values.flatten()
-    except Exception as e:
+        return load_signal(filepath)
+    except ECGReadError as e:
         print(f"Erreur lors de la lecture du fichier {filepath}: {e}")
         return None
 
+# Fonction pour lire un CSV déjà en mémoire (upload) sans passer par le disque
+def read_ecg_buffer(data):
+    try:
+        return load_signal(data)
+    except ECGReadError as e:
+        print(f"Erreur lors de la lecture du buffer CSV: {e}")
+        return None
+
 
 def detect_significant_changes(ecg_data, threshold=0.5):
     """
@@ -54,6 +327,8 @@ def detect_significant_changes(ecg_data, threshold=0.5):
     Retourne:
     start, end -- Indices définissant le début et la fin de la région intéressante
     """
+    import scipy.signal as signal
+
     # Calcul de la dérivée pour détecter les variations rapides
     derivative = np.abs(np.diff(ecg_data))
 
@@ -71,19 +346,22 @@ def detect_significant_changes(ecg_data, threshold=0.5):
 
     return start, end
 
-def plot_ecg_medical_to_base64(ecg_data, fs=500, threshold=0.5):
+def plot_ecg_medical_to_base64(ecg_data, fs=TARGET_SAMPLING_RATE, threshold=0.5):
     """
     Plot d'un signal ECG en utilisant un format médical avec grille, et renvoie l'image encodée en base64.
     Les points d'origine sont mis en évidence avec une couleur rouge foncé, et l'échelle s'ajuste dynamiquement.
 
     Arguments:
     ecg_data -- Array des données ECG
-    fs -- Fréquence d'échantillonnage (par défaut 500 Hz)
+    fs -- Fréquence d'échantillonnage (par défaut celle des modèles, 360 Hz)
     threshold -- Seuil pour détecter les changements flagrants (par défaut 0.5)
 
     Retourne:
     base64_string -- Image encodée en base64 du plot
     """
+    import matplotlib.pyplot as plt
+    import scipy.interpolate as interp
+
     # Détection des changements significatifs
     start, end = detect_significant_changes(ecg_data, threshold)
     ecg_segment = ecg_data[start:end]
@@ -0,0 +1,173 @@
+import io
+import os
+import base64
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+from reader import detect_significant_changes, plot_ecg_medical_to_base64
+from preprocessing import TARGET_SAMPLING_RATE
+
+# Plot renderer used by the API: 'raster' (NumPy/Pillow) or 'matplotlib' (legacy)
+PLOT_RENDERER = os.environ.get('ECG_PLOT_RENDERER', 'raster')
+PLOT_FORMATS = ['png', 'polyline', 'both']
+# Number of points kept in the JSON polyline sent to the frontend
+POLYLINE_MAX_POINTS = int(os.environ.get('ECG_POLYLINE_MAX_POINTS', '2000'))
+
+# Medical ECG paper look, same as plot_ecg_medical_to_base64
+BACKGROUND_COLOR = (252, 228, 228)
+MINOR_GRID_COLOR = (255, 192, 203)
+MAJOR_GRID_COLOR = (255, 0, 0)
+TRACE_COLOR = (0, 0, 0)
+MARKER_COLOR = (127, 29, 29)
+AXIS_COLOR = (0, 0, 0)
+MARGINS = {'left': 70, 'right': 20, 'top': 40, 'bottom': 50}
+
+
+def decimate_minmax(values, max_points):
+    """
+    Reduce a signal to at most `max_points` samples while keeping its peaks: the signal is
+    cut into max_points / 2 buckets and each bucket keeps its min and max, in time order.
+    Returns (indices, values).
+    """
+    values = np.asarray(values)
+    n = len(values)
+    if n <= max_points:
+        return np.arange(n), values
+
+    buckets = max(1, max_points // 2)
+    bucket_size = int(np.ceil(n / buckets))
+    padded = np.pad(values, (0, buckets * bucket_size - n), mode='edge').reshape(buckets, bucket_size)
+    offsets = np.arange(buckets) * bucket_size
+    argmin = padded.argmin(axis=1) + offsets
+    argmax = padded.argmax(axis=1) + offsets
+
+    indices = np.sort(np.stack([argmin, argmax], axis=1), axis=1).ravel()
+    indices = np.minimum(indices, n - 1)
+    return indices, values[indices]
+
+
+def _crop(ecg_data, threshold):
+    start, end = detect_significant_changes(ecg_data, threshold)
+    segment = np.asarray(ecg_data[start:end], dtype=np.float64)
+    if len(segment) < 2:
+        segment = np.asarray(ecg_data, dtype=np.float64)
+    return segment
+
+
+def ecg_polyline(ecg_data, fs=TARGET_SAMPLING_RATE, threshold=0.5, max_points=POLYLINE_MAX_POINTS):
+    """
+    Downsampled polyline of the identified ECG sector, drawn client-side by the frontend.
+    """
+    segment = _crop(ecg_data, threshold)
+    indices, values = decimate_minmax(segment, max_points)
+    return {
+        "fs": fs,
+        "duration": (len(segment) - 1) / fs,
+        "y_min": float(segment.min()),
+        "y_max": float(segment.max()),
+        "t": np.round(indices / fs, 5).tolist(),
+        "v": np.round(values, 5).tolist(),
+    }
+
+
+def _grid_step(span_pixels, span_units, steps):
+    # Smallest step whose lines are at least 4 pixels apart
+    for step in steps:
+        if step * span_pixels / span_units >= 4:
+            return step
+    return None
+
+
+def _grid_positions(lower, upper, step):
+    first = np.ceil(lower / step) * step
+    return np.arange(first, upper + step / 2, step)
+
+
+def render_ecg_png_base64(ecg_data, fs=TARGET_SAMPLING_RATE, threshold=0.5, width=1000, height=600):
+    """
+    Render the identified ECG sector on a medical grid as a base64 PNG with NumPy and Pillow.
+    Unlike plot_ecg_medical_to_base64 it keeps no global state, so it is thread-safe.
+    """
+    segment = _crop(ecg_data, threshold)
+    t_end = (len(segment) - 1) / fs
+    amplitude_min, amplitude_max = float(segment.min()), float(segment.max())
+    margin = 0.1 * (amplitude_max - amplitude_min) or 0.5
+    y_low, y_high = amplitude_min - margin, amplitude_max + margin
+
+    left, top = MARGINS['left'], MARGINS['top']
+    plot_w = width - MARGINS['left'] - MARGINS['right']
+    plot_h = height - MARGINS['top'] - MARGINS['bottom']
+
+    def x_pixels(t):
+        return left + np.asarray(t) / t_end * (plot_w - 1)
+
+    def y_pixels(v):
+        return top + (y_high - np.asarray(v)) / (y_high - y_low) * (plot_h - 1)
+
+    # Grid drawn directly into the pixel array
+    canvas = np.full((height, width, 3), 255, dtype=np.uint8)
+    area = canvas[top:top + plot_h, left:left + plot_w]
+    area[:] = BACKGROUND_COLOR
+
+    x_minor = _grid_step(plot_w, t_end, (0.01, 0.04, 0.2, 1.0))
+    y_minor = _grid_step(plot_h, y_high - y_low, (0.1, 0.5, 1.0, 5.0))
+    x_major = x_minor * 5 if x_minor else None
+    y_major = y_minor * 5 if y_minor else None
+    for step, color, axis in ((x_minor, MINOR_GRID_COLOR, 'x'), (y_minor, MINOR_GRID_COLOR, 'y'),
+                              (x_major, MAJOR_GRID_COLOR, 'x'), (y_major, MAJOR_GRID_COLOR, 'y')):
+        if step is None:
+            continue
+        if axis == 'x':
+            columns = np.round(x_pixels(_grid_positions(0, t_end, step))).astype(int) - left
+            area[:, columns[(columns >= 0) & (columns < plot_w)]] = color
+        else:
+            rows = np.round(y_pixels(_grid_positions(y_low, y_high, step))).astype(int) - top
+            area[rows[(rows >= 0) & (rows < plot_h)], :] = color
+
+    image = Image.fromarray(canvas)
+    draw = ImageDraw.Draw(image)
+    font = ImageFont.load_default()
+
+    # ECG trace (min/max decimated to the plot width) and original samples
+    indices, values = decimate_minmax(segment, 2 * plot_w)
+    points = np.column_stack([x_pixels(indices / fs), y_pixels(values)])
+    draw.line([tuple(p) for p in points], fill=TRACE_COLOR, width=2)
+    if len(segment) <= plot_w // 3:
+        for x, y in zip(x_pixels(np.arange(len(segment)) / fs), y_pixels(segment)):
+            draw.ellipse((x - 3, y - 3, x + 3, y + 3), fill=MARKER_COLOR)
+
+    # Axes, ticks and labels
+    draw.rectangle((left, top, left + plot_w - 1, top + plot_h - 1), outline=AXIS_COLOR)
+    if x_major:
+        for t in _grid_positions(0, t_end, x_major):
+            draw.text((float(x_pixels(t)), top + plot_h + 4), f"{t:g}", fill=AXIS_COLOR, font=font, anchor='ma')
+    if y_major:
+        for v in _grid_positions(y_low, y_high, y_major):
+            draw.text((left - 6, float(y_pixels(v))), f"{v:g}", fill=AXIS_COLOR, font=font, anchor='rm')
+    draw.text((width / 2, 12), 'Identified ECG Sector', fill=AXIS_COLOR, font=font, anchor='ma')
+    draw.text((left + plot_w / 2, height - 18), 'Time (s)', fill=AXIS_COLOR, font=font, anchor='ma')
+    label = Image.new('RGB', (120, 14), (255, 255, 255))
+    ImageDraw.Draw(label).text((60, 7), 'Amplitude (mV)', fill=AXIS_COLOR, font=font, anchor='mm')
+    image.paste(label.rotate(90, expand=True), (8, top + plot_h // 2 - 60))
+
+    buffer = io.BytesIO()
+    image.save(buffer, format='PNG', compress_level=1)
+    return base64.b64encode(buffer.getvalue()).decode('utf-8')
+
+
+def plot_ecg(ecg_data, fs=TARGET_SAMPLING_RATE, threshold=0.5, plot_format='png'):
+    """
+    Render an ECG for the API. Returns a dict with `ecg_plot_base64` (PNG, from the
+    configured PLOT_RENDERER) and/or `ecg_plot_polyline` depending on `plot_format`.
+    """
+    if plot_format not in PLOT_FORMATS:
+        raise ValueError(f"Invalid plot format. Use one of {PLOT_FORMATS}.")
+
+    plot = {"ecg_plot_base64": None}
+    if plot_format in ('png', 'both'):
+        if PLOT_RENDERER == 'matplotlib':
+            plot["ecg_plot_base64"] = plot_ecg_medical_to_base64(ecg_data, fs, threshold)
+        else:
+            plot["ecg_plot_base64"] = render_ecg_png_base64(ecg_data, fs, threshold)
+    if plot_format in ('polyline', 'both'):
+        plot["ecg_plot_polyline"] = ecg_polyline(ecg_data, fs, threshold)
+    return plot
@@ -1,7 +1,7 @@
 import os
 import psutil
 import time
-import pandas as pd
+from results_store import ResultsStore, RESULTS_DB, RESULTS_CSV
 from sklearn.metrics import classification_report, accuracy_score, precision_score, recall_score, f1_score
 
 
@@ -14,7 +14,7 @@ def monitor_resources():
 
 # Fonction pour évaluer et enregistrer les résultats
 def evaluate_and_log_results(model, X_test, y_test, y_pred, model_name, model_params, file_type, method, factor,
-                             csv_file='results.csv'):
+                             csv_file=None, results_db=RESULTS_DB):
     # Calcul des métriques
     accuracy = accuracy_score(y_test, y_pred)
     class_report = classification_report(y_test, y_pred, output_dict=True)
@@ -25,34 +25,27 @@ def evaluate_and_log_results(model, X_test, y_test, y_pred, model_name, model_pa
     # Surveillance des ressources
     cpu_usage, ram_usage = monitor_resources()
 
-    # Création du DataFrame pour stocker les résultats
-    data = {
-        'Model': [model_name],
-        'Parameters': [str(model_params)],
-        'File Type': [file_type],
-        'Balancing Method': [method],
-        'Augmentation Factor': [factor],
-        'Accuracy': [accuracy],
-        'Precision': [precision],
-        'Recall': [recall],
-        'F1 Score': [f1],
-        'CPU Usage (%)': [cpu_usage],
-        'RAM Usage (%)': [ram_usage]
+    record = {
+        'model': model_name,
+        'parameters': str(model_params),
+        'file_type': file_type,
+        'balancing_method': method,
+        'augmentation_factor': factor,
+        'accuracy': accuracy,
+        'precision': precision,
+        'recall': recall,
+        'f1_score': f1,
+        'cpu_usage': cpu_usage,
+        'ram_usage': ram_usage,
     }
-
-    # Ajout des accuracy par classe
-    for label, metrics in class_report.items():
-        if isinstance(metrics, dict):
-            data[f'Precision_Class_{label}'] = [metrics['precision']]
-            data[f'Recall_Class_{label}'] = [metrics['recall']]
-            data[f'F1_Class_{label}'] = [metrics['f1-score']]
-
-    df = pd.DataFrame(data)
-
-    # Enregistrer ou ajouter les résultats au fichier CSV
-    if csv_file and os.path.exists(csv_file):
-        existing_df = pd.read_csv(csv_file)
-        df = pd.concat([existing_df, df], ignore_index=True)
-
-    df.to_csv(csv_file, index=False)
-    print(f"Results logged in {csv_file}")
+    # Métriques par classe (et moyennes macro / pondérée)
+    class_metrics = {label: metrics for label, metrics in class_report.items() if isinstance(metrics, dict)}
+
+    # Ajout en une transaction, sans relire l'historique ; le CSV historique sert de point de départ
+    store = ResultsStore(results_db, legacy_csv=csv_file or RESULTS_CSV)
+    store.append(record, class_metrics)
+    print(f"Results logged in {results_db}")
+    # Compatibilité : le CSV complet n'est régénéré que s'il est demandé
+    if csv_file:
+        store.export_csv(csv_file)
+        print(f"Results exported to {csv_file}")
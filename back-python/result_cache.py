@@ -0,0 +1,171 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+import numpy as np
+from serialization import json_default
+
+# Result cache settings (overridable through the environment)
+RESULT_CACHE_ENABLED = os.environ.get('ECG_RESULT_CACHE', '1') == '1'
+RESULT_CACHE_TTL_SECONDS = float(os.environ.get('ECG_RESULT_CACHE_TTL', '3600'))
+RESULT_CACHE_MAX_BYTES = int(float(os.environ.get('ECG_RESULT_CACHE_MB', '64')) * 1024 * 1024)
+# Optional SQLite file for a second tier that survives restarts (disabled when empty)
+RESULT_CACHE_DB = os.environ.get('ECG_RESULT_CACHE_DB', '')
+RESULT_CACHE_DB_MAX_ROWS = int(os.environ.get('ECG_RESULT_CACHE_DB_MAX_ROWS', '10000'))
+
+
+def signal_digest(X):
+    """Content hash of a normalized signal (values and dtype, not the array object)."""
+    X = np.ascontiguousarray(X, dtype=np.float64)
+    return hashlib.blake2b(X.tobytes(), digest_size=16).hexdigest()
+
+
+class ResultCache:
+    """
+    Content-addressed cache of JSON analysis results.
+
+    Keys are built from the hash of the normalized signal, the model and its file version,
+    plus the analysis options. Results are kept as JSON text in a size-bounded LRU (so the
+    byte budget is exact and callers always get a fresh copy) and expire after `ttl` seconds.
+    With `db_path`, results are also written to SQLite and promoted back into memory on a hit.
+    """
+
+    def __init__(self, max_bytes=RESULT_CACHE_MAX_BYTES, ttl=RESULT_CACHE_TTL_SECONDS,
+                 db_path=RESULT_CACHE_DB, db_max_rows=RESULT_CACHE_DB_MAX_ROWS):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.db_path = db_path
+        self.db_max_rows = db_max_rows
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._db = None
+        self._db_lock = threading.Lock()
+        self._db_writes = 0
+        self._stats = {'hits': 0, 'memory_hits': 0, 'sqlite_hits': 0, 'misses': 0,
+                       'stores': 0, 'evictions': 0, 'expirations': 0}
+
+    # --------- Public API ---------
+    @staticmethod
+    def key(X, model_choice, model_version, **options):
+        parts = [signal_digest(X), str(model_choice), repr(model_version)]
+        parts += [f"{name}={options[name]}" for name in sorted(options)]
+        return '|'.join(parts)
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is not None:
+                created, payload = cached
+                if now - created < self.ttl:
+                    self._entries.move_to_end(key)
+                    self._stats['hits'] += 1
+                    self._stats['memory_hits'] += 1
+                    return json.loads(payload)
+                self._remove(key)
+                self._stats['expirations'] += 1
+
+        row = self._db_get(key, now)
+        with self._lock:
+            if row is None:
+                self._stats['misses'] += 1
+                return None
+            self._stats['hits'] += 1
+            self._stats['sqlite_hits'] += 1
+            self._store(key, row[0], row[1])
+        return json.loads(row[1])
+
+    def put(self, key, result):
+        payload = json.dumps(result, default=json_default)
+        created = time.time()
+        with self._lock:
+            self._store(key, created, payload)
+            self._stats['stores'] += 1
+        self._db_put(key, created, payload)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+        db = self._connect()
+        if db is not None:
+            with self._db_lock:
+                db.execute('DELETE FROM results')
+                db.commit()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats.update({
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'ttl_seconds': self.ttl,
+                'sqlite': bool(self.db_path),
+            })
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+        return stats
+
+    # --------- Memory tier ---------
+    def _store(self, key, created, payload):
+        size = len(payload)
+        if size > self.max_bytes:
+            return
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (created, payload)
+        self._bytes += size
+        while self._bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self._stats['evictions'] += 1
+
+    def _remove(self, key):
+        _, payload = self._entries.pop(key)
+        self._bytes -= len(payload)
+
+    # --------- SQLite tier ---------
+    def _connect(self):
+        if not self.db_path:
+            return None
+        with self._db_lock:
+            if self._db is None:
+                directory = os.path.dirname(self.db_path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                db = sqlite3.connect(self.db_path, check_same_thread=False)
+                db.execute('PRAGMA journal_mode=WAL')
+                db.execute('PRAGMA synchronous=NORMAL')
+                db.execute('CREATE TABLE IF NOT EXISTS results '
+                           '(key TEXT PRIMARY KEY, created REAL NOT NULL, payload TEXT NOT NULL)')
+                db.execute('CREATE INDEX IF NOT EXISTS results_created ON results (created)')
+                self._db = db
+            return self._db
+
+    def _db_get(self, key, now):
+        db = self._connect()
+        if db is None:
+            return None
+        with self._db_lock:
+            return db.execute('SELECT created, payload FROM results WHERE key = ? AND created > ?',
+                              (key, now - self.ttl)).fetchone()
+
+    def _db_put(self, key, created, payload):
+        db = self._connect()
+        if db is None:
+            return
+        with self._db_lock:
+            db.execute('INSERT OR REPLACE INTO results (key, created, payload) VALUES (?, ?, ?)',
+                       (key, created, payload))
+            self._db_writes += 1
+            # Expired and surplus rows are pruned every 100 writes rather than on each one
+            if self._db_writes % 100 == 0:
+                db.execute('DELETE FROM results WHERE created <= ?', (created - self.ttl,))
+                db.execute('DELETE FROM results WHERE key IN (SELECT key FROM results '
+                           'ORDER BY created DESC LIMIT -1 OFFSET ?)', (self.db_max_rows,))
+            db.commit()
@@ -0,0 +1,265 @@
+import os
+import re
+import time
+import sqlite3
+import pandas as pd
+
+# Résultats d'entraînement dans SQLite (mode WAL) : chaque entraînement est un INSERT dans une
+# transaction, sûr quand plusieurs processus terminent en même temps, sans relire l'historique.
+# Les métriques par classe (nombre de classes variable) sont des lignes de class_metrics ;
+# export_csv reconstruit le CSV « large » historique (results/results.csv) pour les notebooks.
+
+RESULTS_DB = 'results/results.db'
+# CSV historique : importé à la création de la base, régénéré par export_csv
+RESULTS_CSV = 'results/results.csv'
+# Attente maximale (ms) d'un verrou d'écriture tenu par un autre processus
+BUSY_TIMEOUT_MS = 30000
+
+# Colonnes du CSV historique -> colonnes de la table runs
+COLUMNS = [
+    ('Model', 'model'),
+    ('Parameters', 'parameters'),
+    ('File Type', 'file_type'),
+    ('Balancing Method', 'balancing_method'),
+    ('Augmentation Factor', 'augmentation_factor'),
+    ('Accuracy', 'accuracy'),
+    ('Precision', 'precision'),
+    ('Recall', 'recall'),
+    ('F1 Score', 'f1_score'),
+    ('CPU Usage (%)', 'cpu_usage'),
+    ('RAM Usage (%)', 'ram_usage'),
+]
+FIELDS = [field for _, field in COLUMNS]
+# Métriques par classe : colonne CSV (préfixe), colonne SQL, clé de classification_report
+CLASS_METRICS = [('Precision', 'precision', 'precision'), ('Recall', 'recall', 'recall'),
+                 ('F1', 'f1_score', 'f1-score')]
+CLASS_COLUMN = re.compile(r'^(Precision|Recall|F1)_Class_(.+)$')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    created_at REAL,
+    model TEXT NOT NULL,
+    parameters TEXT,
+    file_type TEXT,
+    balancing_method TEXT,
+    augmentation_factor REAL,
+    accuracy REAL,
+    precision REAL,
+    recall REAL,
+    f1_score REAL,
+    cpu_usage REAL,
+    ram_usage REAL
+);
+CREATE INDEX IF NOT EXISTS runs_model ON runs (model, file_type);
+CREATE TABLE IF NOT EXISTS class_metrics (
+    run_id INTEGER NOT NULL REFERENCES runs (id),
+    position INTEGER NOT NULL,
+    label TEXT NOT NULL,
+    precision REAL,
+    recall REAL,
+    f1_score REAL,
+    PRIMARY KEY (run_id, label)
+);
+"""
+
+
+def _label_order(label):
+    # Classes numériques dans l'ordre, puis les moyennes ('macro avg', 'weighted avg')
+    return (0, int(label), '') if str(label).isdigit() else (1, 0, str(label))
+
+
+class ResultsStore:
+    """
+    Historique des entraînements (une ligne par entraînement, métriques globales et par classe).
+
+    Une connexion courte par opération : plusieurs processus (ia.py --jobs) peuvent écrire en
+    même temps. legacy_csv : CSV historique importé à la création de la base.
+    """
+
+    def __init__(self, path=RESULTS_DB, legacy_csv=None):
+        self.path = path
+        created = not os.path.exists(path)
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._connect() as connection:
+            connection.executescript(SCHEMA)
+        if created and legacy_csv and os.path.exists(legacy_csv):
+            count = self.import_csv(legacy_csv)
+            print(f"{count} résultats importés depuis {legacy_csv}")
+
+    def _connect(self):
+        connection = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT_MS / 1000, isolation_level=None)
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute(f'PRAGMA busy_timeout={BUSY_TIMEOUT_MS}')
+        return _closing(connection)
+
+    # --------- Écriture ---------
+    def append(self, record, class_metrics=None, created_at=None):
+        """
+        Ajoute un entraînement. record : {champ de FIELDS: valeur} ; class_metrics :
+        {classe: {'precision', 'recall', 'f1-score'}} (format de classification_report).
+        Renvoie l'identifiant de l'entraînement.
+        """
+        return self._append_many([(record, class_metrics or {}, time.time() if created_at is None else created_at)])[0]
+
+    def _append_many(self, rows):
+        ids = []
+        with self._connect() as connection:
+            # BEGIN IMMEDIATE : le verrou d'écriture est pris d'emblée, l'insertion est atomique
+            connection.execute('BEGIN IMMEDIATE')
+            try:
+                for record, class_metrics, created_at in rows:
+                    cursor = connection.execute(
+                        f"INSERT INTO runs (created_at, {', '.join(FIELDS)}) VALUES (?{', ?' * len(FIELDS)})",
+                        [created_at] + [_sql_value(record.get(field)) for field in FIELDS])
+                    run_id = cursor.lastrowid
+                    connection.executemany(
+                        "INSERT INTO class_metrics (run_id, position, label, precision, recall, f1_score) "
+                        "VALUES (?, ?, ?, ?, ?, ?)",
+                        [(run_id, position, str(label)) + tuple(_sql_value(metrics.get(key))
+                                                                for _, _, key in CLASS_METRICS)
+                         for position, (label, metrics) in enumerate(class_metrics.items())])
+                    ids.append(run_id)
+                connection.execute('COMMIT')
+            except BaseException:
+                connection.execute('ROLLBACK')
+                raise
+        return ids
+
+    def import_csv(self, csv_file):
+        """Importe un CSV au format historique (colonnes de COLUMNS et <Métrique>_Class_<classe>)."""
+        df = pd.read_csv(csv_file)
+        rows = []
+        for _, row in df.iterrows():
+            record = {field: row[column] for column, field in COLUMNS if column in df.columns}
+            class_metrics = {}
+            for column in df.columns:
+                match = CLASS_COLUMN.match(column)
+                if match and pd.notna(row[column]):
+                    prefix, label = match.groups()
+                    key = next(key for name, _, key in CLASS_METRICS if name == prefix)
+                    class_metrics.setdefault(label, {})[key] = row[column]
+            # Date inconnue pour l'historique importé
+            rows.append((record, class_metrics, None))
+        return len(self._append_many(rows))
+
+    # --------- Lecture ---------
+    def runs(self, model=None, file_type=None, method=None, with_classes=True):
+        """
+        Entraînements au format du CSV historique (une colonne par métrique et par classe), dans
+        l'ordre d'enregistrement, indexés par identifiant. Filtres facultatifs.
+        """
+        where, params = _filters(model=model, file_type=file_type, balancing_method=method)
+        with self._connect() as connection:
+            df = pd.read_sql_query(f"SELECT id, created_at, {', '.join(FIELDS)} FROM runs{where} ORDER BY id",
+                                   connection, params=params)
+            classes = pd.read_sql_query(
+                f"SELECT run_id, position, label, precision, recall, f1_score FROM class_metrics "
+                f"WHERE run_id IN (SELECT id FROM runs{where})", connection, params=params) if with_classes else None
+        df = df.rename(columns={field: column for column, field in COLUMNS}).set_index('id')
+        if classes is None or classes.empty:
+            return df
+        labels = sorted(classes['label'].unique(), key=_label_order)
+        wide = classes.pivot(index='run_id', columns='label', values=['precision', 'recall', 'f1_score'])
+        for label in labels:
+            for name, field, _ in CLASS_METRICS:
+                df[f'{name}_Class_{label}'] = wide[(field, label)].reindex(df.index)
+        return df
+
+    def summary(self, by=('model', 'file_type')):
+        """Nombre d'entraînements et métriques moyennes / maximales par groupe (agrégation SQL)."""
+        by = _check_fields(by)
+        columns = ', '.join(by)
+        with self._connect() as connection:
+            return pd.read_sql_query(
+                f"SELECT {columns}, COUNT(*) AS runs, AVG(accuracy) AS mean_accuracy, MAX(accuracy) AS max_accuracy, "
+                f"AVG(f1_score) AS mean_f1_score, MAX(f1_score) AS max_f1_score "
+                f"FROM runs GROUP BY {columns} ORDER BY max_accuracy DESC", connection)
+
+    def best(self, metric='accuracy', by=('model', 'file_type')):
+        """Meilleur entraînement de chaque groupe selon `metric` (le plus récent en cas d'égalité)."""
+        metric, = _check_fields([metric])
+        by = _check_fields(by)
+        with self._connect() as connection:
+            return pd.read_sql_query(
+                f"SELECT id, created_at, {', '.join(FIELDS)} FROM ("
+                f"  SELECT *, ROW_NUMBER() OVER (PARTITION BY {', '.join(by)} ORDER BY {metric} DESC, id DESC) AS rank"
+                f"  FROM runs) WHERE rank = 1 ORDER BY {metric} DESC", connection)
+
+    def class_metrics(self, model=None, file_type=None, label=None):
+        """Métriques par classe au format long (une ligne par entraînement et par classe)."""
+        where, params = _filters(**{'r.model': model, 'r.file_type': file_type,
+                                    'c.label': None if label is None else str(label)})
+        query = (f"SELECT r.id AS run_id, r.model, r.file_type, c.label, c.precision, c.recall, c.f1_score "
+                 f"FROM class_metrics c JOIN runs r ON r.id = c.run_id{where}")
+        with self._connect() as connection:
+            return pd.read_sql_query(query + ' ORDER BY r.id, c.position', connection, params=params)
+
+    def export_csv(self, csv_file):
+        """Écrit tout l'historique au format du CSV historique (écriture atomique)."""
+        df = self.runs().drop(columns=['created_at'])
+        tmp_path = f"{csv_file}.{os.getpid()}.tmp"
+        df.to_csv(tmp_path, index=False)
+        os.replace(tmp_path, csv_file)
+        return len(df)
+
+
+class _closing:
+    # sqlite3.Connection comme gestionnaire de contexte valide une transaction mais ne ferme pas la connexion
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __enter__(self):
+        return self.connection
+
+    def __exit__(self, *exc):
+        self.connection.close()
+
+
+def _sql_value(value):
+    if value is None or (isinstance(value, float) and value != value):
+        return None
+    # Scalaires NumPy -> types Python
+    return value.item() if hasattr(value, 'item') else value
+
+
+def _check_fields(fields):
+    fields = [fields] if isinstance(fields, str) else list(fields)
+    unknown = set(fields) - set(FIELDS)
+    if unknown:
+        raise ValueError(f"Champs inconnus : {sorted(unknown)}. Choix possibles : {FIELDS}")
+    return fields
+
+
+def _filters(**conditions):
+    clauses, params = [], []
+    for field, value in conditions.items():
+        if value is not None:
+            clauses.append(f'{field} = ?')
+            params.append(value)
+    return (' WHERE ' + ' AND '.join(clauses) if clauses else ''), params
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description="Historique des entraînements (results/results.db).")
+    parser.add_argument('command', choices=['summary', 'best', 'export', 'import'])
+    parser.add_argument('csv', nargs='?', default=RESULTS_CSV, help="CSV pour export / import")
+    parser.add_argument('--db', default=RESULTS_DB)
+    parser.add_argument('--metric', default='accuracy')
+    args = parser.parse_args()
+
+    store = ResultsStore(args.db)
+    if args.command == 'summary':
+        print(store.summary().to_string(index=False))
+    elif args.command == 'best':
+        print(store.best(args.metric).to_string(index=False))
+    elif args.command == 'export':
+        print(f"{store.export_csv(args.csv)} résultats exportés vers {args.csv}")
+    else:
+        print(f"{store.import_csv(args.csv)} résultats importés depuis {args.csv}")
+
+
+if __name__ == '__main__':
+    main()
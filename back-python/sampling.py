@@ -0,0 +1,143 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+# Échantillonnage par indices : duplication, sous-échantillonnage et répétition s'expriment
+# comme des tableaux d'indices sur les données d'origine, sans recopier la matrice X.
+# Les lots (Keras) ou les poids d'échantillons (scikit-learn) sont produits à partir de ces indices.
+
+
+def duplication_indices(y, rng=None):
+    """
+    Indices équivalents à management.balance_classes_by_duplication : chaque classe garde ses
+    échantillons et en tire d'autres au hasard (avec remise) jusqu'à la taille de la plus grande.
+    """
+    rng = rng or np.random.default_rng()
+    classes, counts = np.unique(y, return_counts=True)
+    max_count = counts.max() if len(counts) else 0
+    indices = []
+    for cls, count in zip(classes, counts):
+        cls_indices = np.flatnonzero(y == cls)
+        indices.append(cls_indices)
+        indices.append(rng.choice(cls_indices, max_count - count, replace=True))
+    return np.concatenate(indices) if indices else np.zeros(0, dtype=np.intp)
+
+
+def undersample_indices(y, indices=None, rng=None):
+    """Indices équivalents à RandomUnderSampler : chaque classe réduite à la taille de la plus petite."""
+    rng = rng or np.random.default_rng()
+    indices = np.arange(len(y)) if indices is None else np.asarray(indices)
+    labels = y[indices]
+    classes, counts = np.unique(labels, return_counts=True)
+    if not len(counts):
+        return indices
+    return np.concatenate([rng.choice(indices[labels == cls], counts.min(), replace=False) for cls in classes])
+
+
+def repeat_indices(indices, factor):
+    """Indices équivalents à management.augment_data : chaque échantillon répété `factor` fois."""
+    return np.repeat(indices, factor)
+
+
+def training_indices(y, equal_class=True, method='none', factor=1, seed=None):
+    """
+    Enchaîne duplication, équilibrage ('under' ou 'none') et répétition comme le faisait ia.py,
+    puis mélange. Renvoie un tableau d'indices dans X. 'smote' crée de nouveaux signaux et ne
+    peut pas s'exprimer en indices : il reste traité par management.balance_classes.
+    """
+    if method not in ('under', 'none'):
+        raise ValueError(f"Méthode non supportée par l'échantillonnage par indices : {method}")
+    rng = np.random.default_rng(seed)
+    indices = duplication_indices(y, rng) if equal_class else np.arange(len(y))
+    if method == 'under':
+        indices = undersample_indices(y, indices, rng)
+    if factor > 1:
+        indices = repeat_indices(indices, factor)
+    return rng.permutation(indices)
+
+
+def sample_weights(indices, n_samples):
+    """
+    Échantillons distincts et nombre d'apparitions de chacun : un modèle scikit-learn entraîné
+    avec sample_weight=poids équivaut à l'entraînement sur les lignes dupliquées.
+    """
+    counts = np.bincount(indices, minlength=n_samples)
+    unique = np.flatnonzero(counts)
+    return unique, counts[unique].astype(np.float64)
+
+
+def standard_scaling(X, indices):
+    """Moyenne et écart-type par colonne de X[indices] (comme StandardScaler), sans copier X[indices]."""
+    unique, weights = sample_weights(indices, len(X))
+    total = weights.sum()
+    mean = weights @ X[unique] / total
+    var = weights @ np.square(X[unique] - mean) / total
+    scale = np.sqrt(var)
+    scale[scale == 0] = 1.0
+    return mean, scale
+
+
+def iterate_batches(X, indices, batch_size):
+    """Lots successifs X[indices] de batch_size lignes (une seule copie de lot en mémoire)."""
+    for start in range(0, len(indices), batch_size):
+        yield X[indices[start:start + batch_size]]
+
+
+def predict_in_batches(predict, X, indices, batch_size=1024):
+    """Prédictions sur X[indices] par lots, pour ne jamais matérialiser tout l'ensemble de test."""
+    return np.concatenate([predict(batch) for batch in iterate_batches(X, indices, batch_size)])
+
+
+def _batch_producer(X, y, indices, batch_size, eye, augment, workers, rng):
+    """Itère sur les lots (x, y) dans l'ordre ; avec workers > 0, ils sont préparés par des threads."""
+    starts = range(0, len(indices), batch_size)
+    # Un générateur aléatoire indépendant par lot : le résultat ne dépend pas de l'ordre d'exécution des threads
+    seeds = rng.spawn(len(starts)) if augment is not None else [None] * len(starts)
+
+    def make_batch(start, batch_rng):
+        batch = indices[start:start + batch_size]
+        signals, labels = X[batch], y[batch]
+        if augment is not None:
+            signals = augment(signals, labels, batch_rng)
+        return signals[..., np.newaxis].astype(np.float32), eye[labels]
+
+    if workers <= 0:
+        for start, batch_rng in zip(starts, seeds):
+            yield make_batch(start, batch_rng)
+        return
+    # NumPy libère le GIL pendant les calculs : quelques threads suffisent à paralléliser l'augmentation
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='augment') as executor:
+        pending = deque()
+        for start, batch_rng in zip(starts, seeds):
+            pending.append(executor.submit(make_batch, start, batch_rng))
+            if len(pending) > 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def keras_dataset(X, y, indices, n_classes, batch_size, shuffle=True, seed=None, augment=None, workers=0):
+    """
+    tf.data.Dataset de lots (X[indices] avec un axe temporel, étiquettes one-hot) construits à la
+    volée depuis X : seuls les lots en préparation occupent de la mémoire supplémentaire.
+    L'ordre est re-mélangé à chaque époque si shuffle=True.
+
+    augment(signaux, étiquettes, rng) -> signaux perturbés (voir augment.SignalAugmenter) est
+    appliqué à chaque lot, avec de nouveaux tirages à chaque époque ; `workers` threads
+    préparent les lots à l'avance.
+    """
+    import tensorflow as tf
+    rng = np.random.default_rng(seed)
+    eye = np.eye(n_classes, dtype=np.float32)
+
+    def generate():
+        order = rng.permutation(indices) if shuffle else indices
+        yield from _batch_producer(X, y, order, batch_size, eye, augment, workers, rng)
+
+    dataset = tf.data.Dataset.from_generator(generate, output_signature=(
+        tf.TensorSpec(shape=(None, X.shape[1], 1), dtype=tf.float32),
+        tf.TensorSpec(shape=(None, n_classes), dtype=tf.float32),
+    ))
+    # Le nombre de lots est connu : Keras affiche la progression et n'a pas besoin de steps_per_epoch
+    dataset = dataset.apply(tf.data.experimental.assert_cardinality(-(-len(indices) // batch_size)))
+    return dataset.prefetch(tf.data.AUTOTUNE)
@@ -0,0 +1,195 @@
+import os
+import queue
+import threading
+from collections import Counter
+from concurrent.futures import Future, InvalidStateError
+from sqlalchemy import func, insert, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from database import SessionLocal
+from models import Score, ScoreTotals, ScoreBucket
+
+# Score writer settings (overridable through the environment)
+SCORE_BATCH_MAX_SIZE = int(os.environ.get('ECG_SCORE_BATCH_MAX_SIZE', '256'))
+# 0 = group commit: no waiting, a batch is whatever queued up while the previous one committed
+SCORE_BATCH_MAX_WAIT_MS = float(os.environ.get('ECG_SCORE_BATCH_MAX_WAIT_MS', '0'))
+
+
+def ensure_totals(session_factory=SessionLocal):
+    """
+    Creates the aggregate rows from the `scores` table if they do not exist yet (first start
+    on a scores.db written before the aggregates). Returns True if a backfill was done.
+    """
+    with session_factory() as db:
+        if db.get(ScoreTotals, 1) is not None:
+            return False
+        count, total = db.execute(select(func.count(Score.id), func.coalesce(func.sum(Score.value), 0))).one()
+        buckets = db.execute(select(Score.value, func.count(Score.id)).group_by(Score.value)).all()
+        db.add(ScoreTotals(id=1, count=count, total=total))
+        db.add_all([ScoreBucket(value=value, count=n) for value, n in buckets])
+        try:
+            db.commit()
+        except IntegrityError:
+            # Another worker process backfilled first
+            db.rollback()
+            return False
+        return True
+
+
+def _upsert(db, table, rows, key, increments):
+    """INSERT ... ON CONFLICT(key) DO UPDATE adding `increments` columns to the existing row."""
+    dialect_insert = {'sqlite': sqlite.insert, 'postgresql': postgresql.insert}[db.get_bind().dialect.name]
+    statement = dialect_insert(table).values(rows)
+    db.execute(statement.on_conflict_do_update(
+        index_elements=[key],
+        set_={column: getattr(table, column) + getattr(statement.excluded, column) for column in increments}))
+
+
+def write_scores(db, values):
+    """Inserts `values` and updates the aggregates in the session's current transaction."""
+    db.execute(insert(Score), [{'value': value} for value in values])
+    # Upserts: one statement for all the distinct values, no lost update when the row is new
+    _upsert(db, ScoreBucket, [{'value': value, 'count': n} for value, n in Counter(values).items()],
+            'value', ['count'])
+    _upsert(db, ScoreTotals, [{'id': 1, 'count': len(values), 'total': sum(values)}], 'id', ['count', 'total'])
+
+
+def read_stats(db):
+    """Average, number of scores and histogram, read from the aggregate rows."""
+    totals = db.get(ScoreTotals, 1)
+    if totals is None or not totals.count:
+        return {"average": 0, "numberOfUsers": 0, "histogram": {}}
+    histogram = {str(value): n for value, n in db.execute(
+        select(ScoreBucket.value, ScoreBucket.count).where(ScoreBucket.count > 0).order_by(ScoreBucket.value))}
+    return {"average": totals.total / totals.count, "numberOfUsers": totals.count, "histogram": histogram}
+
+
+class ScoreWriter:
+    """
+    Single writer thread for quiz scores: concurrent submissions are coalesced into one
+    transaction (one bulk insert plus one aggregate update per distinct value), so request
+    threads never compete for SQLite's write lock and a burst costs one commit.
+
+    submit(value) returns a Future resolved once the score is committed. A score whose future
+    was cancelled before its batch starts (the request went away) is not written.
+    """
+
+    def __init__(self, session_factory=SessionLocal, max_batch_size=SCORE_BATCH_MAX_SIZE,
+                 max_wait_ms=SCORE_BATCH_MAX_WAIT_MS):
+        self.session_factory = session_factory
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self._queue = None
+        self._worker = None
+        self._lock = threading.Lock()
+        self._stats = {'scores': 0, 'batches': 0, 'max_batch_size_seen': 0, 'errors': 0}
+
+    def submit(self, value):
+        future = Future()
+        self._enqueue((int(value), future))
+        return future
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['pending'] = self._queue.qsize() if self._queue is not None else 0
+        stats['mean_batch_size'] = stats['scores'] / stats['batches'] if stats['batches'] else 0.0
+        return stats
+
+    def shutdown(self):
+        with self._lock:
+            q, worker = self._queue, self._worker
+            self._queue = self._worker = None
+        if q is not None:
+            # Pending scores are written before the worker stops
+            q.put(None)
+            worker.join(timeout=5)
+
+    def _enqueue(self, item):
+        # Put under the lock: a stopping writer unregisters its queue under the same lock, then
+        # fails what is left in it, so no score can be stranded on a queue nobody reads
+        with self._lock:
+            if self._queue is None or not self._worker.is_alive():
+                self._queue = queue.Queue()
+                self._worker = threading.Thread(target=self._run, args=(self._queue,),
+                                                name="score-writer", daemon=True)
+                self._worker.start()
+            self._queue.put(item)
+
+    def _collect(self, q, first):
+        batch = [first] if _claim(first[1]) else []
+        while len(batch) < self.max_batch_size:
+            try:
+                item = q.get(timeout=self.max_wait) if self.max_wait else q.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                q.put(None)
+                break
+            if _claim(item[1]):
+                batch.append(item)
+        return batch
+
+    def _run(self, q):
+        try:
+            self._serve(q)
+        finally:
+            # However the writer stops, the next submission starts a new one
+            with self._lock:
+                if self._queue is q:
+                    self._queue = self._worker = None
+            while True:
+                try:
+                    item = q.get_nowait()
+                except queue.Empty:
+                    break
+                if item is not None and _claim(item[1]):
+                    _settle(item[1], exception=RuntimeError("Score writer stopped."))
+
+    def _serve(self, q):
+        while True:
+            first = q.get()
+            if first is None:
+                return
+            batch = self._collect(q, first)
+            if not batch:
+                continue
+            try:
+                with self.session_factory() as db:
+                    write_scores(db, [value for value, _ in batch])
+                    db.commit()
+            except Exception as e:
+                with self._lock:
+                    self._stats['errors'] += 1
+                for _, future in batch:
+                    _settle(future, exception=e)
+                continue
+
+            for _, future in batch:
+                _settle(future)
+            with self._lock:
+                self._stats['scores'] += len(batch)
+                self._stats['batches'] += 1
+                self._stats['max_batch_size_seen'] = max(self._stats['max_batch_size_seen'], len(batch))
+
+
+def _claim(future):
+    # False if the caller gave up (its future was cancelled) or settled it itself
+    try:
+        return future.set_running_or_notify_cancel()
+    except RuntimeError:
+        return False
+
+
+def _settle(future, result=None, exception=None):
+    # One caller's future must not be able to stop the writer serving all the others
+    try:
+        if exception is not None:
+            future.set_exception(exception)
+        else:
+            future.set_result(result)
+    except InvalidStateError:
+        pass
+
+
+score_writer = ScoreWriter()
@@ -0,0 +1,12 @@
+import numpy as np
+
+# JSON helpers shared by the caches (result_cache.py, library.py)
+
+
+def json_default(obj):
+    # Predictions hold NumPy scalars and arrays
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
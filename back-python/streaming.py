@@ -0,0 +1,141 @@
+import os
+import json
+import threading
+import numpy as np
+
+# Streaming settings (overridable through the environment)
+STREAM_MAX_SESSIONS = int(os.environ.get('ECG_STREAM_MAX_SESSIONS', '256'))
+# Weight of the newest window in the rolling danger level (exponential moving average)
+STREAM_SMOOTHING = float(os.environ.get('ECG_STREAM_SMOOTHING', '0.3'))
+# Signal kept before and after each window when preprocessing stages are enabled: the baseline
+# median filter and the 0.5 Hz high-pass then run over the window with this context instead of
+# one isolated second, close to what they compute over a whole uploaded recording (relative
+# RMS difference ~6 % with 10 s before and 1 s after, 25-35 % on the window alone). The delay
+# after a window is added to the latency of its update.
+STREAM_CONTEXT_SECONDS = float(os.environ.get('ECG_STREAM_CONTEXT_SECONDS', '10'))
+STREAM_LOOKAHEAD_SECONDS = float(os.environ.get('ECG_STREAM_LOOKAHEAD_SECONDS', '1'))
+
+
+class StreamSession:
+    """
+    Per-connection state of a streamed recording.
+
+    Samples are written into a fixed ring buffer of `context` + `window` + `lookahead`
+    samples; every `stride` samples (once the first window and the `lookahead` samples after
+    it are in) an ordered copy of the buffer is emitted: up to `context` samples of history,
+    the window to classify (see cut), then `lookahead` samples. Memory per session is
+    constant whatever the stream length.
+    """
+
+    def __init__(self, window, stride=None, smoothing=STREAM_SMOOTHING, context=0, lookahead=0):
+        self.window = int(window)
+        self.stride = int(stride) if stride else self.window
+        if self.stride < 1:
+            raise ValueError("Stride must be a positive number of samples.")
+        self.context = max(0, int(context))
+        self.lookahead = max(0, int(lookahead))
+        self.smoothing = smoothing
+        self.rolling_danger_level = None
+        self.windows_emitted = 0
+        self.samples_received = 0
+        self._buffer = np.zeros(self.context + self.window + self.lookahead, dtype=np.float64)
+        # End of the next window to emit
+        self._next_emit = self.window
+
+    def push(self, samples):
+        """
+        Append samples and return the (index, start_sample, segment) tuples completed by them;
+        segment is the window preceded by its available context.
+        """
+        samples = np.asarray(samples, dtype=np.float64).ravel()
+        completed = []
+        offset = 0
+        while offset < len(samples):
+            count = min(len(samples) - offset, self._next_emit + self.lookahead - self.samples_received,
+                        self.window)
+            self._write(samples[offset:offset + count])
+            offset += count
+            if self.samples_received == self._next_emit + self.lookahead:
+                completed.append((self.windows_emitted, self._next_emit - self.window, self._ordered_window()))
+                self._next_emit += self.stride
+                self.windows_emitted += 1
+        return completed
+
+    def cut(self, segment):
+        """The window to classify within an emitted segment (or its conditioned copy)."""
+        end = len(segment) - self.lookahead
+        return segment[end - self.window:end]
+
+    def update_danger(self, danger_level):
+        if self.rolling_danger_level is None:
+            self.rolling_danger_level = float(danger_level)
+        else:
+            self.rolling_danger_level += self.smoothing * (float(danger_level) - self.rolling_danger_level)
+        return self.rolling_danger_level
+
+    def _write(self, chunk):
+        # Chunks are at most one window long, so they wrap around the buffer at most once
+        size = len(self._buffer)
+        start = self.samples_received % size
+        head = min(len(chunk), size - start)
+        self._buffer[start:start + head] = chunk[:head]
+        self._buffer[:len(chunk) - head] = chunk[head:]
+        self.samples_received += len(chunk)
+
+    def _ordered_window(self):
+        size = len(self._buffer)
+        if self.samples_received < size:
+            return self._buffer[:self.samples_received].copy()
+        start = self.samples_received % size
+        return np.concatenate((self._buffer[start:], self._buffer[:start]))
+
+
+class SessionLimiter:
+    """Counts open streaming sessions and refuses new ones above `max_sessions`."""
+
+    def __init__(self, max_sessions=STREAM_MAX_SESSIONS):
+        self.max_sessions = max_sessions
+        self.active = 0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        with self._lock:
+            if self.active >= self.max_sessions:
+                return False
+            self.active += 1
+            return True
+
+    def release(self):
+        with self._lock:
+            self.active -= 1
+
+
+def parse_samples(message):
+    """
+    Decode one streamed message into a float array.
+
+    Binary frames are little-endian float32 samples. Text frames are either JSON
+    (a list of samples or {"samples": [...]}) or comma/whitespace separated numbers.
+    """
+    if message is None:
+        return np.empty(0)
+    if isinstance(message, (bytes, bytearray)):
+        if len(message) % 4:
+            raise ValueError("Binary frames must contain little-endian float32 samples.")
+        return np.frombuffer(message, dtype='<f4').astype(np.float64)
+
+    text = message.strip()
+    if text.startswith('[') or text.startswith('{'):
+        payload = json.loads(text)
+        if isinstance(payload, dict):
+            payload = payload.get('samples', [])
+        return np.asarray(payload, dtype=np.float64).ravel()
+    return np.array(text.replace(',', ' ').split(), dtype=np.float64)
+
+
+def normalize_window(window):
+    # Global statistics are unknown while streaming, so each window is z-scored on its own
+    std = np.std(window)
+    if std == 0:
+        return np.zeros_like(window)
+    return (window - np.mean(window)) / std
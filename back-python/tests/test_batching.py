@@ -0,0 +1,130 @@
+"""InferenceScheduler (batching.py): grouping, error propagation, cancelled callers and idle workers."""
+import threading
+import time
+from concurrent.futures import Future
+import numpy as np
+import pytest
+
+from batching import InferenceScheduler
+
+
+def _echo(model_choice, rows):
+    # One probability row per input row: its first sample, so callers can check they got their own
+    return rows[:, :1] * np.ones((1, 3))
+
+
+@pytest.fixture
+def make_scheduler():
+    schedulers = []
+
+    def make(predict_fn=_echo, **kwargs):
+        kwargs.setdefault('max_wait_ms', 20)
+        scheduler = InferenceScheduler(predict_fn, **kwargs)
+        schedulers.append(scheduler)
+        return scheduler
+
+    yield make
+    for scheduler in schedulers:
+        scheduler.shutdown()
+
+
+def test_concurrent_requests_share_a_batch(make_scheduler):
+    calls = []
+    scheduler = make_scheduler(lambda model, rows: calls.append(len(rows)) or _echo(model, rows))
+    futures = [scheduler.submit('deep', np.full(4, i, dtype=float)) for i in range(8)]
+    results = [future.result(timeout=5) for future in futures]
+
+    assert [r.shape for r in results] == [(1, 3)] * 8
+    assert [float(r[0, 0]) for r in results] == list(range(8))
+    assert sum(calls) == 8 and len(calls) < 8
+
+
+def test_batch_is_bounded_by_max_batch_size(make_scheduler):
+    calls = []
+    scheduler = make_scheduler(lambda model, rows: calls.append(len(rows)) or _echo(model, rows),
+                               max_batch_size=3)
+    for future in [scheduler.submit('deep', np.zeros(4)) for _ in range(7)]:
+        future.result(timeout=5)
+    assert max(calls) <= 3
+
+
+def test_prediction_error_reaches_every_caller_and_worker_survives(make_scheduler):
+    failing = {'on': True}
+
+    def predict(model, rows):
+        if failing['on']:
+            raise RuntimeError("model exploded")
+        return _echo(model, rows)
+
+    scheduler = make_scheduler(predict)
+    futures = [scheduler.submit('deep', np.zeros(4)) for _ in range(3)]
+    for future in futures:
+        with pytest.raises(RuntimeError, match="model exploded"):
+            future.result(timeout=5)
+
+    failing['on'] = False
+    assert scheduler.predict('deep', np.ones(4), timeout=5).shape == (1, 3)
+
+
+def test_cancelled_future_does_not_stop_the_worker(make_scheduler):
+    started, release = threading.Event(), threading.Event()
+
+    def slow(model, rows):
+        started.set()
+        release.wait(5)
+        return _echo(model, rows)
+
+    scheduler = make_scheduler(slow)
+    busy = scheduler.submit('deep', np.zeros(4))
+    assert started.wait(5)
+    # Queued behind the running batch, then abandoned by its caller (e.g. a closed stream)
+    cancelled = scheduler.submit('deep', np.zeros(4))
+    assert cancelled.cancel()
+    release.set()
+    busy.result(timeout=5)
+
+    assert scheduler.predict('deep', np.full(4, 7.0), timeout=5)[0, 0] == 7.0
+    assert scheduler._workers['deep'].is_alive()
+
+
+def test_future_settled_by_its_caller_is_skipped(make_scheduler):
+    started, release = threading.Event(), threading.Event()
+
+    def slow(model, rows):
+        started.set()
+        release.wait(5)
+        return _echo(model, rows)
+
+    scheduler = make_scheduler(slow)
+    busy = scheduler.submit('deep', np.zeros(4))
+    assert started.wait(5)
+    settled = Future()
+    scheduler._enqueue('deep', (np.zeros(4), settled))
+    settled.set_result('given up')
+    release.set()
+    busy.result(timeout=5)
+
+    assert settled.result() == 'given up'
+    assert scheduler.predict('deep', np.ones(4), timeout=5).shape == (1, 3)
+
+
+def test_dead_worker_is_replaced(make_scheduler):
+    scheduler = make_scheduler()
+    scheduler.predict('deep', np.ones(4), timeout=5)
+    worker = scheduler._workers['deep']
+    # Simulate a worker stopped by an unexpected error: the sentinel ends its loop
+    scheduler._queues['deep'].put(None)
+    worker.join(timeout=5)
+    assert 'deep' not in scheduler._workers
+
+    assert scheduler.predict('deep', np.full(4, 2.0), timeout=5)[0, 0] == 2.0
+
+
+def test_idle_worker_stops_and_restarts(make_scheduler):
+    scheduler = make_scheduler(idle_seconds=0.05)
+    scheduler.predict('deep', np.ones(4), timeout=5)
+    worker = scheduler._workers['deep']
+    worker.join(timeout=5)
+    assert not worker.is_alive() and 'deep' not in scheduler._queues
+
+    assert scheduler.predict('deep', np.ones(4), timeout=5).shape == (1, 3)
@@ -0,0 +1,51 @@
+"""
+NumpyModel (numpy_model.py) against Keras on a fixed input: the checked-in .npz weights of
+models/full, and a freshly built model of each Keras architecture of ia.build_model.
+"""
+import os
+import numpy as np
+import pytest
+
+tf = pytest.importorskip('tensorflow')
+
+from export import NPZ_TOLERANCE, export_npz, npz_path
+from numpy_model import NumpyModel
+
+MODEL_DIR = 'models/full'
+INPUT_LENGTH = 361
+N_CLASSES = 5
+
+
+def _fixed_input(input_shape, batch=16):
+    return np.random.default_rng(0).standard_normal((batch,) + tuple(input_shape)).astype(np.float32)
+
+
+def _assert_same_predictions(keras_model, numpy_model):
+    X = _fixed_input(keras_model.input_shape[1:])
+    expected = np.asarray(keras_model(X, training=False))
+    actual = numpy_model.predict(X)
+    assert actual.shape == expected.shape
+    np.testing.assert_allclose(actual, expected, atol=NPZ_TOLERANCE, rtol=0)
+    np.testing.assert_array_equal(actual.argmax(axis=1), expected.argmax(axis=1))
+
+
+@pytest.mark.parametrize('model_choice', ['deep', 'rnn', 'lstm', 'cnn'])
+def test_checked_in_weights_match_keras(model_choice):
+    keras_path = os.path.join(MODEL_DIR, f'{model_choice}_model.h5')
+    if not (os.path.exists(keras_path) and os.path.exists(npz_path(keras_path))):
+        pytest.skip(f"no .h5/.npz pair for {model_choice} in {MODEL_DIR}")
+    keras_model = tf.keras.models.load_model(keras_path)
+    _assert_same_predictions(keras_model, NumpyModel(npz_path(keras_path)))
+
+
+@pytest.mark.parametrize('model_choice', ['deep', 'rnn', 'lstm', 'cnn'])
+def test_exported_architecture_matches_keras(model_choice, tmp_path):
+    from ia import build_model
+
+    tf.keras.utils.set_random_seed(0)
+    params = {'model_choice': model_choice, 'lstm_units': 8, 'rnn_units': 8, 'cnn_filters': 4,
+              'dense_units': 16, 'epochs': 1, 'batch_size': 32}
+    keras_model, _ = build_model(params, INPUT_LENGTH, N_CLASSES)
+    # No check inside export_npz: the comparison below is the test
+    path = export_npz(keras_model, str(tmp_path / f'{model_choice}_model.npz'), tolerance=np.inf)
+    _assert_same_predictions(keras_model, NumpyModel(path))
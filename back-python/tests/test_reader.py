@@ -0,0 +1,94 @@
+"""CSV header detection, irregular rows and validation of the signal reader (reader.py)."""
+import numpy as np
+import pytest
+
+import reader
+from reader import ECGReadError, choose_signal_column, load_signal
+
+
+def _load(content):
+    return load_signal(content, use_cache=False)
+
+
+@pytest.mark.parametrize("content, expected", [
+    # Header: the signal column is chosen by name, whatever its position
+    (b"time,voltage\n0,1\n1,2\n2,3\n", [1, 2, 3]),
+    (b"voltage,time\n1,0\n2,1\n3,2\n", [1, 2, 3]),
+    (b"index,MLII,V5\n0,1,9\n1,2,9\n2,3,9\n", [1, 2, 3]),
+    (b'"Time","ECG"\n0,1\n1,2\n', [1, 2]),
+    # Header without a known name: the last column that is not a time/index column
+    (b"sample,foo,bar\n0,1,4\n1,2,5\n", [4, 5]),
+    # No header: a single column or row is read as is
+    (b"1\n2\n3\n", [1, 2, 3]),
+    (b"1,2,3,4\n", [1, 2, 3, 4]),
+    # No header, two columns with an increasing first one: (time, signal)
+    (b"0,1\n1,2\n2,3\n", [1, 2, 3]),
+    # Otherwise the table is flattened row by row
+    (b"3,1\n1,2\n2,3\n", [3, 1, 1, 2, 2, 3]),
+    # Blank lines before the first row
+    (b"\n\n time,voltage\n0,1\n1,2\n", [1, 2]),
+    (b"time,voltage\r\n0,1\r\n1,2\r\n", [1, 2]),
+])
+def test_header_detection(content, expected):
+    np.testing.assert_array_equal(_load(content), expected)
+
+
+@pytest.mark.parametrize("content, expected", [
+    # Short last rows are padded and the trailing empty cells dropped
+    (b"1,2,3\n4,5\n6\n", [1, 2, 3, 4, 5, 6]),
+    (b"3,1\n1,2\n2\n", [3, 1, 1, 2, 2]),
+    (b"time,voltage\n0,1\n1,2\n2,\n", [1, 2]),
+    # Still read as (time, signal) when the last row lacks its value
+    (b"1,2\n3,4\n5\n", [2, 4]),
+])
+def test_uneven_rows(content, expected):
+    np.testing.assert_array_equal(_load(content), expected)
+
+
+@pytest.mark.parametrize("content", [
+    # Row longer than the first one
+    b"a,b,c\n1,2,3\n4,5,6,7\n",
+    # Missing value inside the signal
+    b"time,voltage\n0,1\n1,\n2,3\n",
+    # Empty file, no numbers, too short
+    b"\n\n",
+    b"voltage\nfoo\nbar\n",
+    b"voltage\n1\n",
+])
+def test_unreadable_content(content):
+    with pytest.raises(ECGReadError):
+        _load(content)
+
+
+def test_read_error_is_a_value_error():
+    # The API answers ValueError subclasses with 400
+    assert issubclass(ECGReadError, ValueError)
+
+
+def test_header_without_signal_column():
+    with pytest.raises(ECGReadError):
+        choose_signal_column(['time', 'index'])
+
+
+def test_text_and_file_sources(tmp_path):
+    path = tmp_path / "record_full.csv"
+    path.write_bytes(b"time,voltage\n0,1\n1,2\n")
+    np.testing.assert_array_equal(load_signal(str(path), use_cache=False), [1, 2])
+    np.testing.assert_array_equal(_load("time,voltage\n0,1\n1,2\n"), [1, 2])
+    with open(path, 'rb') as f:
+        np.testing.assert_array_equal(_load(f), [1, 2])
+    with pytest.raises(ECGReadError):
+        load_signal(str(tmp_path / "missing.csv"), use_cache=False)
+
+
+def test_cached_reads(tmp_path, monkeypatch):
+    monkeypatch.setattr(reader, 'SIGNAL_CACHE_DIR', str(tmp_path / "cache"))
+    path = tmp_path / "record_full.csv"
+    path.write_bytes(b"time,voltage\n0,1\n1,2\n2,3\n")
+
+    first = load_signal(str(path), use_cache=True)
+    second = load_signal(str(path), use_cache=True)
+    np.testing.assert_array_equal(first, [1, 2, 3])
+    assert isinstance(second, np.memmap)
+    np.testing.assert_array_equal(second, first)
+    assert len(list((tmp_path / "cache").iterdir())) == 1
@@ -0,0 +1,103 @@
+"""Score aggregates and the batched writer (scores.py), on a throwaway SQLite database."""
+import threading
+import pytest
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import sessionmaker
+
+from database import Base
+from models import Score, ScoreBucket, ScoreTotals
+from scores import ScoreWriter, ensure_totals, read_stats, write_scores
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'scores.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    yield sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    engine.dispose()
+
+
+def _write(session_factory, values):
+    with session_factory() as db:
+        write_scores(db, values)
+        db.commit()
+
+
+def test_empty_stats(session_factory):
+    with session_factory() as db:
+        assert read_stats(db) == {"average": 0, "numberOfUsers": 0, "histogram": {}}
+
+
+def test_aggregates_and_histogram_accumulate(session_factory):
+    _write(session_factory, [1, 2, 2, 3])
+    _write(session_factory, [2, 5])
+    with session_factory() as db:
+        stats = read_stats(db)
+        assert stats == {"average": 2.5, "numberOfUsers": 6, "histogram": {'1': 1, '2': 3, '3': 1, '5': 1}}
+        # The aggregates match a scan of the raw scores
+        assert db.scalar(select(func.count(Score.id))) == 6
+        assert db.scalar(select(func.sum(Score.value))) == 15
+
+
+def test_ensure_totals_backfills_once(session_factory):
+    with session_factory() as db:
+        db.add_all([Score(value=v) for v in [4, 4, 1]])
+        db.commit()
+    assert ensure_totals(session_factory) is True
+    assert ensure_totals(session_factory) is False
+    with session_factory() as db:
+        assert db.get(ScoreTotals, 1).count == 3
+        assert {b.value: b.count for b in db.scalars(select(ScoreBucket))} == {4: 2, 1: 1}
+
+
+def test_writer_coalesces_and_commits(session_factory):
+    writer = ScoreWriter(session_factory)
+    try:
+        for future in [writer.submit(v) for v in [3] * 20 + [1] * 5]:
+            future.result(timeout=5)
+        stats = writer.stats()
+        assert stats['scores'] == 25 and stats['batches'] <= 25
+    finally:
+        writer.shutdown()
+    with session_factory() as db:
+        assert read_stats(db)['histogram'] == {'1': 5, '3': 20}
+
+
+def test_cancelled_submission_does_not_stop_the_writer(session_factory):
+    started, release = threading.Event(), threading.Event()
+
+    def blocking_factory():
+        started.set()
+        release.wait(5)
+        return session_factory()
+
+    writer = ScoreWriter(blocking_factory)
+    try:
+        busy = writer.submit(1)
+        assert started.wait(5)
+        # Queued behind the running batch, then abandoned by its request
+        cancelled = writer.submit(2)
+        assert cancelled.cancel()
+        release.set()
+        busy.result(timeout=5)
+        writer.submit(3).result(timeout=5)
+    finally:
+        writer.shutdown()
+    with session_factory() as db:
+        assert read_stats(db)['histogram'] == {'1': 1, '3': 1}
+
+
+def test_dead_writer_is_restarted(session_factory):
+    writer = ScoreWriter(session_factory)
+    try:
+        writer.submit(1).result(timeout=5)
+        worker = writer._worker
+        # Simulate a writer stopped by an unexpected error: the sentinel ends its loop
+        writer._queue.put(None)
+        worker.join(timeout=5)
+        assert not worker.is_alive()
+
+        writer.submit(2).result(timeout=5)
+        assert writer._worker is not worker
+    finally:
+        writer.shutdown()
@@ -0,0 +1,116 @@
+"""Streaming session ring buffer, window emission and message decoding (streaming.py)."""
+import json
+import numpy as np
+import pytest
+
+from streaming import SessionLimiter, StreamSession, normalize_window, parse_samples
+
+
+def _push_in_chunks(session, signal, chunk_size):
+    emitted = []
+    for start in range(0, len(signal), chunk_size):
+        emitted.extend(session.push(signal[start:start + chunk_size]))
+    return emitted
+
+
+def test_windows_without_stride_do_not_overlap():
+    signal = np.arange(30, dtype=np.float64)
+    emitted = StreamSession(10).push(signal)
+
+    assert [(index, start) for index, start, _ in emitted] == [(0, 0), (1, 10), (2, 20)]
+    for _, start, segment in emitted:
+        np.testing.assert_array_equal(segment, signal[start:start + 10])
+
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 7, 10, 25, 100])
+def test_stride_emission_does_not_depend_on_chunking(chunk_size):
+    signal = np.arange(50, dtype=np.float64)
+    session = StreamSession(10, stride=4)
+    emitted = _push_in_chunks(session, signal, chunk_size)
+
+    assert [start for _, start, _ in emitted] == list(range(0, 41, 4))
+    assert [index for index, _, _ in emitted] == list(range(len(emitted)))
+    for _, start, segment in emitted:
+        np.testing.assert_array_equal(segment, signal[start:start + 10])
+    assert session.samples_received == len(signal)
+    assert session.windows_emitted == len(emitted)
+
+
+def test_nothing_is_emitted_before_the_first_window():
+    session = StreamSession(10, stride=2)
+    assert session.push(np.arange(9)) == []
+    assert len(session.push([9.0])) == 1
+
+
+def test_ring_buffer_keeps_a_constant_size():
+    session = StreamSession(8, stride=3)
+    _push_in_chunks(session, np.random.default_rng(0).normal(size=1000), 17)
+    assert session._buffer.shape == (8,)
+
+
+def test_emitted_segments_are_copies():
+    signal = np.arange(20, dtype=np.float64)
+    session = StreamSession(10)
+    (_, _, first), = session.push(signal[:10])
+    session.push(signal[10:])
+    np.testing.assert_array_equal(first, signal[:10])
+
+
+def test_context_and_lookahead_surround_the_window():
+    signal = np.arange(60, dtype=np.float64)
+    session = StreamSession(10, stride=10, context=15, lookahead=5)
+    emitted = _push_in_chunks(session, signal, 7)
+
+    # A window is only emitted once the samples after it are in
+    assert [start for _, start, _ in emitted] == [0, 10, 20, 30, 40]
+    for _, start, segment in emitted:
+        first = max(0, start - 15)
+        np.testing.assert_array_equal(segment, signal[first:start + 15])
+        np.testing.assert_array_equal(session.cut(segment), signal[start:start + 10])
+
+
+def test_invalid_stride_is_rejected():
+    with pytest.raises(ValueError):
+        StreamSession(10, stride=-1)
+
+
+def test_rolling_danger_level():
+    session = StreamSession(10, smoothing=0.5)
+    assert session.update_danger(2) == 2.0
+    assert session.update_danger(4) == 3.0
+
+
+def test_session_limiter():
+    limiter = SessionLimiter(max_sessions=2)
+    assert limiter.acquire() and limiter.acquire()
+    assert not limiter.acquire()
+    limiter.release()
+    assert limiter.acquire()
+
+
+@pytest.mark.parametrize("message", [
+    json.dumps([1, 2.5, -3]),
+    json.dumps({"samples": [1, 2.5, -3]}),
+    "1, 2.5, -3",
+    " 1 2.5\n-3 ",
+    np.array([1, 2.5, -3], dtype='<f4').tobytes(),
+])
+def test_parse_samples_formats(message):
+    np.testing.assert_array_equal(parse_samples(message), [1.0, 2.5, -3.0])
+
+
+def test_parse_samples_rejects_truncated_binary_frames():
+    with pytest.raises(ValueError):
+        parse_samples(b'\x00\x00\x80')
+
+
+def test_parse_samples_empty_message():
+    assert parse_samples(None).size == 0
+    assert parse_samples(json.dumps({})).size == 0
+
+
+def test_normalize_window():
+    window = normalize_window(np.array([1.0, 2.0, 3.0, 4.0]))
+    assert window.mean() == pytest.approx(0)
+    assert window.std() == pytest.approx(1)
+    np.testing.assert_array_equal(normalize_window(np.full(5, 3.0)), np.zeros(5))
@@ -0,0 +1,71 @@
+import os
+import threading
+import numpy as np
+
+# Threads used by each TFLite interpreter
+TFLITE_THREADS = int(os.environ.get('ECG_TFLITE_THREADS', '1'))
+
+
+def _interpreter_class():
+    # Lightest runtime first; TensorFlow itself is only the fallback
+    try:
+        from ai_edge_litert.interpreter import Interpreter
+        return Interpreter
+    except ImportError:
+        pass
+    try:
+        from tflite_runtime.interpreter import Interpreter
+        return Interpreter
+    except ImportError:
+        pass
+    import tensorflow as tf
+    return tf.lite.Interpreter
+
+
+class TFLiteModel:
+    """
+    predict() over a TFLite artifact written by export.export_tflite.
+
+    The artifact has a fixed batch size, so inputs are run in chunks of that size (the last
+    one zero-padded). Quantized inputs/outputs are converted from/to float32. An interpreter
+    is not thread-safe, so calls on the same model are serialized.
+    """
+
+    def __init__(self, path, num_threads=TFLITE_THREADS):
+        self.path = path
+        self._interpreter = _interpreter_class()(model_path=path, num_threads=num_threads)
+        self._interpreter.allocate_tensors()
+        self._input = self._interpreter.get_input_details()[0]
+        self._output = self._interpreter.get_output_details()[0]
+        self.input_shape = tuple(int(d) for d in self._input['shape'])
+        self.batch_size = self.input_shape[0]
+        self._lock = threading.Lock()
+
+    def predict(self, X):
+        X = np.asarray(X, dtype=np.float32).reshape((-1,) + self.input_shape[1:])
+        if len(X) == 0:
+            return np.zeros((0,) + tuple(self._output['shape'][1:]), dtype=np.float32)
+        outputs = []
+        with self._lock:
+            for start in range(0, len(X), self.batch_size):
+                chunk = X[start:start + self.batch_size]
+                count = len(chunk)
+                if count < self.batch_size:
+                    chunk = np.concatenate([chunk, np.zeros((self.batch_size - count,) + chunk.shape[1:], np.float32)])
+                self._interpreter.set_tensor(self._input['index'], self._quantize(chunk))
+                self._interpreter.invoke()
+                outputs.append(self._dequantize(self._interpreter.get_tensor(self._output['index']))[:count])
+        return np.concatenate(outputs, axis=0)
+
+    def _quantize(self, X):
+        if self._input['dtype'] == np.float32:
+            return X
+        scale, zero_point = self._input['quantization']
+        info = np.iinfo(self._input['dtype'])
+        return np.clip(np.round(X / scale + zero_point), info.min, info.max).astype(self._input['dtype'])
+
+    def _dequantize(self, y):
+        if self._output['dtype'] == np.float32:
+            return y
+        scale, zero_point = self._output['quantization']
+        return (y.astype(np.float32) - zero_point) * scale
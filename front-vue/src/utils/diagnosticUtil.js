@@ -107,4 +107,46 @@ const getDiseaseDescription = (name) => {
     }
 }
 
-export { diseasesInfo, getRiskColor, getRiskMessage, getDiseaseDescription };
\ No newline at end of file
+// Function to draw an ECG polyline (as returned with plot_format=polyline) into a PNG data URL
+const polylineToDataUrl = (polyline, width = 1000, height = 600) => {
+    const canvas = document.createElement('canvas');
+    canvas.width = width;
+    canvas.height = height;
+    const ctx = canvas.getContext('2d');
+
+    const range = polyline.y_max - polyline.y_min || 1;
+    const yMin = polyline.y_min - 0.1 * range;
+    const yMax = polyline.y_max + 0.1 * range;
+    const duration = polyline.duration || 1;
+    const x = (t) => (t / duration) * width;
+    const y = (v) => ((yMax - v) / (yMax - yMin)) * height;
+
+    ctx.fillStyle = '#fce4e4';
+    ctx.fillRect(0, 0, width, height);
+    ctx.strokeStyle = 'red';
+    ctx.lineWidth = 1;
+    for (let t = 0; t <= duration && duration / 0.2 < 300; t += 0.2) {
+        ctx.beginPath();
+        ctx.moveTo(x(t), 0);
+        ctx.lineTo(x(t), height);
+        ctx.stroke();
+    }
+    for (let v = Math.ceil(yMin / 0.5) * 0.5; v <= yMax; v += 0.5) {
+        ctx.beginPath();
+        ctx.moveTo(0, y(v));
+        ctx.lineTo(width, y(v));
+        ctx.stroke();
+    }
+
+    ctx.strokeStyle = 'black';
+    ctx.lineWidth = 1.5;
+    ctx.beginPath();
+    polyline.t.forEach((t, i) => {
+        if (i === 0) ctx.moveTo(x(t), y(polyline.v[i]));
+        else ctx.lineTo(x(t), y(polyline.v[i]));
+    });
+    ctx.stroke();
+    return canvas.toDataURL('image/png');
+}
+
+export { diseasesInfo, getRiskColor, getRiskMessage, getDiseaseDescription, polylineToDataUrl };
\ No newline at end of file